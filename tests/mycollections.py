@@ -1,4 +1,7 @@
-__all__ = ['Counter', 'deque', 'defaultdict', 'namedtuple', 'OrderedDict']
+__all__ = ['Counter', 'deque', 'defaultdict', 'namedtuple', 'OrderedDict',
+           'CompactOrderedDict', 'LRUCache', 'cached_namedtuple', 'recordtype',
+           'TypedRecord', 'make_records', 'from_columns', 'to_columns',
+           'TopKCounter']
 # For bootstrapping reasons, the collection ABCs are defined in _abcoll.py.
 # They should however be considered an integral part of collections.py.
 from _abcoll import *
@@ -6,12 +9,16 @@ import _abcoll
 __all__ += _abcoll.__all__
 
 from _collections import deque, defaultdict
-from operator import itemgetter as _itemgetter, eq as _eq
+from operator import itemgetter as _itemgetter, eq as _eq, gt as _gt
+from operator import attrgetter as _attrgetter
 from keyword import iskeyword as _iskeyword
 import sys as _sys
+import gc as _gc
 import heapq as _heapq
+from time import time as _time
 from itertools import repeat as _repeat, chain as _chain, starmap as _starmap
-from itertools import imap as _imap
+from itertools import imap as _imap, islice as _islice, izip as _izip
+from itertools import count as _count
 
 try:
     from thread import get_ident as _get_ident
@@ -23,6 +30,16 @@ except ImportError:
 ### OrderedDict
 ################################################################################
 
+def _pairs(other):
+    'Return the (key, value) pairs that update() takes from other.'
+    if type(other) is dict:
+        return other.iteritems()
+    if isinstance(other, Mapping):
+        return ((key, other[key]) for key in other)
+    if hasattr(other, 'keys'):
+        return ((key, other[key]) for key in other.keys())
+    return other
+
 class OrderedDict(dict):
     'Dictionary that remembers insertion order'
     # An inherited dict maps keys to values.
@@ -33,7 +50,9 @@ class OrderedDict(dict):
     # The internal self.__map dict maps keys to links in a doubly linked list.
     # The circular doubly linked list starts and ends with a sentinel element.
     # The sentinel element never gets deleted (this simplifies the algorithm).
-    # Each link is stored as a list of length three:  [PREV, NEXT, KEY].
+    # Each link is stored as a list of length four:  [PREV, NEXT, KEY, VALUE].
+    # The value is the same object as the one in the inherited dict; keeping
+    # it in the link lets items() and values() read both in one step per link.
 
     def __init__(*args, **kwds):
         '''Initialize an ordered dictionary.  The signature is the same as
@@ -52,7 +71,7 @@ class OrderedDict(dict):
             self.__root
         except AttributeError:
             self.__root = root = []                     # sentinel node
-            root[:] = [root, root, None]
+            root[:] = [root, root, None, None]
             self.__map = {}
         self.__update(*args, **kwds)
 
@@ -60,10 +79,12 @@ class OrderedDict(dict):
         'od.__setitem__(i, y) <==> od[i]=y'
         # Setting a new item creates a new link at the end of the linked list,
         # and the inherited dictionary is updated with the new key/value pair.
-        if key not in self:
+        if key in self:
+            self.__map[key][3] = value                  # update link[VALUE]
+        else:
             root = self.__root
             last = root[0]
-            last[1] = root[0] = self.__map[key] = [last, root, key]
+            last[1] = root[0] = self.__map[key] = [last, root, key, value]
         return dict_setitem(self, key, value)
 
     def __delitem__(self, key, dict_delitem=dict.__delitem__):
@@ -71,7 +92,7 @@ class OrderedDict(dict):
         # Deleting an existing item uses self.__map to find the link which gets
         # removed by updating the links in the predecessor and successor nodes.
         dict_delitem(self, key)
-        link_prev, link_next, _ = self.__map.pop(key)
+        link_prev, link_next, _, _ = self.__map.pop(key)
         link_prev[1] = link_next                        # update link_prev[NEXT]
         link_next[0] = link_prev                        # update link_next[PREV]
 
@@ -96,39 +117,204 @@ class OrderedDict(dict):
     def clear(self):
         'od.clear() -> None.  Remove all items from od.'
         root = self.__root
-        root[:] = [root, root, None]
+        root[:] = [root, root, None, None]
         self.__map.clear()
         dict.clear(self)
 
-    # -- the following methods do not depend on the internal structure --
+    def move_to_end(self, key, last=True):
+        '''Move an existing element to the end (or beginning if last==False).
 
-    def keys(self):
-        'od.keys() -> list of keys in od'
-        return list(self)
+        Raises KeyError if the element does not exist.
+        When last=True, acts like a fast version of self[key]=self.pop(key).
+
+        >>> d = OrderedDict.fromkeys('abcde')
+        >>> d.move_to_end('b')
+        >>> ''.join(d)
+        'acdeb'
+        >>> d.move_to_end('b', last=False)
+        >>> ''.join(d)
+        'bacde'
+
+        '''
+        # Unlink the link and relink it next to the sentinel, without
+        # touching the inherited dict.
+        link = self.__map[key]
+        link_prev, link_next, _, _ = link
+        link_prev[1] = link_next                        # update link_prev[NEXT]
+        link_next[0] = link_prev                        # update link_next[PREV]
+        root = self.__root
+        if last:
+            last = root[0]
+            link[0] = last
+            link[1] = root
+            last[1] = root[0] = link
+        else:
+            first = root[1]
+            link[0] = root
+            link[1] = first
+            root[1] = first[0] = link
+
+    def update(*args, **kwds):
+        '''od.update(E, **F) -> None.  Update od from dict/iterable E and F.
+        If E is present and has a .keys() method, does: for k in E: od[k] = E[k]
+        If E is present and lacks a .keys() method, does: for (k, v) in E: od[k] = v
+        In either case, this is followed by: for k, v in F.items(): od[k] = v
+
+        '''
+        if not args:
+            raise TypeError("descriptor 'update' of 'OrderedDict' object "
+                            "needs an argument")
+        self = args[0]
+        args = args[1:]
+        if len(args) > 1:
+            raise TypeError('update expected at most 1 arguments, got %d' %
+                            len(args))
+        if type(self).__setitem__.im_func is not OrderedDict.__setitem__.im_func:
+            # a subclass that overrides __setitem__ sees every key
+            return MutableMapping.update(self, *args, **kwds)
+        if args:
+            self.__load(_pairs(args[0]))
+        if kwds:
+            self.__load(kwds.iteritems())
+
+    def __load(self, pairs, dict_setitem=dict.__setitem__):
+        'Set the (key, value) pairs, linking the new keys in a single pass.'
+        # Unlike __setitem__, this keeps the last link in a local and only
+        # closes the list back onto the sentinel once at the end.  Every link
+        # is a new container, so on large loads the cyclic garbage collector
+        # would take most of the time scanning them; it is paused meanwhile.
+        root = self.__root
+        mapping = self.__map
+        last = root[0]
+        collecting = _gc.isenabled()
+        if collecting:
+            _gc.disable()
+        try:
+            for key, value in pairs:
+                if key in mapping:
+                    mapping[key][3] = value
+                else:
+                    link = [last, root, key, value]
+                    last[1] = link
+                    mapping[key] = last = link
+                dict_setitem(self, key, value)
+        finally:
+            root[0] = last
+            if collecting:
+                _gc.enable()
+
+    def __clone(self):
+        'Return a copy built directly from the hash table and the links.'
+        # The inherited dict is copied in one C-level merge, and the new links
+        # are made walking the old ones, without looking any key up.
+        other = dict.__new__(self.__class__)
+        dict.update(other, self)
+        other.__root = root = []                        # sentinel node
+        root[:] = [root, root, None, None]
+        other.__map = mapping = {}
+        old_root = self.__root
+        curr = old_root[1]
+        last = root
+        collecting = _gc.isenabled()
+        if collecting:
+            _gc.disable()
+        try:
+            while curr is not old_root:
+                key = curr[2]
+                link = [last, root, key, curr[3]]
+                last[1] = link
+                mapping[key] = last = link
+                curr = curr[1]
+        finally:
+            root[0] = last
+            if collecting:
+                _gc.enable()
+        return other
 
     def values(self):
         'od.values() -> list of values in od'
-        return [self[key] for key in self]
+        if type(self).__getitem__ is not dict.__getitem__:
+            # a subclass that overrides __getitem__ sees every key read
+            return [self[key] for key in self]
+        # Read the values from the links, without looking the keys up.
+        result = []
+        append = result.append
+        root = self.__root
+        curr = root[1]
+        while curr is not root:
+            append(curr[3])
+            curr = curr[1]
+        return result
 
     def items(self):
         'od.items() -> list of (key, value) pairs in od'
-        return [(key, self[key]) for key in self]
-
-    def iterkeys(self):
-        'od.iterkeys() -> an iterator over the keys in od'
-        return iter(self)
+        if type(self).__getitem__ is not dict.__getitem__:
+            return [(key, self[key]) for key in self]
+        result = []
+        append = result.append
+        root = self.__root
+        curr = root[1]
+        while curr is not root:
+            append((curr[2], curr[3]))
+            curr = curr[1]
+        return result
 
     def itervalues(self):
         'od.itervalues -> an iterator over the values in od'
-        for k in self:
-            yield self[k]
+        if type(self).__getitem__ is not dict.__getitem__:
+            for key in self:
+                yield self[key]
+            return
+        root = self.__root
+        curr = root[1]
+        while curr is not root:
+            yield curr[3]
+            curr = curr[1]
 
     def iteritems(self):
         'od.iteritems -> an iterator over the (key, value) pairs in od'
-        for k in self:
-            yield (k, self[k])
+        if type(self).__getitem__ is not dict.__getitem__:
+            for key in self:
+                yield (key, self[key])
+            return
+        root = self.__root
+        curr = root[1]
+        while curr is not root:
+            yield curr[2], curr[3]
+            curr = curr[1]
 
-    update = MutableMapping.update
+    def popitem(self, last=True):
+        '''od.popitem() -> (k, v), return and remove a (key, value) pair.
+        Pairs are returned in LIFO order if last is true or FIFO order if false.
+
+        '''
+        if not self:
+            raise KeyError('dictionary is empty')
+        if type(self).__delitem__.im_func is not OrderedDict.__delitem__.im_func or \
+                type(self).__getitem__ is not dict.__getitem__:
+            # a subclass that overrides __delitem__ or __getitem__ sees the
+            # key deleted or read
+            key = next(reversed(self) if last else iter(self))
+            return key, self.pop(key)
+        # Unlink the end link directly, which already has the key and value.
+        root = self.__root
+        link = root[0] if last else root[1]
+        link_prev, link_next, key, value = link
+        link_prev[1] = link_next
+        link_next[0] = link_prev
+        del self.__map[key]
+        dict.__delitem__(self, key)
+        return key, value
+
+    # -- the following methods do not depend on the internal structure --
+
+    def keys(self):
+        'od.keys() -> list of keys in od'
+        return list(self)
+
+    def iterkeys(self):
+        'od.iterkeys() -> an iterator over the keys in od'
+        return iter(self)
 
     __update = update # let subclasses override update without breaking __init__
 
@@ -155,17 +341,6 @@ class OrderedDict(dict):
         self[key] = default
         return default
 
-    def popitem(self, last=True):
-        '''od.popitem() -> (k, v), return and remove a (key, value) pair.
-        Pairs are returned in LIFO order if last is true or FIFO order if false.
-
-        '''
-        if not self:
-            raise KeyError('dictionary is empty')
-        key = next(reversed(self) if last else iter(self))
-        value = self.pop(key)
-        return key, value
-
     def __repr__(self, _repr_running={}):
         'od.__repr__() <==> repr(od)'
         call_key = id(self), _get_ident()
@@ -181,17 +356,24 @@ class OrderedDict(dict):
 
     def __reduce__(self):
         'Return state information for pickling'
-        items = [[k, self[k]] for k in self]
-        inst_dict = vars(self).copy()
-        for k in vars(OrderedDict()):
-            inst_dict.pop(k, None)
-        if inst_dict:
+        # Unpickling passes the items to __init__, which loads them in bulk.
+        items = self.items()
+        inst_dict = vars(self)
+        if len(inst_dict) > 2:
+            inst_dict = inst_dict.copy()
+            inst_dict.pop('_OrderedDict__root', None)
+            inst_dict.pop('_OrderedDict__map', None)
             return (self.__class__, (items,), inst_dict)
         return self.__class__, (items,)
 
     def copy(self):
         'od.copy() -> a shallow copy of od'
-        return self.__class__(self)
+        cls = self.__class__
+        if cls.__init__.im_func is OrderedDict.__init__.im_func and \
+                cls.__setitem__.im_func is OrderedDict.__setitem__.im_func and \
+                cls.__getitem__ is dict.__getitem__:
+            return self.__clone()
+        return cls(self)
 
     @classmethod
     def fromkeys(cls, iterable, value=None):
@@ -200,8 +382,7 @@ class OrderedDict(dict):
 
         '''
         self = cls()
-        for key in iterable:
-            self[key] = value
+        self.update(_izip(iterable, _repeat(value)))
         return self
 
     def __eq__(self, other):
@@ -210,6 +391,10 @@ class OrderedDict(dict):
 
         '''
         if isinstance(other, OrderedDict):
+            if self is other:
+                return True
+            if len(self) != len(other):
+                return False
             return dict.__eq__(self, other) and all(_imap(_eq, self, other))
         return dict.__eq__(self, other)
 
@@ -232,6 +417,288 @@ class OrderedDict(dict):
         return ItemsView(self)
 
 
+################################################################################
+### CompactOrderedDict
+################################################################################
+
+_tombstone = object()
+
+class CompactOrderedDict(OrderedDict):
+    '''Ordered dictionary that keeps its order in a compact key table.
+
+    The API is the same as OrderedDict's, but instead of a linked list with a
+    four-element list per key, the keys are kept in a single list in
+    insertion order, and a dict mapping each key to its slot is only built
+    once a key is deleted.  Maps that are built and read, which is most of
+    them, pay for one list on top of the dict itself.
+
+    move_to_end() is O(1) amortized, but every move leaves a tombstone in
+    the table that is squeezed out later, so it is not meant for maps whose
+    keys are moved all the time, like the one behind an LRU cache: moves are
+    about twice as fast on an OrderedDict.
+
+    >>> d = CompactOrderedDict.fromkeys('abcde')
+    >>> del d['b']
+    >>> d['b'] = 1
+    >>> ''.join(d)
+    'acdeb'
+    >>> d.popitem(last=False)
+    ('a', None)
+    >>> d == OrderedDict([('c', None), ('d', None), ('e', None), ('b', 1)])
+    True
+
+    '''
+    # The inherited dict maps keys to values.  self.__keys lists the keys in
+    # insertion order; deleting one leaves _tombstone in its slot, and the
+    # table is squeezed when tombstones outnumber live keys.  The last slot is
+    # never a tombstone, and all the slots before self.__head are.
+    # self.__index maps each key to its slot in self.__keys, or is None until
+    # the first deletion needs it.
+
+    def __init__(*args, **kwds):
+        '''Initialize a compact ordered dictionary.  The signature is the same
+        as regular dictionaries.
+
+        '''
+        if not args:
+            raise TypeError("descriptor '__init__' of 'CompactOrderedDict' "
+                            "object needs an argument")
+        self = args[0]
+        args = args[1:]
+        if len(args) > 1:
+            raise TypeError('expected at most 1 arguments, got %d' % len(args))
+        try:
+            self.__keys
+        except AttributeError:
+            self.__keys = []
+            self.__index = None
+            self.__head = 0
+        self.__update(*args, **kwds)
+
+    def __setitem__(self, key, value, dict_setitem=dict.__setitem__):
+        'od.__setitem__(i, y) <==> od[i]=y'
+        # A new key is appended to the table, squeezing out the tombstones
+        # first if they are the majority.
+        if key not in self:
+            keys = self.__keys
+            if len(keys) > 2 * len(self) + 8:
+                self.__compact()
+            if self.__index is not None:
+                self.__index[key] = len(keys)
+            keys.append(key)
+        return dict_setitem(self, key, value)
+
+    def __delitem__(self, key, dict_delitem=dict.__delitem__):
+        'od.__delitem__(y) <==> del od[y]'
+        dict_delitem(self, key)
+        i = self.__slot(key)
+        del self.__index[key]
+        self.__free(i)
+
+    def __slot(self, key):
+        'Return the slot of key, building the index if needed.'
+        index = self.__index
+        if index is None:
+            index = self.__index = dict((k, i) for i, k in enumerate(self.__keys)
+                                        if k is not _tombstone)
+        return index[key]
+
+    def __free(self, i):
+        'Turn slot i into a tombstone, or drop it if it is the last one.'
+        keys = self.__keys
+        if i == len(keys) - 1:
+            keys.pop()
+            while keys and keys[-1] is _tombstone:
+                keys.pop()
+            if self.__head > len(keys):
+                self.__head = len(keys)
+        else:
+            keys[i] = _tombstone
+            if i == self.__head:
+                self.__head = i + 1
+
+    def __compact(self, room=0):
+        '''Drop the tombstones from the key table, in place, leaving room
+        free slots in front of the first key.
+
+        '''
+        keys = self.__keys
+        keys[:] = [_tombstone] * room + [key for key in keys if key is not _tombstone]
+        index = self.__index
+        if index is not None:
+            index.update(_izip(_islice(keys, room, None), _count(room)))
+        self.__head = room
+
+    def move_to_end(self, key, last=True):
+        '''Move an existing element to the end (or beginning if last==False).
+
+        Raises KeyError if the element does not exist.
+
+        '''
+        # Inlined __slot() and __free(): a move to the end is a lookup in the
+        # index, a tombstone and an append, and it is what an LRU cache does
+        # on every hit.  The index holds exactly the live keys, so it answers
+        # for "key in self" too, and self.__head is left behind the new
+        # tombstone, which is allowed: iteration skips tombstones anyway.
+        index = self.__index
+        if index is None:
+            if key not in self:
+                raise KeyError(key)
+            i = self.__slot(key)
+            index = self.__index
+        else:
+            try:
+                i = index[key]
+            except KeyError:
+                raise KeyError(key)
+        keys = self.__keys
+        if last:
+            end = len(keys)
+            if i == end - 1:
+                return
+            keys[i] = _tombstone
+            if end > 2 * len(self) + 8:
+                self.__compact()
+                end = len(keys)
+            index[key] = end
+            keys.append(key)
+        else:
+            if i == self.__head:
+                return
+            if self.__head == 0:
+                # make room in front, enough for the moves to stay O(1)
+                # amortized
+                self.__compact(len(self) // 2 + 1)
+                i = index[key]
+            self.__free(i)
+            self.__head -= 1
+            keys[self.__head] = key
+            index[key] = self.__head
+
+    def __iter__(self):
+        'od.__iter__() <==> iter(od)'
+        for key in _islice(self.__keys, self.__head, None):
+            if key is not _tombstone:
+                yield key
+
+    def __reversed__(self):
+        'od.__reversed__() <==> reversed(od)'
+        for key in reversed(self.__keys):
+            if key is not _tombstone:
+                yield key
+
+    def values(self):
+        'od.values() -> list of values in od'
+        return [self[key] for key in self]
+
+    def items(self):
+        'od.items() -> list of (key, value) pairs in od'
+        return [(key, self[key]) for key in self]
+
+    def itervalues(self):
+        'od.itervalues -> an iterator over the values in od'
+        for key in self:
+            yield self[key]
+
+    def iteritems(self):
+        'od.iteritems -> an iterator over the (key, value) pairs in od'
+        for key in self:
+            yield (key, self[key])
+
+    def clear(self):
+        'od.clear() -> None.  Remove all items from od.'
+        del self.__keys[:]
+        self.__index = None
+        self.__head = 0
+        dict.clear(self)
+
+    def update(*args, **kwds):
+        '''od.update(E, **F) -> None.  Update od from dict/iterable E and F.
+        If E is present and has a .keys() method, does: for k in E: od[k] = E[k]
+        If E is present and lacks a .keys() method, does: for (k, v) in E: od[k] = v
+        In either case, this is followed by: for k, v in F.items(): od[k] = v
+
+        '''
+        if not args:
+            raise TypeError("descriptor 'update' of 'CompactOrderedDict' "
+                            "object needs an argument")
+        self = args[0]
+        args = args[1:]
+        if len(args) > 1:
+            raise TypeError('update expected at most 1 arguments, got %d' %
+                            len(args))
+        if type(self).__setitem__.im_func is not \
+                CompactOrderedDict.__setitem__.im_func:
+            return MutableMapping.update(self, *args, **kwds)
+        if args:
+            self.__load(_pairs(args[0]))
+        if kwds:
+            self.__load(kwds.iteritems())
+
+    def __load(self, pairs, dict_setitem=dict.__setitem__):
+        'Set the (key, value) pairs, appending the new keys to the table.'
+        keys = self.__keys
+        append = keys.append
+        index = self.__index
+        for key, value in pairs:
+            if key not in self:
+                if index is not None:
+                    index[key] = len(keys)
+                append(key)
+            dict_setitem(self, key, value)
+
+    __update = update # let subclasses override update without breaking __init__
+
+    def popitem(self, last=True):
+        '''od.popitem() -> (k, v), return and remove a (key, value) pair.
+        Pairs are returned in LIFO order if last is true or FIFO order if false.
+
+        '''
+        if not self:
+            raise KeyError('dictionary is empty')
+        keys = self.__keys
+        if last:
+            key = keys[-1]
+        else:
+            i = self.__head
+            while keys[i] is _tombstone:
+                i += 1
+            self.__head = i
+            key = keys[i]
+        value = self[key]
+        del self[key]
+        return key, value
+
+    def __reduce__(self):
+        'Return state information for pickling'
+        keys = list(self)
+        items = zip(keys, map(self.__getitem__, keys))
+        inst_dict = vars(self)
+        if len(inst_dict) > 3:
+            inst_dict = inst_dict.copy()
+            for k in ('_CompactOrderedDict__keys', '_CompactOrderedDict__index',
+                      '_CompactOrderedDict__head'):
+                inst_dict.pop(k, None)
+            return (self.__class__, (items,), inst_dict)
+        return self.__class__, (items,)
+
+    def copy(self):
+        'od.copy() -> a shallow copy of od'
+        # The copy gets the live keys of the table, without tombstones.
+        cls = self.__class__
+        if cls.__init__.im_func is not CompactOrderedDict.__init__.im_func or \
+                cls.__setitem__.im_func is not CompactOrderedDict.__setitem__.im_func or \
+                cls.__getitem__ is not dict.__getitem__:
+            return cls(self)
+        other = dict.__new__(cls)
+        dict.update(other, self)
+        other.__keys = [key for key in _islice(self.__keys, self.__head, None)
+                        if key is not _tombstone]
+        other.__index = None
+        other.__head = 0
+        return other
+
+
 ################################################################################
 ### namedtuple
 ################################################################################
@@ -258,7 +725,510 @@ class {typename}(tuple):
 
     def __repr__(self):
         'Return a nicely formatted representation string'
-        return '{typename}({repr_fmt})' % self
+        return '{typename}({repr_fmt})' % self
+
+    def _asdict(self):
+        'Return a new OrderedDict which maps field names to their values'
+        return OrderedDict(zip(self._fields, self))
+
+    def _replace(_self, **kwds):
+        'Return a new {typename} object replacing specified fields with new values'
+        result = _self._make(map(kwds.pop, {field_names!r}, _self))
+        if kwds:
+            raise ValueError('Got unexpected field names: %r' % kwds.keys())
+        return result
+
+    def __getnewargs__(self):
+        'Return self as a plain tuple.  Used by copy and pickle.'
+        return tuple(self)
+
+    __dict__ = _property(_asdict)
+
+    def __getstate__(self):
+        'Exclude the OrderedDict from pickling'
+        pass
+
+{field_defs}
+'''
+
+_repr_template = '{name}=%r'
+
+_field_template = '''\
+    {name} = _property(_itemgetter({index:d}), doc='Alias for field number {index:d}')
+'''
+
+def _namedtuple_names(typename, field_names, rename):
+    '''Validate the type name and field names of a namedtuple, and return them
+    as a str and a list of str.
+
+    '''
+    # Validate the field names.  At the user's option, either generate an error
+    # message or automatically replace the field name with a valid name.
+    if isinstance(field_names, basestring):
+        field_names = field_names.replace(',', ' ').split()
+    field_names = map(str, field_names)
+    typename = str(typename)
+    if rename:
+        seen = set()
+        for index, name in enumerate(field_names):
+            if (not all(c.isalnum() or c=='_' for c in name)
+                or _iskeyword(name)
+                or not name
+                or name[0].isdigit()
+                or name.startswith('_')
+                or name in seen):
+                field_names[index] = '_%d' % index
+            seen.add(name)
+    for name in [typename] + field_names:
+        if type(name) != str:
+            raise TypeError('Type names and field names must be strings')
+        if not all(c.isalnum() or c=='_' for c in name):
+            raise ValueError('Type names and field names can only contain '
+                             'alphanumeric characters and underscores: %r' % name)
+        if _iskeyword(name):
+            raise ValueError('Type names and field names cannot be a '
+                             'keyword: %r' % name)
+        if name[0].isdigit():
+            raise ValueError('Type names and field names cannot start with '
+                             'a number: %r' % name)
+    seen = set()
+    for name in field_names:
+        if name.startswith('_') and not rename:
+            raise ValueError('Field names cannot start with an underscore: '
+                             '%r' % name)
+        if name in seen:
+            raise ValueError('Encountered duplicate field name: %r' % name)
+        seen.add(name)
+    return typename, field_names
+
+def namedtuple(typename, field_names, verbose=False, rename=False):
+    """Returns a new subclass of tuple with named fields.
+
+    >>> Point = namedtuple('Point', ['x', 'y'])
+    >>> Point.__doc__                   # docstring for the new class
+    'Point(x, y)'
+    >>> p = Point(11, y=22)             # instantiate with positional args or keywords
+    >>> p[0] + p[1]                     # indexable like a plain tuple
+    33
+    >>> x, y = p                        # unpack like a regular tuple
+    >>> x, y
+    (11, 22)
+    >>> p.x + p.y                       # fields also accessable by name
+    33
+    >>> d = p._asdict()                 # convert to a dictionary
+    >>> d['x']
+    11
+    >>> Point(**d)                      # convert from a dictionary
+    Point(x=11, y=22)
+    >>> p._replace(x=100)               # _replace() is like str.replace() but targets named fields
+    Point(x=100, y=22)
+
+    """
+
+    typename, field_names = _namedtuple_names(typename, field_names, rename)
+
+    # Fill-in the class template
+    class_definition = _class_template.format(
+        typename = typename,
+        field_names = tuple(field_names),
+        num_fields = len(field_names),
+        arg_list = repr(tuple(field_names)).replace("'", "")[1:-1],
+        repr_fmt = ', '.join(_repr_template.format(name=name)
+                             for name in field_names),
+        field_defs = '\n'.join(_field_template.format(index=index, name=name)
+                               for index, name in enumerate(field_names))
+    )
+    if verbose:
+        print class_definition
+
+    # Execute the template string in a temporary namespace and support
+    # tracing utilities by setting a value for frame.f_globals['__name__']
+    namespace = dict(_itemgetter=_itemgetter, __name__='namedtuple_%s' % typename,
+                     OrderedDict=OrderedDict, _property=property, _tuple=tuple)
+    try:
+        exec class_definition in namespace
+    except SyntaxError as e:
+        raise SyntaxError(e.message + ':\n' + class_definition)
+    result = namespace[typename]
+
+    # For pickling to work, the __module__ variable needs to be set to the frame
+    # where the named tuple is created.  Bypass this step in environments where
+    # sys._getframe is not defined (Jython for example) or sys._getframe is not
+    # defined for arguments greater than 0 (IronPython).
+    try:
+        result.__module__ = _sys._getframe(1).f_globals.get('__name__', '__main__')
+    except (AttributeError, ValueError):
+        pass
+
+    return result
+
+
+def _namedtuple_type(typename, field_names):
+    '''Build the class that namedtuple() would, with closures instead of exec.
+
+    The methods behave the same, except that __new__ takes *args and
+    **kwds and matches them to the fields itself, so creating an instance
+    is slower, and introspection shows no argument names.
+
+    '''
+    field_names = tuple(field_names)
+    num_fields = len(field_names)
+    arg_list = ', '.join(field_names)
+    repr_fmt = '%s(%s)' % (typename, ', '.join(_repr_template.format(name=name)
+                                              for name in field_names))
+
+    def __new__(_cls, *args, **kwds):
+        if kwds or len(args) != num_fields:
+            for name in kwds:
+                if name not in field_names:
+                    raise TypeError('__new__() got an unexpected keyword '
+                                    'argument %r' % name)
+                if field_names.index(name) < len(args):
+                    raise TypeError('__new__() got multiple values for keyword '
+                                    'argument %r' % name)
+            if len(args) + len(kwds) != num_fields:
+                raise TypeError('__new__() takes exactly %d arguments '
+                                '(%d given)' % (num_fields + 1,
+                                                len(args) + len(kwds) + 1))
+            args += tuple(kwds[name] for name in field_names[len(args):])
+        return tuple.__new__(_cls, args)
+
+    def _make(cls, iterable, new=tuple.__new__, len=len):
+        result = new(cls, iterable)
+        if len(result) != num_fields:
+            raise TypeError('Expected %d arguments, got %d' % (num_fields,
+                                                               len(result)))
+        return result
+
+    def __repr__(self):
+        return repr_fmt % self
+
+    def _asdict(self):
+        return OrderedDict(zip(self._fields, self))
+
+    def _replace(_self, **kwds):
+        result = _self._make(map(kwds.pop, field_names, _self))
+        if kwds:
+            raise ValueError('Got unexpected field names: %r' % kwds.keys())
+        return result
+
+    def __getnewargs__(self):
+        return tuple(self)
+
+    def __getstate__(self):
+        pass
+
+    __new__.__doc__ = 'Create new instance of %s(%s)' % (typename, arg_list)
+    _make.__doc__ = 'Make a new %s object from a sequence or iterable' % typename
+    __repr__.__doc__ = 'Return a nicely formatted representation string'
+    _asdict.__doc__ = 'Return a new OrderedDict which maps field names to their values'
+    _replace.__doc__ = ('Return a new %s object replacing specified fields '
+                        'with new values' % typename)
+    __getnewargs__.__doc__ = 'Return self as a plain tuple.  Used by copy and pickle.'
+    __getstate__.__doc__ = 'Exclude the OrderedDict from pickling'
+    namespace = {
+        '__doc__': '%s(%s)' % (typename, arg_list),
+        '__slots__': (),
+        '_fields': field_names,
+        '__new__': __new__,
+        '_make': classmethod(_make),
+        '__repr__': __repr__,
+        '_asdict': _asdict,
+        '_replace': _replace,
+        '__getnewargs__': __getnewargs__,
+        '__dict__': property(_asdict),
+        '__getstate__': __getstate__,
+    }
+    for index, name in enumerate(field_names):
+        namespace[name] = property(_itemgetter(index),
+                                   doc='Alias for field number %d' % index)
+    return type(typename, (tuple,), namespace)
+
+
+########################################################################
+###  LRUCache
+########################################################################
+
+_CacheInfo = namedtuple('CacheInfo', 'hits misses evictions maxsize currsize')
+
+class LRUCache(MutableMapping):
+    '''Mapping that holds at most maxsize items, discarding the least
+    recently used one to make room for a new one.  If ttl is given, items
+    also expire ttl seconds (as measured by timer) after they were set.
+
+    Reading an item with [] or get() counts as a hit or a miss, and a hit
+    makes the item the most recently used.  Iteration, keys(), items(),
+    values(), len(), "in" and == do neither, skip expired items, and go from
+    the least to the most recently used.
+
+    >>> cache = LRUCache(maxsize=2)
+    >>> cache['a'] = 1
+    >>> cache['b'] = 2
+    >>> cache['a']
+    1
+    >>> cache['c'] = 3                  # evicts 'b', the least recently used
+    >>> sorted(cache)
+    ['a', 'c']
+    >>> cache.get('b') is None
+    True
+    >>> cache.cache_info()
+    CacheInfo(hits=1, misses=1, evictions=1, maxsize=2, currsize=2)
+    >>> cache.items(), cache == {'a': 1, 'c': 3}
+    ([('a', 1), ('c', 3)], True)
+    >>> cache.cache_info().hits
+    1
+
+    >>> now = [0]
+    >>> cache = LRUCache(ttl=10, timer=lambda: now[0])
+    >>> cache['a'] = 1
+    >>> now[0] = 5
+    >>> cache['b'] = 2
+    >>> now[0] = 12                     # 'a' has expired
+    >>> len(cache), list(cache), cache.values(), 'a' in cache
+    (1, ['b'], [2], False)
+
+    '''
+    # The items live in an OrderedDict, in order of use.  A hit moves its key
+    # to the end with move_to_end(), which relinks a single link, so a hit is
+    # O(1) just like a miss or an eviction.  With a ttl, each value is stored
+    # as a (value, expiry time) pair.
+
+    def __init__(self, maxsize=128, ttl=None, timer=_time):
+        if maxsize is not None and maxsize < 0:
+            raise ValueError('maxsize must be None or >= 0, got %r' % (maxsize,))
+        self.__data = OrderedDict()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self.hits = self.misses = self.evictions = 0
+
+    def __getitem__(self, key):
+        data = self.__data
+        try:
+            value = data[key]
+        except KeyError:
+            self.misses += 1
+            raise
+        if self.ttl is not None:
+            value, expires = value
+            if expires <= self.timer():
+                del data[key]
+                self.misses += 1
+                raise KeyError(key)
+        data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def __setitem__(self, key, value):
+        data = self.__data
+        if key in data:
+            data.move_to_end(key)
+        elif self.maxsize is not None and len(data) >= self.maxsize:
+            if not self.maxsize:
+                return
+            data.popitem(last=False)
+            self.evictions += 1
+        if self.ttl is not None:
+            value = value, self.timer() + self.ttl
+        data[key] = value
+
+    def __delitem__(self, key):
+        del self.__data[key]
+
+    def __contains__(self, key):
+        if self.ttl is None:
+            return key in self.__data
+        entry = self.__data.get(key)
+        return entry is not None and entry[1] > self.timer()
+
+    # The Mapping mixins read the items through __getitem__, which would count
+    # hits and reorder the items while iterating over them, so everything
+    # that reads more than one item goes to the OrderedDict directly.  With a
+    # ttl, expired items are skipped but left for expire() or the next miss,
+    # which makes len() O(n).
+
+    def iteritems(self):
+        'c.iteritems() -> an iterator over the (key, value) pairs in c'
+        if self.ttl is None:
+            return self.__data.iteritems()
+        now = self.timer()
+        return ((key, value) for key, (value, expires) in self.__data.iteritems()
+                if expires > now)
+
+    def __iter__(self):
+        if self.ttl is None:
+            return iter(self.__data)
+        return (key for key, _ in self.iteritems())
+
+    iterkeys = __iter__
+
+    def itervalues(self):
+        'c.itervalues() -> an iterator over the values in c'
+        return (value for _, value in self.iteritems())
+
+    def keys(self):
+        'c.keys() -> list of keys in c'
+        return list(self)
+
+    def items(self):
+        'c.items() -> list of (key, value) pairs in c'
+        return list(self.iteritems())
+
+    def values(self):
+        'c.values() -> list of values in c'
+        return list(self.itervalues())
+
+    def __len__(self):
+        if self.ttl is None:
+            return len(self.__data)
+        return sum(1 for _ in self.iteritems())
+
+    def __eq__(self, other):
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        return dict(self.iteritems()) == dict(other.items())
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def clear(self):
+        'Remove all items.  The counters are kept.'
+        self.__data.clear()
+
+    def expire(self):
+        '''Remove the items whose ttl has passed, and return how many there
+        were.
+
+        '''
+        if self.ttl is None:
+            return 0
+        now = self.timer()
+        data = self.__data
+        expired = [key for key, (_, expires) in data.iteritems() if expires <= now]
+        for key in expired:
+            del data[key]
+        return len(expired)
+
+    def cache_info(self):
+        'Report the hits, misses, evictions, maxsize and current size.'
+        return _CacheInfo(self.hits, self.misses, self.evictions, self.maxsize,
+                          len(self))
+
+    def __repr__(self):
+        return '%s(maxsize=%r, ttl=%r, currsize=%d)' % (
+            self.__class__.__name__, self.maxsize, self.ttl, len(self))
+
+
+########################################################################
+###  cached_namedtuple
+########################################################################
+
+_namedtuple_cache = LRUCache(maxsize=256)
+
+def cached_namedtuple(typename, field_names, rename=False, module=None,
+                      use_exec=True):
+    '''Like namedtuple(), but return the same class when called again with
+    the same type name, field names, rename flag and module.
+
+    Validating the names and exec-ing the class template is the bulk of the
+    cost of namedtuple(), which adds up when record types are made on the
+    fly from schemas.  The classes are kept in cached_namedtuple.cache, an
+    LRUCache holding the 256 most recently used ones (set its maxsize to
+    change that).  The module defaults to that of the caller, as with
+    namedtuple().  If use_exec is false, the class is built without exec
+    (see _namedtuple_type), for environments where exec is not allowed.
+
+    >>> Point = cached_namedtuple('Point', 'x y')
+    >>> Point is cached_namedtuple('Point', ['x', 'y'])
+    True
+    >>> Point(1, y=2)
+    Point(x=1, y=2)
+    >>> cached_namedtuple('Point', 'x y', use_exec=False)(1, y=2)
+    Point(x=1, y=2)
+    >>> cached_namedtuple('Pair', (name for name in ['a', 'b']))._fields
+    ('a', 'b')
+
+    '''
+    if isinstance(field_names, basestring):
+        field_names = field_names.replace(',', ' ').split()
+    # the key and namedtuple() both read the field names, so an iterator
+    # must only be consumed once
+    field_names = list(field_names)
+    if module is None:
+        try:
+            module = _sys._getframe(1).f_globals.get('__name__', '__main__')
+        except (AttributeError, ValueError):
+            pass
+    key = (str(typename), tuple(map(str, field_names)), bool(rename), module,
+           bool(use_exec))
+    cache = cached_namedtuple.cache
+    try:
+        return cache[key]
+    except KeyError:
+        pass
+    if use_exec:
+        result = namedtuple(typename, field_names, rename=rename)
+    else:
+        result = _namedtuple_type(*_namedtuple_names(typename, field_names,
+                                                     rename))
+    if module is not None:
+        result.__module__ = module
+    cache[key] = result
+    return result
+
+cached_namedtuple.cache = _namedtuple_cache
+
+
+########################################################################
+###  recordtype
+########################################################################
+
+_record_template = '''\
+class {typename}(object):
+    '{typename}({arg_list})'
+
+    __slots__ = {field_names!r}
+
+    _fields = {field_names!r}
+
+    def __init__(_self, {arg_list}):{init_type}
+        'Create new instance of {typename}({arg_list})'
+        {assign_self}
+
+    @classmethod
+    def _make(cls, iterable, new=object.__new__, tuple=tuple, len=len):
+        'Make a new {typename} object from a sequence or iterable'
+        values = tuple(iterable)
+        if len(values) != {num_fields:d}:
+            raise TypeError('Expected {num_fields:d} arguments, got %d' % len(values))
+        self = new(cls)
+        {assign_values}
+        return self
+
+    def __iter__(self):
+        'Iterate over the field values, in order'
+        return iter(({self_values}))
+
+    def __len__(self):
+        return {num_fields:d}
+
+    def __repr__(self):
+        'Return a nicely formatted representation string'
+        return '{typename}({repr_fmt})' % ({self_values})
+
+    def __eq__(self, other):
+        if not isinstance(other, {typename}):
+            return NotImplemented
+        return ({self_values}) == ({other_values})
+
+    def __ne__(self, other):
+        if not isinstance(other, {typename}):
+            return NotImplemented
+        return ({self_values}) != ({other_values})
+
+    __hash__ = None
 
     def _asdict(self):
         'Return a new OrderedDict which maps field names to their values'
@@ -271,120 +1241,232 @@ class {typename}(tuple):
             raise ValueError('Got unexpected field names: %r' % kwds.keys())
         return result
 
-    def __getnewargs__(self):
-        'Return self as a plain tuple.  Used by copy and pickle.'
-        return tuple(self)
-
-    __dict__ = _property(_asdict)
-
-    def __getstate__(self):
-        'Exclude the OrderedDict from pickling'
-        pass
-
-{field_defs}
-'''
-
-_repr_template = '{name}=%r'
+    def _update(_self, **kwds):
+        'Set the specified fields to new values, in place'
+        for name in kwds:
+            if name not in {field_names!r}:
+                raise ValueError('Got unexpected field names: %r' % kwds.keys())
+        for name, value in kwds.iteritems():
+            _setattr(_self, name, value)
 
-_field_template = '''\
-    {name} = _property(_itemgetter({index:d}), doc='Alias for field number {index:d}')
+    def __reduce__(self):
+        'Return the class and the field values.  Used by copy and pickle.'
+        return (self.__class__, ({self_values}))
 '''
 
-def namedtuple(typename, field_names, verbose=False, rename=False):
-    """Returns a new subclass of tuple with named fields.
-
-    >>> Point = namedtuple('Point', ['x', 'y'])
-    >>> Point.__doc__                   # docstring for the new class
-    'Point(x, y)'
-    >>> p = Point(11, y=22)             # instantiate with positional args or keywords
-    >>> p[0] + p[1]                     # indexable like a plain tuple
-    33
-    >>> x, y = p                        # unpack like a regular tuple
+def recordtype(typename, field_names, verbose=False, rename=False,
+               field_types=None):
+    """Returns a new class with named fields held in __slots__.
+
+    The class has the interface of a namedtuple() class (_fields, _make(),
+    _asdict(), _replace(), iteration and unpacking), but its instances are
+    mutable: fields are set in place, or several at a time with _update(),
+    instead of building a new tuple, and reading a field is a slot lookup
+    rather than a property call.  Records compare equal when they are of
+    the same type and hold equal values, and are not hashable.
+
+    >>> Point = recordtype('Point', ['x', 'y'])
+    >>> p = Point(11, y=22)
+    >>> p.x += 1                        # fields can be set in place
+    >>> p
+    Point(x=12, y=22)
+    >>> p._update(x=1, y=2)             # several at once
+    >>> x, y = p                        # unpack like a namedtuple
     >>> x, y
-    (11, 22)
-    >>> p.x + p.y                       # fields also accessable by name
-    33
-    >>> d = p._asdict()                 # convert to a dictionary
-    >>> d['x']
-    11
-    >>> Point(**d)                      # convert from a dictionary
-    Point(x=11, y=22)
-    >>> p._replace(x=100)               # _replace() is like str.replace() but targets named fields
-    Point(x=100, y=22)
+    (1, 2)
+    >>> p._replace(x=100)               # _replace() still returns a new record
+    Point(x=100, y=2)
+    >>> Point._make([3, 4])._asdict()
+    OrderedDict([('x', 3), ('y', 4)])
+    >>> recordtype('Person', 'self other')('me', 'you')
+    Person(self='me', other='you')
+
+    If field_types is given, it is a sequence of the types of the fields,
+    which is kept in the _field_types attribute and in the type comment of
+    __init__ (see TypedRecord).  They are not checked.
 
     """
 
-    # Validate the field names.  At the user's option, either generate an error
-    # message or automatically replace the field name with a valid name.
-    if isinstance(field_names, basestring):
-        field_names = field_names.replace(',', ' ').split()
-    field_names = map(str, field_names)
-    typename = str(typename)
-    if rename:
-        seen = set()
-        for index, name in enumerate(field_names):
-            if (not all(c.isalnum() or c=='_' for c in name)
-                or _iskeyword(name)
-                or not name
-                or name[0].isdigit()
-                or name.startswith('_')
-                or name in seen):
-                field_names[index] = '_%d' % index
-            seen.add(name)
-    for name in [typename] + field_names:
-        if type(name) != str:
-            raise TypeError('Type names and field names must be strings')
-        if not all(c.isalnum() or c=='_' for c in name):
-            raise ValueError('Type names and field names can only contain '
-                             'alphanumeric characters and underscores: %r' % name)
-        if _iskeyword(name):
-            raise ValueError('Type names and field names cannot be a '
-                             'keyword: %r' % name)
-        if name[0].isdigit():
-            raise ValueError('Type names and field names cannot start with '
-                             'a number: %r' % name)
-    seen = set()
-    for name in field_names:
-        if name.startswith('_') and not rename:
-            raise ValueError('Field names cannot start with an underscore: '
-                             '%r' % name)
-        if name in seen:
-            raise ValueError('Encountered duplicate field name: %r' % name)
-        seen.add(name)
+    typename, field_names = _namedtuple_names(typename, field_names, rename)
+    if field_types is not None:
+        field_types = tuple(field_types)
+        if len(field_types) != len(field_names):
+            raise TypeError('Expected %d field types, got %d'
+                            % (len(field_names), len(field_types)))
+        init_type = '  # type: (%s) -> None' % ', '.join(
+            t if isinstance(t, basestring) else getattr(t, '__name__', repr(t))
+            for t in field_types)
+    else:
+        init_type = ''
 
     # Fill-in the class template
-    class_definition = _class_template.format(
+    arg_list = ', '.join(field_names)
+    arg_values = arg_list
+    self_values = ', '.join('self.%s' % name for name in field_names)
+    # __init__ names its instance _self, since a field may be called self
+    init_values = ', '.join('_self.%s' % name for name in field_names)
+    if len(field_names) == 1:
+        arg_values += ','
+        self_values += ','
+        init_values += ','
+    class_definition = _record_template.format(
         typename = typename,
         field_names = tuple(field_names),
         num_fields = len(field_names),
-        arg_list = repr(tuple(field_names)).replace("'", "")[1:-1],
+        arg_list = arg_list,
+        init_type = init_type,
+        assign_self = '%s = %s' % (init_values, arg_values) if field_names else 'pass',
+        assign_values = '%s = values' % self_values if field_names else 'pass',
+        self_values = self_values,
+        other_values = self_values.replace('self.', 'other.'),
         repr_fmt = ', '.join(_repr_template.format(name=name)
                              for name in field_names),
-        field_defs = '\n'.join(_field_template.format(index=index, name=name)
-                               for index, name in enumerate(field_names))
     )
     if verbose:
         print class_definition
 
-    # Execute the template string in a temporary namespace and support
-    # tracing utilities by setting a value for frame.f_globals['__name__']
-    namespace = dict(_itemgetter=_itemgetter, __name__='namedtuple_%s' % typename,
-                     OrderedDict=OrderedDict, _property=property, _tuple=tuple)
+    namespace = dict(__name__='recordtype_%s' % typename,
+                     OrderedDict=OrderedDict, _setattr=setattr)
     try:
         exec class_definition in namespace
     except SyntaxError as e:
         raise SyntaxError(e.message + ':\n' + class_definition)
     result = namespace[typename]
+    if field_types is not None:
+        result._field_types = OrderedDict(zip(field_names, field_types))
 
-    # For pickling to work, the __module__ variable needs to be set to the frame
-    # where the named tuple is created.  Bypass this step in environments where
-    # sys._getframe is not defined (Jython for example) or sys._getframe is not
-    # defined for arguments greater than 0 (IronPython).
+    # For pickling to work, the __module__ variable needs to be set to the
+    # frame where the record type is created (see namedtuple).
+    try:
+        result.__module__ = _sys._getframe(1).f_globals.get('__name__', '__main__')
+    except (AttributeError, ValueError):
+        pass
+
+    return result
+
+def TypedRecord(typename, fields, verbose=False):
+    """Typed version of recordtype(), declared like typing.NamedTuple: fields
+    is a sequence of (name, type) pairs.
+
+    >>> Employee = TypedRecord('Employee', [('name', str), ('id', int)])
+    >>> Employee._field_types
+    OrderedDict([('name', <type 'str'>), ('id', <type 'int'>)])
+    >>> Employee('Guido', 1)
+    Employee(name='Guido', id=1)
+
+    """
+    fields = list(fields)
+    result = recordtype(typename, [name for name, _ in fields], verbose,
+                        field_types=[type_ for _, type_ in fields])
     try:
         result.__module__ = _sys._getframe(1).f_globals.get('__name__', '__main__')
     except (AttributeError, ValueError):
         pass
+    return result
+
+
+########################################################################
+###  columnar records
+########################################################################
+
+def _make_all(cls, rows, check):
+    'Return a list of cls records made from rows, with the gc paused.'
+    # A batch of records is as many new containers, so the cyclic garbage
+    # collector would keep running over them while they are made.
+    collecting = _gc.isenabled()
+    if collecting:
+        _gc.disable()
+    try:
+        if issubclass(cls, tuple):
+            result = list(_imap(tuple.__new__, _repeat(cls), rows))
+            if check:
+                num_fields = len(cls._fields)
+                lengths = set(_imap(len, result))
+                lengths.discard(num_fields)
+                if lengths:
+                    raise TypeError('Expected %d arguments, got %d'
+                                    % (num_fields, lengths.pop()))
+        else:
+            result = map(cls._make, rows)
+    finally:
+        if collecting:
+            _gc.enable()
+    return result
+
+def make_records(cls, rows):
+    '''Return a list of cls records made from an iterable of rows, as
+    map(cls._make, rows) would, in one call.
+
+    cls is a class made by namedtuple(), cached_namedtuple() or
+    recordtype().  namedtuple records are made by tuple.__new__ directly,
+    the way their _make() makes them, without a Python call per row.
+
+    >>> Point = namedtuple('Point', 'x y')
+    >>> make_records(Point, [(1, 2), (3, 4)])
+    [Point(x=1, y=2), Point(x=3, y=4)]
+
+    '''
+    return _make_all(cls, rows, True)
+
+def from_columns(cls, columns):
+    '''Return a list of cls records made from one sequence per field.
+
+    columns is either a sequence of columns in the order of cls._fields, or
+    a mapping of field names to columns, like the one to_columns() returns.
+    The columns must all have the same length.
 
+    >>> Point = namedtuple('Point', 'x y')
+    >>> from_columns(Point, [[1, 3], [2, 4]])
+    [Point(x=1, y=2), Point(x=3, y=4)]
+    >>> from_columns(Point, {'y': [2, 4], 'x': [1, 3]})
+    [Point(x=1, y=2), Point(x=3, y=4)]
+
+    '''
+    fields = cls._fields
+    if isinstance(columns, Mapping):
+        missing = [name for name in fields if name not in columns]
+        if missing or len(columns) != len(fields):
+            raise ValueError('Expected columns for the fields %r, got %r'
+                             % (fields, sorted(columns)))
+        columns = [columns[name] for name in fields]
+    else:
+        columns = list(columns)
+        if len(columns) != len(fields):
+            raise TypeError('Expected %d columns, got %d'
+                            % (len(fields), len(columns)))
+    if len(set(_imap(len, columns))) > 1:
+        raise ValueError('Columns have different lengths: %r'
+                         % map(len, columns))
+    if not columns:
+        return []
+    # izip makes each row with the right length, so they need no checking
+    return _make_all(cls, _izip(*columns), False)
+
+def to_columns(records, fields=None):
+    '''Split a sequence of records into one list per field, and return an
+    OrderedDict of field names to lists.
+
+    fields defaults to the _fields of the first record; it must be given
+    to get the (empty) columns of no records.
+
+    >>> Point = namedtuple('Point', 'x y')
+    >>> to_columns([Point(1, 2), Point(3, 4)])
+    OrderedDict([('x', [1, 3]), ('y', [2, 4])])
+
+    '''
+    if fields is None:
+        if not records:
+            return OrderedDict()
+        fields = records[0]._fields
+    result = OrderedDict()
+    if records and isinstance(records[0], tuple):
+        # a field is an index of the tuple: use the position in _fields
+        positions = records[0]._fields
+        for name in fields:
+            result[name] = map(_itemgetter(positions.index(name)), records)
+    else:
+        for name in fields:
+            result[name] = map(_attrgetter(name), records)
     return result
 
 
@@ -392,6 +1474,47 @@ def namedtuple(typename, field_names, verbose=False, rename=False):
 ###  Counter
 ########################################################################
 
+def _iter_ranked(elems, counts):
+    'Yield the elems and their counts from the highest count down.'
+    # Each round takes the nlargest() of a block eight times larger than the
+    # last, and yields the ones not yet yielded, which is one bounded-heap
+    # pass over the counts for the first 256, two for the first 2048, and
+    # so on.  Once the block would be an eighth of the counts, they are
+    # sorted.  The heap holds (count, -position) pairs, which compare in C,
+    # rank equal counts in iteration order as most_common() does, and never
+    # compare the elements; so each block also starts with the previous one.
+    size = 256
+    done = 0
+    while done < len(counts):
+        pairs = _izip(counts, _count(0, -1))
+        if size * 8 >= len(counts):
+            block = sorted(pairs, reverse=True)
+        else:
+            block = _heapq.nlargest(size, pairs)
+        for count, position in _islice(block, done, None):
+            yield elems[-position], count
+        done = len(block)
+        size *= 8
+
+def _count_elements(elements):
+    'Return a dict of the counts of elements.  Run in the workers of a pool.'
+    counts = {}
+    counts_get = counts.get
+    for elem in elements:
+        counts[elem] = counts_get(elem, 0) + 1
+    return counts
+
+# The sequences being counted by count_parallel(), by a key that is sent to
+# the workers instead of the elements.  The workers are forked after the
+# sequence is added, so they have it already.
+_parallel_inputs = {}
+_parallel_keys = _count()
+
+def _count_slice(task):
+    'Return a dict of the counts of a slice of a sequence in _parallel_inputs.'
+    key, start, stop = task
+    return _count_elements(_parallel_inputs[key][start:stop])
+
 class Counter(dict):
     '''Dict subclass for counting hashable items.  Sometimes called a bag
     or multiset.  Elements are stored as dictionary keys and their counts
@@ -480,7 +1603,23 @@ class Counter(dict):
         # Emulate Bag.sortedByCount from Smalltalk
         if n is None:
             return sorted(self.iteritems(), key=_itemgetter(1), reverse=True)
-        return _heapq.nlargest(n, self.iteritems(), key=_itemgetter(1))
+        # rank (count, -position) pairs, as _iter_ranked() does
+        elems = self.keys()
+        return [(elems[-position], count) for count, position in
+                _heapq.nlargest(n, _izip(self.itervalues(), _count(0, -1)))]
+
+    def iter_most_common(self):
+        '''Iterate over the elements and their counts from the most common to
+        the least, as most_common() would list them, without sorting them
+        all when only the first few are taken.  The counts are those at the
+        time of the call.
+
+        >>> it = Counter('abcdeabcdabcaba').iter_most_common()
+        >>> next(it), next(it)
+        (('a', 5), ('b', 4))
+
+        '''
+        return _iter_ranked(self.keys(), self.values())
 
     def elements(self):
         '''Iterator over elements repeating each as many times as its count.
@@ -504,6 +1643,69 @@ class Counter(dict):
         # Emulate Bag.do from Smalltalk and Multiset.begin from C++.
         return _chain.from_iterable(_starmap(_repeat, self.iteritems()))
 
+    @classmethod
+    def merge_many(cls, counters):
+        '''Return a new counter with the sum of the counts of all the given
+        counters (or mappings), as if they were passed to update() in turn.
+        Unlike a chain of +, no intermediate counter is made, and zero and
+        negative counts are kept.
+
+        >>> Counter.merge_many([Counter('abb'), Counter('bcc'), {'d': 1}])
+        Counter({'b': 3, 'c': 2, 'a': 1, 'd': 1})
+
+        '''
+        # The largest is added first, into the empty counter, which update()
+        # does with one dict.update(); the others are added key by key.
+        counters = sorted(counters, key=len, reverse=True)
+        result = cls()
+        for counter in counters:
+            result.update(counter)
+        return result
+
+    @classmethod
+    def count_parallel(cls, iterable, processes=None, chunksize=1000000):
+        '''Count the elements of iterable in a pool of processes (of
+        multiprocessing.Pool(processes)), and return a new counter.
+
+        The elements are counted in chunks of at most chunksize, one chunk
+        per task, and the counts of each chunk are merged as they come
+        back.  A list or tuple is shared with the workers when they are
+        forked, and each task is a range of it; the elements of any other
+        iterable are pickled to the workers, which costs about as much as
+        counting them, so it only pays with several processes.
+
+        >>> Counter.count_parallel('abracadabra', processes=2, chunksize=4)
+        Counter({'a': 5, 'r': 2, 'b': 2, 'c': 1, 'd': 1})
+
+        '''
+        from multiprocessing import Pool, cpu_count
+        if processes is None:
+            processes = cpu_count()
+        key = None
+        if isinstance(iterable, (list, tuple)) and _sys.platform != 'win32':
+            key = next(_parallel_keys)
+            _parallel_inputs[key] = iterable
+            # at least one chunk per process
+            chunksize = max(1, min(chunksize, -(-len(iterable) // processes)))
+            func = _count_slice
+            tasks = [(key, start, start + chunksize)
+                     for start in xrange(0, len(iterable), chunksize)]
+        else:
+            func = _count_elements
+            it = iter(iterable)
+            tasks = iter(lambda: list(_islice(it, chunksize)), [])
+        result = cls()
+        try:
+            pool = Pool(processes)
+            try:
+                for counts in pool.imap_unordered(func, tasks):
+                    result.update(counts)
+            finally:
+                pool.terminate()
+        finally:
+            _parallel_inputs.pop(key, None)
+        return result
+
     # Override dict methods where necessary
 
     @classmethod
@@ -693,6 +1895,380 @@ class Counter(dict):
                 result[elem] = newcount
         return result
 
+    # The in-place operators change the counts of the elements of other,
+    # dropping those that end up zero or negative as they go, then drop the
+    # zero or negative counts that were already in self, so that they give
+    # the same counts as the binary operators (and c += Counter() strips
+    # them).  That last step makes them O(len(c)) rather than O(len(other)),
+    # but it is a scan in C that usually finds nothing to drop.  &= keeps
+    # only the positive minimums in the first place.
+
+    def _keep_positive(self):
+        'Internal method to strip elements with a negative or zero count'
+        if all(_imap(_gt, self.itervalues(), _repeat(0))):
+            return self
+        nonpositive = [elem for elem, count in self.iteritems() if not count > 0]
+        for elem in nonpositive:
+            del self[elem]
+        return self
+
+    def __iadd__(self, other):
+        '''Inplace add from another counter, keeping only positive counts.
+
+        >>> c = Counter('abbb')
+        >>> c += Counter('bcc')
+        >>> c
+        Counter({'b': 4, 'c': 2, 'a': 1})
+        >>> c = Counter(a=1, b=-2, z=0)
+        >>> c += Counter()              # strips zero and negative counts
+        >>> c
+        Counter({'a': 1})
+
+        '''
+        if not isinstance(other, Counter):
+            return NotImplemented
+        self_get = self.get
+        for elem, count in (other.items() if other is self else other.iteritems()):
+            newcount = self_get(elem, 0) + count
+            if newcount > 0:
+                self[elem] = newcount
+            elif elem in self:
+                del self[elem]
+        return self._keep_positive()
+
+    def __isub__(self, other):
+        '''Inplace subtract counter, but keep only results with positive counts.
+
+        >>> c = Counter('abbbc')
+        >>> c -= Counter('bccd')
+        >>> c
+        Counter({'b': 2, 'a': 1})
+
+        '''
+        if not isinstance(other, Counter):
+            return NotImplemented
+        self_get = self.get
+        for elem, count in (other.items() if other is self else other.iteritems()):
+            newcount = self_get(elem, 0) - count
+            if newcount > 0:
+                self[elem] = newcount
+            elif elem in self:
+                del self[elem]
+        return self._keep_positive()
+
+    def __ior__(self, other):
+        '''Inplace union is the maximum of value from either counter.
+
+        >>> c = Counter('abbb')
+        >>> c |= Counter('bcc')
+        >>> c
+        Counter({'b': 3, 'c': 2, 'a': 1})
+
+        '''
+        if not isinstance(other, Counter):
+            return NotImplemented
+        self_get = self.get
+        for elem, other_count in (other.items() if other is self else other.iteritems()):
+            if other_count > 0 and other_count > self_get(elem, 0):
+                self[elem] = other_count
+        return self._keep_positive()
+
+    def __iand__(self, other):
+        '''Inplace intersection is the minimum of corresponding counts.
+
+        >>> c = Counter('abbb')
+        >>> c &= Counter('bcc')
+        >>> c
+        Counter({'b': 1})
+
+        '''
+        if not isinstance(other, Counter):
+            return NotImplemented
+        # look up the elements of the smaller counter in the larger one
+        small, large = (self, other) if len(self) <= len(other) else (other, self)
+        kept = {}
+        for elem, count in small.iteritems():
+            if elem in large:
+                other_count = large[elem]
+                newcount = count if count < other_count else other_count
+                if newcount > 0:
+                    kept[elem] = newcount
+        self.clear()
+        self.update(kept)
+        return self
+
+
+class TopKCounter(Counter):
+    '''Counter that keeps track of its k most common elements as counts
+    change, so that most_common(n) for n <= k does not look at the other
+    elements.
+
+    >>> c = TopKCounter(2, 'abracadabra')
+    >>> c.most_common(2)
+    [('a', 5), ('r', 2)]
+    >>> c.update('ccc')
+    >>> c.most_common(2)
+    [('a', 5), ('c', 4)]
+    >>> c.most_common()                 # n > k, or None, counts everything
+    [('a', 5), ('c', 4), ('r', 2), ('b', 2), ('d', 1)]
+
+    Which of several elements with the same count come first, and which are
+    kept among those tied for the k-th place, may differ from Counter.
+
+    '''
+    # The tracked elements are in __top, which maps each to its entry in
+    # __heap, a min-heap of [count, sequence number, element] lists, so the
+    # smallest tracked count, the floor, is at the top.  Every untracked
+    # element has a count no greater than the floor, and there are none
+    # while fewer than k elements are tracked.  A count that rises above
+    # the floor replaces the floor element; an entry whose count changes is
+    # marked dead (its element becomes _tombstone) and a new one pushed, and
+    # the heap is rebuilt without the dead entries when they outnumber the
+    # live ones.
+    #
+    # When a tracked count falls below the floor, or a tracked element is
+    # deleted, an untracked element may now belong in the top k, and which
+    # one is unknown: the tracking is marked stale and rebuilt from all the
+    # counts by the next call to most_common().  Bulk loads into an empty
+    # counter are also counted first and tracked afterwards.
+
+    def __init__(*args, **kwds):
+        '''Create a new TopKCounter tracking the k most common elements, and
+        count elements from an input iterable or mapping, as Counter().
+
+        '''
+        if len(args) < 2:
+            raise TypeError('__init__() needs the number of elements to track')
+        self, k = args[:2]
+        args = args[2:]
+        if len(args) > 1:
+            raise TypeError('expected at most 2 arguments, got %d' % (len(args) + 1))
+        if k < 1:
+            raise ValueError('k must be at least 1, got %r' % (k,))
+        self.__k = k
+        self.__top = {}
+        self.__heap = []
+        self.__sequence = _count()
+        self.__ranked = None
+        self.__stale = False
+        Counter.__init__(self, *args, **kwds)
+
+    @property
+    def k(self):
+        'The number of most common elements tracked.'
+        return self.__k
+
+    def __track(self, elem, count):
+        'Push a live entry for elem.'
+        entry = [count, next(self.__sequence), elem]
+        self.__top[elem] = entry
+        heap = self.__heap
+        _heapq.heappush(heap, entry)
+        if len(heap) > 2 * self.__k + 8:
+            heap[:] = [e for e in heap if e[2] is not _tombstone]
+            _heapq.heapify(heap)
+
+    def __floor(self):
+        'Drop the dead entries at the top of the heap, and return its minimum.'
+        heap = self.__heap
+        while heap[0][2] is _tombstone:
+            _heapq.heappop(heap)
+        return heap[0][0]
+
+    def __note(self, elem, count):
+        'Update the tracking for elem, whose count is now count.'
+        if self.__stale:
+            return
+        top = self.__top
+        entry = top.get(elem)
+        if entry is None:
+            if len(top) < self.__k:
+                self.__track(elem, count)
+            elif count > self.__floor():
+                # the floor element leaves the top k
+                del top[_heapq.heappop(self.__heap)[2]]
+                self.__track(elem, count)
+            else:
+                return
+        else:
+            old = entry[0]
+            if count == old:
+                return
+            if count < old and count < self.__floor() and \
+                    len(self) > len(top):
+                self.__stale = True
+                return
+            entry[2] = _tombstone
+            self.__track(elem, count)
+        self.__ranked = None
+
+    def __forget(self, elem):
+        'Update the tracking for elem, which was removed.'
+        entry = self.__top.pop(elem, None)
+        if entry is not None:
+            entry[2] = _tombstone
+            self.__ranked = None
+            if len(self) > len(self.__top):
+                self.__stale = True
+
+    def __rebuild(self):
+        'Track the k most common elements again, from all the counts.'
+        self.__top = {}
+        self.__heap = []
+        self.__ranked = None
+        self.__stale = False
+        for elem, count in _heapq.nlargest(self.__k, self.iteritems(),
+                                           key=_itemgetter(1)):
+            self.__track(elem, count)
+
+    def most_common(self, n=None):
+        '''List the n most common elements and their counts from the most
+        common to the least.  If n is None, then list all element counts.
+        The tracked elements answer for n <= k.
+
+        >>> TopKCounter(2, 'abracadabra').most_common(-1)
+        []
+
+        '''
+        if n is None or n > self.__k:
+            return Counter.most_common(self, n)
+        if n <= 0:
+            return []
+        if self.__stale:
+            self.__rebuild()
+        if self.__ranked is None:
+            self.__ranked = sorted(((entry[2], entry[0])
+                                    for entry in self.__top.itervalues()),
+                                   key=_itemgetter(1), reverse=True)
+        return self.__ranked[:n]
+
+    def __setitem__(self, elem, count):
+        dict.__setitem__(self, elem, count)
+        self.__note(elem, count)
+
+    def __delitem__(self, elem):
+        'Like dict.__delitem__() but does not raise KeyError for missing values.'
+        if elem in self:
+            dict.__delitem__(self, elem)
+            self.__forget(elem)
+
+    def pop(self, elem, *default):
+        if elem in self:
+            count = dict.pop(self, elem)
+            self.__forget(elem)
+            return count
+        return dict.pop(self, elem, *default)
+
+    def popitem(self):
+        elem, count = dict.popitem(self)
+        self.__forget(elem)
+        return elem, count
+
+    def setdefault(self, elem, default=None):
+        if elem not in self:
+            self[elem] = default
+        return dict.__getitem__(self, elem)
+
+    def clear(self):
+        dict.clear(self)
+        self.__rebuild()
+
+    def update(*args, **kwds):
+        '''Like Counter.update().  The elements of an iterable are counted
+        first, so that the tracking is updated once per distinct element.
+
+        '''
+        if not args:
+            raise TypeError("descriptor 'update' of 'TopKCounter' object "
+                            "needs an argument")
+        self = args[0]
+        args = args[1:]
+        if len(args) > 1:
+            raise TypeError('expected at most 1 arguments, got %d' % len(args))
+        iterable = args[0] if args else None
+        if iterable is not None:
+            if not isinstance(iterable, Mapping):
+                iterable = Counter(iterable)
+            if not self:
+                dict.update(self, iterable)
+                self.__stale = True
+            else:
+                self_get = self.get
+                for elem, count in iterable.iteritems():
+                    self[elem] = self_get(elem, 0) + count
+        if kwds:
+            self.update(kwds)
+
+    def subtract(*args, **kwds):
+        '''Like Counter.subtract().  The elements of an iterable are counted
+        first, so that the tracking is updated once per distinct element.
+
+        '''
+        if not args:
+            raise TypeError("descriptor 'subtract' of 'TopKCounter' object "
+                            "needs an argument")
+        self = args[0]
+        args = args[1:]
+        if len(args) > 1:
+            raise TypeError('expected at most 1 arguments, got %d' % len(args))
+        iterable = args[0] if args else None
+        if iterable is not None:
+            if not isinstance(iterable, Mapping):
+                iterable = Counter(iterable)
+            Counter.subtract(self, iterable)
+        if kwds:
+            self.subtract(kwds)
+
+    @classmethod
+    def merge_many(cls, counters, k=None):
+        '''Like Counter.merge_many(), for a new TopKCounter tracking the k
+        most common elements.  k defaults to the largest k of the
+        TopKCounters among counters.
+
+        >>> TopKCounter.merge_many([Counter('abb'), {'c': 3}], k=1)
+        TopKCounter(1, {'c': 3, 'b': 2, 'a': 1})
+        >>> TopKCounter.merge_many([TopKCounter(2, 'abb'), TopKCounter(1, 'c')]).k
+        2
+
+        '''
+        counters = list(counters)
+        if k is None:
+            ks = [counter.k for counter in counters
+                  if isinstance(counter, TopKCounter)]
+            if not ks:
+                raise TypeError('merge_many() needs the number of elements '
+                                'to track, unless a TopKCounter is merged')
+            k = max(ks)
+        # the merged counts are tracked once, by the bulk load of update()
+        return cls(k, Counter.merge_many(counters))
+
+    @classmethod
+    def count_parallel(cls, iterable, processes=None, chunksize=1000000, k=None):
+        '''Like Counter.count_parallel(), for a new TopKCounter tracking the
+        k most common elements.  k is required.
+
+        >>> TopKCounter.count_parallel('abracadabra', processes=2, chunksize=4, k=1)
+        TopKCounter(1, {'a': 5, 'r': 2, 'b': 2, 'c': 1, 'd': 1})
+
+        '''
+        if k is None:
+            raise TypeError('count_parallel() needs the number of elements '
+                            'to track')
+        return cls(k, Counter.count_parallel(iterable, processes, chunksize))
+
+    def copy(self):
+        'Return a shallow copy.'
+        return self.__class__(self.__k, self)
+
+    def __reduce__(self):
+        return self.__class__, (self.__k, dict(self))
+
+    def __repr__(self):
+        if not self:
+            return '%s(%d)' % (self.__class__.__name__, self.__k)
+        items = ', '.join(map('%r: %r'.__mod__, self.most_common()))
+        return '%s(%d, {%s})' % (self.__class__.__name__, self.__k, items)
+
 
 if __name__ == '__main__':
     # verify that instances can be pickled
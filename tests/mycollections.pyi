@@ -9,7 +9,7 @@
 from typing import (
     Any, Container, Dict, Generic, TypeVar, Iterable, Tuple, Callable, Mapping, overload,
     Iterator, Type, Sized, Optional, List, Set, Sequence, Union, Reversible,
-    MutableMapping, MutableSet, MutableSequence,
+    MutableMapping, MutableSet, MutableSequence, NamedTuple,
 )
 import typing
 
@@ -21,6 +21,44 @@ _VT = TypeVar('_VT')
 def namedtuple(typename: Union[str, unicode], field_names: Union[str, unicode, Iterable[Any]], *,
                verbose: bool = ..., rename: bool = ...) -> Type[tuple]: ...
 
+def cached_namedtuple(typename: Union[str, unicode],
+                      field_names: Union[str, unicode, Iterable[Any]],
+                      rename: bool = ..., module: Optional[str] = ...,
+                      use_exec: bool = ...) -> Type[tuple]: ...
+
+_R = TypeVar('_R', bound='_Record')
+
+class _Record(Sized, Iterable[Any]):
+    # The base of the classes made by recordtype() and TypedRecord(); it does
+    # not exist at runtime.  The checker cannot know the fields, so they are Any.
+    _fields = ...  # type: Tuple[str, ...]
+    _field_types = ...  # type: OrderedDict[str, Any]
+    def __init__(self, *args: Any, **kwds: Any) -> None: ...
+    @classmethod
+    def _make(cls: Type[_R], iterable: Iterable[Any]) -> _R: ...
+    def _asdict(self) -> OrderedDict[str, Any]: ...
+    def _replace(self: _R, **kwds: Any) -> _R: ...
+    def _update(self, **kwds: Any) -> None: ...
+    def __getattr__(self, name: str) -> Any: ...
+    def __setattr__(self, name: str, value: Any) -> None: ...
+    def __iter__(self) -> Iterator[Any]: ...
+    def __len__(self) -> int: ...
+
+def recordtype(typename: Union[str, unicode],
+               field_names: Union[str, unicode, Iterable[Any]],
+               verbose: bool = ..., rename: bool = ...,
+               field_types: Optional[Sequence[Any]] = ...) -> Type[_Record]: ...
+
+def TypedRecord(typename: Union[str, unicode], fields: Iterable[Tuple[str, Any]],
+                verbose: bool = ...) -> Type[_Record]: ...
+
+def make_records(cls: Type[_T], rows: Iterable[Iterable[Any]]) -> List[_T]: ...
+def from_columns(cls: Type[_T],
+                 columns: Union[Sequence[Sequence[Any]],
+                                Mapping[str, Sequence[Any]]]) -> List[_T]: ...
+def to_columns(records: Sequence[Any],
+               fields: Optional[Iterable[str]] = ...) -> OrderedDict[str, List[Any]]: ...
+
 class deque(Sized, Iterable[_T], Reversible[_T], Generic[_T]):
     def __init__(self, iterable: Iterable[_T] = ...,
                  maxlen: int = ...) -> None: ...
@@ -56,6 +94,12 @@ class Counter(Dict[_T, int], Generic[_T]):
     def __init__(self, iterable: Iterable[_T]) -> None: ...
     def elements(self) -> Iterator[_T]: ...
     def most_common(self, n: int = ...) -> List[_T]: ...
+    def iter_most_common(self) -> Iterator[Tuple[_T, int]]: ...
+    @classmethod
+    def merge_many(cls, counters: Iterable[Mapping[_T, int]]) -> Counter[_T]: ...
+    @classmethod
+    def count_parallel(cls, iterable: Iterable[_T], processes: Optional[int] = ...,
+                       chunksize: int = ...) -> Counter[_T]: ...
     @overload
     def subtract(self, mapping: Mapping[_T, int]) -> None: ...
     @overload
@@ -69,12 +113,56 @@ class Counter(Dict[_T, int], Generic[_T]):
     def update(self, m: Mapping[_T, int], **kwargs: _VT) -> None: ...
     @overload
     def update(self, m: Union[Iterable[_T], Iterable[Tuple[_T, int]]], **kwargs: _VT) -> None: ...
+    def __iadd__(self, other: Counter[_T]) -> Counter[_T]: ...
+    def __isub__(self, other: Counter[_T]) -> Counter[_T]: ...
+    def __ior__(self, other: Counter[_T]) -> Counter[_T]: ...
+    def __iand__(self, other: Counter[_T]) -> Counter[_T]: ...
+
+class TopKCounter(Counter[_T], Generic[_T]):
+    @overload
+    def __init__(self, k: int) -> None: ...
+    @overload
+    def __init__(self, k: int, Mapping: Mapping[_T, int]) -> None: ...
+    @overload
+    def __init__(self, k: int, iterable: Iterable[_T]) -> None: ...
+    @property
+    def k(self) -> int: ...
+    @classmethod
+    def merge_many(cls, counters: Iterable[Mapping[_T, int]],
+                   k: Optional[int] = ...) -> TopKCounter[_T]: ...
+    @classmethod
+    def count_parallel(cls, iterable: Iterable[_T], processes: Optional[int] = ...,
+                       chunksize: int = ..., k: int = ...) -> TopKCounter[_T]: ...
 
 class OrderedDict(Dict[_KT, _VT], Reversible[_KT], Generic[_KT, _VT]):
     def popitem(self, last: bool = ...) -> Tuple[_KT, _VT]: ...
     def move_to_end(self, key: _KT, last: bool = ...) -> None: ...
     def __reversed__(self) -> Iterator[_KT]: ...
 
+class CompactOrderedDict(OrderedDict[_KT, _VT], Generic[_KT, _VT]): ...
+
+class CacheInfo(NamedTuple('CacheInfo', [('hits', int), ('misses', int),
+                                         ('evictions', int),
+                                         ('maxsize', Optional[int]),
+                                         ('currsize', int)])): ...
+
+class LRUCache(MutableMapping[_KT, _VT], Generic[_KT, _VT]):
+    maxsize = ...  # type: Optional[int]
+    ttl = ...  # type: Optional[float]
+    timer = ...  # type: Callable[[], float]
+    hits = ...  # type: int
+    misses = ...  # type: int
+    evictions = ...  # type: int
+    def __init__(self, maxsize: Optional[int] = ..., ttl: Optional[float] = ...,
+                 timer: Callable[[], float] = ...) -> None: ...
+    def __getitem__(self, key: _KT) -> _VT: ...
+    def __setitem__(self, key: _KT, value: _VT) -> None: ...
+    def __delitem__(self, key: _KT) -> None: ...
+    def __iter__(self) -> Iterator[_KT]: ...
+    def __len__(self) -> int: ...
+    def expire(self) -> int: ...
+    def cache_info(self) -> CacheInfo: ...
+
 class defaultdict(Dict[_KT, _VT], Generic[_KT, _VT]):
     default_factory = ...  # type: Callable[[], _VT]
     # TODO: __init__ keyword args
@@ -0,0 +1,230 @@
+"""
+A precompiled, on-disk index of the signatures of each module, for tools
+that need them at import time.
+
+Reading the signatures of a module means tokenizing its source and parsing
+its type comments and docstrings, which is fine for a checker but adds up
+when thousands of modules are imported at startup (see `enforce`).  This
+stores, for each module, the list of its function definitions with their
+signatures, in one file per module that starts with a fixed-size header:
+
+    magic, version, source mtime (ns), source size, source sha1
+
+followed by the definitions as a `marshal` payload.  An entry is read with a
+single memory-mapped read, and is valid as long as the source has the same
+mtime and size, or, if only the mtime changed, the same sha1.  Entries are
+written to a temporary file and renamed into place.
+
+Usage::
+
+    python tools/annindex.py [-j JOBS] [--dir DIR] PATH ...    # precompile
+    python tools/annindex.py --show [--dir DIR] MODULE         # print an entry
+"""
+import argparse
+import collections
+import hashlib
+import marshal
+import mmap
+import multiprocessing
+import os
+import struct
+import sys
+import tempfile
+
+from typing import Any, List, Optional, Sequence, Tuple
+
+import cache
+import docstrings
+import typecomments
+
+DEFAULT_DIR = os.path.join(cache.DEFAULT_DIR, 'annindex')
+
+_MAGIC = b'ANNX'
+# bump this if the layout of the payload changes
+_VERSION = 1
+# magic, version, mtime_ns, size, sha1
+_HEADER = struct.Struct('<4sIqq20s')
+
+# One function of a module.  `signature` is None for functions without types,
+# which are kept so that an untyped redefinition hides a typed one.
+Definition = collections.namedtuple('Definition', 'qualname name lineno signature')
+
+
+def definitions(path):
+    # type: (str) -> List[Definition]
+    """Read the definitions of the module at `path` from its source."""
+    result = []
+    for func in typecomments.read_functions(path):
+        sig = typecomments.signature(func) or docstrings.signature(func)
+        result.append(Definition(func.qualname, func.name, func.lineno, sig))
+    return result
+
+
+def _dump(defs):
+    # type: (List[Definition]) -> bytes
+    # marshal only takes exact tuples, so the records are flattened
+    data = []
+    for d in defs:
+        sig = d.signature
+        if sig is not None:
+            sig = (sig.lineno, tuple(tuple(a) for a in sig.args), sig.returns,
+                   sig.source)
+        data.append((d.qualname, d.name, d.lineno, sig))
+    return marshal.dumps(tuple(data))
+
+
+def _load(payload):
+    # type: (Any) -> List[Definition]
+    result = []
+    for qualname, name, lineno, sig in marshal.loads(payload):
+        if sig is not None:
+            sig_lineno, args, returns, source = sig
+            sig = typecomments.Signature(
+                qualname, sig_lineno, tuple(typecomments.Arg(*a) for a in args),
+                returns, source)
+        result.append(Definition(qualname, name, lineno, sig))
+    return result
+
+
+def _digest(path):
+    # type: (str) -> bytes
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).digest()
+
+
+class AnnotationIndex(object):
+    """The index entries of the modules, stored in `directory`."""
+
+    def __init__(self, directory=DEFAULT_DIR):
+        # type: (str) -> None
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def entry(self, path):
+        # type: (str) -> str
+        """Return the path of the entry for the module at `path`."""
+        key = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key[:2], key[2:] + '.idx')
+
+    def load(self, path):
+        # type: (str) -> Optional[List[Definition]]
+        """
+        Return the definitions stored for the module at `path`, or None if
+        there is no entry or the module has changed since it was written.
+        """
+        try:
+            st = os.stat(path)
+            with open(self.entry(path), 'rb') as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    if len(data) < _HEADER.size:
+                        return None
+                    magic, version, mtime_ns, size, digest = \
+                        _HEADER.unpack_from(data)
+                    if magic != _MAGIC or version != _VERSION or size != st.st_size:
+                        return None
+                    if mtime_ns != st.st_mtime_ns and digest != _digest(path):
+                        return None
+                    with memoryview(data) as view:
+                        result = _load(view[_HEADER.size:])
+        except (OSError, ValueError, EOFError, TypeError):
+            return None
+        if mtime_ns != st.st_mtime_ns:
+            # same contents, touched: remember the new mtime
+            self.store(path, result)
+        return result
+
+    def store(self, path, defs):
+        # type: (str, List[Definition]) -> None
+        """
+        Write the entry for the module at `path`.  Errors are ignored, so a
+        read-only index still serves the entries it has.
+        """
+        entry = self.entry(path)
+        dirname = os.path.dirname(entry)
+        try:
+            st = os.stat(path)
+            header = _HEADER.pack(_MAGIC, _VERSION, st.st_mtime_ns, st.st_size,
+                                  _digest(path))
+            os.makedirs(dirname, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(header)
+                f.write(_dump(defs))
+            os.replace(tmp, entry)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def get(self, path):
+        # type: (str) -> List[Definition]
+        """Return the definitions of the module at `path`, indexing it if needed."""
+        result = self.load(path)
+        if result is not None:
+            self.hits += 1
+            return result
+        self.misses += 1
+        result = definitions(path)
+        self.store(path, result)
+        return result
+
+
+def _update_file(job):
+    # type: (Tuple[str, str]) -> Tuple[str, bool]
+    directory, path = job
+    index = AnnotationIndex(directory)
+    index.get(path)
+    return path, bool(index.misses)
+
+
+def update(paths, directory=DEFAULT_DIR, jobs=None):
+    # type: (Sequence[str], str, Optional[int]) -> int
+    """
+    Make sure every module in `paths` has a current entry, using a pool of
+    `jobs` processes for large trees.  Returns how many entries were written.
+    """
+    work = [(directory, path) for path in paths]
+    if jobs == 1 or len(paths) < 8:
+        return sum(written for _, written in map(_update_file, work))
+    with multiprocessing.Pool(jobs) as pool:
+        chunksize = max(1, len(paths) // ((jobs or os.cpu_count() or 1) * 8))
+        return sum(written for _, written in
+                   pool.imap_unordered(_update_file, work, chunksize))
+
+
+def main(argv=None):
+    # type: (Optional[Sequence[str]]) -> int
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('paths', nargs='+', help='files or directories')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='number of processes (default: one per cpu)')
+    parser.add_argument('--dir', default=DEFAULT_DIR,
+                        help='where the index is kept (default: %(default)s)')
+    parser.add_argument('--show', action='store_true',
+                        help='print the entries of the modules instead')
+    args = parser.parse_args(argv)
+
+    paths = [os.path.abspath(p) for p in typecomments.find_sources(args.paths)
+             if p.endswith('.py')]
+    if args.show:
+        index = AnnotationIndex(args.dir)
+        for path in paths:
+            defs = index.load(path)
+            if defs is None:
+                print('%s: no current entry' % os.path.relpath(path))
+                continue
+            for d in defs:
+                if d.signature is not None:
+                    print('%s:%d: %s' % (os.path.relpath(path), d.lineno,
+                                         typecomments.format_signature(d.signature)))
+        return 0
+    written = update(paths, args.dir, args.jobs)
+    print('%d modules, %d entries written' % (len(paths), written), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,264 @@
+"""
+Benchmark the checking tools on scaled-up copies of the annotation corpus.
+
+For each scale factor, ``N`` copies of ``tests/test_comment_annotations.py``
+and ``tests/mycollections.py`` (with their stubs and the modules they import)
+are written to a scratch directory, and each mode is run over them twice in
+a fresh process: once cold, and once warm, reusing whatever state or cache
+the mode keeps.  Each result records the wall time of both runs, the peak
+RSS of the process (including the checkers it starts) and the number of
+diagnostics, or signatures for the extraction modes, per second.
+
+The modes are:
+
+index, docstrings
+    signature extraction (`typecomments`, `docstrings`)
+annindex
+    signatures for the runtime checker (`annindex`), warm runs load them from
+    the precompiled index
+drift
+    stub drift (`stubdrift`), warm runs answer from the findings cache
+checkd
+    the daemon's `checkd.Workspace`, warm runs re-check nothing
+mypy, pytype
+    the conformance runner, warm runs answer from the result cache; skipped
+    when the checker is not installed
+
+Usage::
+
+    python tools/bench.py [--factors 1,10,100] [--modes MODE,...] [-o FILE]
+"""
+import argparse
+import collections
+import datetime
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import annindex
+import cache
+import checkd
+import conformance
+import docstrings
+import stubdrift
+import typecomments
+
+TESTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                     'tests')
+# the modules that are copied, and the ones they need next to them
+SOURCES = ('test_comment_annotations', 'mycollections')
+SUPPORT = ('othermodule.py', 'othermodule2.py')
+
+# name -> (function, unit).  A mode is called as function(paths, workdir,
+# state) and returns how many diagnostics or signatures it produced; `state`
+# is a dict that survives from the cold run to the warm one.
+_Mode = Callable[[List[str], str, Dict[str, Any]], int]
+MODES = collections.OrderedDict()  # type: Dict[str, Tuple[_Mode, str]]
+
+
+def mode(name, unit='diagnostics'):
+    # type: (str, str) -> Callable[[_Mode], _Mode]
+    """Register a benchmark mode."""
+    def register(func):
+        # type: (_Mode) -> _Mode
+        MODES[name] = (func, unit)
+        return func
+    return register
+
+
+@mode('index', 'signatures')
+def _index(paths, workdir, state):
+    # type: (List[str], str, Dict[str, Any]) -> int
+    index, _ = typecomments.build_index(paths, jobs=1)
+    return sum(len(sigs) for sigs in index.values())
+
+
+@mode('docstrings', 'signatures')
+def _docstrings(paths, workdir, state):
+    # type: (List[str], str, Dict[str, Any]) -> int
+    index, _ = typecomments.build_index(paths, jobs=1, extractor=docstrings.extract)
+    return sum(len(sigs) for sigs in index.values())
+
+
+@mode('annindex', 'signatures')
+def _annindex(paths, workdir, state):
+    # type: (List[str], str, Dict[str, Any]) -> int
+    index = annindex.AnnotationIndex(os.path.join(workdir, 'annindex'))
+    return sum(1 for path in paths for d in index.get(path) if d.signature)
+
+
+@mode('drift')
+def _drift(paths, workdir, state):
+    # type: (List[str], str, Dict[str, Any]) -> int
+    findings_cache = stubdrift._FindingsCache(os.path.join(workdir, 'drift.json'))
+    count = 0
+    for impl_path, stub_path in stubdrift.find_pairs(paths):
+        count += len(findings_cache.findings(impl_path, stub_path, False))
+    findings_cache.save()
+    return count
+
+
+@mode('checkd')
+def _checkd(paths, workdir, state):
+    # type: (List[str], str, Dict[str, Any]) -> int
+    workspace = state.setdefault('workspace', checkd.Workspace())
+    return sum(len(workspace.check(path)['diagnostics']) for path in paths)
+
+
+def _checker_mode(name):
+    # type: (str) -> _Mode
+    def run(paths, workdir, state):
+        # type: (List[str], str, Dict[str, Any]) -> int
+        result_cache = cache.ResultCache(os.path.join(workdir, 'cache'))
+        results, _ = conformance.run(paths, [conformance.CHECKERS[name]],
+                                     result_cache=result_cache)
+        return sum(1 for r in results if r.status != conformance.PASS)
+    return run
+
+
+for _name in conformance.CHECKERS:
+    mode(_name)(_checker_mode(_name))
+
+
+def synthesize(root, factor):
+    # type: (str, int) -> List[str]
+    """
+    Write `factor` copies of each module of `SOURCES` to `root`, and return
+    their paths.
+    """
+    os.makedirs(root, exist_ok=True)
+    for name in SUPPORT:
+        shutil.copy(os.path.join(TESTS, name), root)
+    paths = []
+    for source in SOURCES:
+        for i in range(factor):
+            for ext in ('.py', '.pyi'):
+                original = os.path.join(TESTS, source + ext)
+                if os.path.exists(original):
+                    target = os.path.join(root, '%s_%d%s' % (source, i, ext))
+                    shutil.copy(original, target)
+                    if ext == '.py':
+                        paths.append(target)
+    return paths
+
+
+def _peak_rss_kb():
+    # type: () -> int
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    peak = max(own, children)
+    # bytes on macOS, kilobytes elsewhere
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def run_mode(name, root):
+    # type: (str, str) -> Dict[str, Any]
+    """Run mode `name` cold and then warm over the copies in `root`."""
+    func, unit = MODES[name]
+    paths = sorted(os.path.join(root, f) for f in os.listdir(root)
+                   if f.endswith('.py') and f.startswith(SOURCES))
+    workdir = tempfile.mkdtemp(prefix='bench-')
+    state = {}  # type: Dict[str, Any]
+    try:
+        start = time.perf_counter()
+        count = func(paths, workdir, state)
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        func(paths, workdir, state)
+        warm = time.perf_counter() - start
+    finally:
+        shutil.rmtree(workdir)
+    return {'mode': name, 'unit': unit, 'count': count,
+            'cold_seconds': cold, 'warm_seconds': warm,
+            'cold_per_second': count / cold if cold else 0.0,
+            'warm_per_second': count / warm if warm else 0.0,
+            'peak_rss_kb': _peak_rss_kb()}
+
+
+def _count_lines(paths):
+    # type: (Sequence[str]) -> int
+    total = 0
+    for path in paths:
+        with open(path, 'rb') as f:
+            total += f.read().count(b'\n')
+    return total
+
+
+def benchmark(factors, modes):
+    # type: (Sequence[int], Sequence[str]) -> List[Dict[str, Any]]
+    """
+    Run each of `modes` at each scale factor, each in its own process so
+    that its peak RSS is its own.
+    """
+    results = []
+    scratch = tempfile.mkdtemp(prefix='bench-corpus-')
+    try:
+        for factor in factors:
+            root = os.path.join(scratch, '%dx' % factor)
+            paths = synthesize(root, factor)
+            lines = _count_lines(paths)
+            for name in modes:
+                proc = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), '--child', name, root],
+                    stdout=subprocess.PIPE, universal_newlines=True, check=True)
+                result = json.loads(proc.stdout)
+                result.update(factor=factor, files=len(paths), lines=lines)
+                results.append(result)
+                print('%-10s %4dx %8.3fs cold %8.3fs warm %8d KB  %s %s' % (
+                    name, factor, result['cold_seconds'], result['warm_seconds'],
+                    result['peak_rss_kb'], result['count'], result['unit']),
+                    file=sys.stderr)
+    finally:
+        shutil.rmtree(scratch)
+    return results
+
+
+def main(argv=None):
+    # type: (Optional[Sequence[str]]) -> int
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--factors', default='1,10,100',
+                        help='comma separated scale factors (default: %(default)s)')
+    parser.add_argument('--modes', default=None,
+                        help='comma separated modes (default: all available)')
+    parser.add_argument('-o', '--output', help='write the json report here')
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'DIR'),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        json.dump(run_mode(*args.child), sys.stdout)
+        return 0
+
+    if args.modes:
+        modes = args.modes.split(',')
+        unknown = [m for m in modes if m not in MODES]
+        if unknown:
+            parser.error('unknown modes: %s' % ', '.join(unknown))
+    else:
+        modes = [m for m in MODES if m not in conformance.CHECKERS or
+                 conformance.available(conformance.CHECKERS[m])]
+    report = {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': benchmark([int(f) for f in args.factors.split(',')], modes),
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
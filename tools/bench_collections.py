@@ -0,0 +1,550 @@
+"""
+Memory and throughput benchmarks for the containers in ``tests/mycollections.py``.
+
+mycollections is a python 2 module, so this runs under python 2.7::
+
+    python2 tools/bench_collections.py [--only NAME,...] [--scale N] [-o FILE]
+
+Each benchmark runs once per variant (the implementations being compared),
+each time in a fresh process, so that the memory it reports is its own.
+Memory is the growth of the resident set while the benchmark's structures
+are alive, divided by the number of entries or objects; times are the best
+of a few repeats.  The report is json, like that of ``tools/bench.py``.
+"""
+from __future__ import division, print_function
+
+import argparse
+import collections
+import gc
+import itertools
+import json
+import multiprocessing
+import operator
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'tests'))
+
+import mycollections
+
+# name -> (function, variants).  A benchmark is called as function(variant,
+# scale) and returns a dict of measurements.
+BENCHMARKS = collections.OrderedDict()
+
+
+def benchmark(name, variants):
+    """Register a benchmark run once for each of `variants`."""
+    def register(func):
+        BENCHMARKS[name] = (func, list(variants))
+        return func
+    return register
+
+
+def _rss():
+    """Return the current resident set size in bytes."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _best(func, repeat=3):
+    """Return the shortest of `repeat` timings of func()."""
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.time()
+        func()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def _memory(build, count):
+    """Return the bytes per item of the structures returned by build()."""
+    gc.collect()
+    before = _rss()
+    kept = build()
+    gc.collect()
+    used = _rss() - before
+    del kept
+    return used / count
+
+
+# OrderedDict
+# ===========
+
+@benchmark('ordereddict', ['OrderedDict', 'CompactOrderedDict'])
+def _ordereddict(variant, scale):
+    cls = getattr(mycollections, variant)
+    # many small maps, as held by a service, sharing their keys
+    maps, entries = 20000 * scale, 8
+    keys = ['key%d' % i for i in range(entries)]
+    items = [(key, i) for i, key in enumerate(keys)]
+    per_map = _memory(lambda: [cls(items) for _ in range(maps)], maps)
+
+    n = 100000 * scale
+    data = [('k%d' % i, i) for i in range(n)]
+    od = cls()
+
+    def insert():
+        od.clear()
+        for key, value in data:
+            od[key] = value
+
+    def iterate():
+        for _ in od:
+            pass
+
+    def churn():
+        # delete and re-add half of the keys
+        for key, value in data[::2]:
+            del od[key]
+        for key, value in data[::2]:
+            od[key] = value
+
+    return {
+        'bytes_per_map_of_%d' % entries: per_map,
+        'insert_per_second': n / _best(insert),
+        'iterate_per_second': n / _best(iterate),
+        'churn_per_second': n / _best(churn),
+    }
+
+
+@benchmark('move_to_end', ['OrderedDict', 'CompactOrderedDict', 'pop-and-set'])
+def _move_to_end(variant, scale):
+    # pop-and-set is how a key was moved to the end before move_to_end
+    cls = mycollections.CompactOrderedDict if variant == 'CompactOrderedDict' \
+        else mycollections.OrderedDict
+    result = {}
+    for size in (1000, 100000 * scale):
+        od = cls((i, i) for i in range(size))
+        keys = [(i * 7919) % size for i in range(100000)]
+        if variant == 'pop-and-set':
+            def move():
+                for key in keys:
+                    od[key] = od.pop(key)
+        else:
+            def move():
+                move_to_end = od.move_to_end
+                for key in keys:
+                    move_to_end(key)
+        result['moves_per_second_at_%d' % size] = len(keys) / _best(move)
+    return result
+
+
+@benchmark('bulk_load', ['OrderedDict', 'CompactOrderedDict', 'per-key'])
+def _bulk_load(variant, scale):
+    # per-key is how OrderedDict was loaded before it had a bulk path: one
+    # __setitem__ call per key
+    from _abcoll import MutableMapping
+    cls = mycollections.CompactOrderedDict if variant == 'CompactOrderedDict' \
+        else mycollections.OrderedDict
+    if variant == 'per-key':
+        def build(source):
+            od = cls()
+            MutableMapping.update(od, source)
+            return od
+
+        def fromkeys(keys):
+            od = cls()
+            for key in keys:
+                od[key] = None
+            return od
+    else:
+        build, fromkeys = cls, cls.fromkeys
+    result = {}
+    for size in (10 ** 4, 10 ** 5, 10 ** 6 * scale):
+        pairs = [('k%d' % i, i) for i in range(size)]
+        keys = [key for key, _ in pairs]
+        repeat = 3 if size <= 10 ** 5 else 1
+        sources = [('pairs', pairs), ('dict', dict(pairs)),
+                   ('ordereddict', mycollections.OrderedDict(pairs))]
+        for name, source in sources:
+            result['%s_per_second_at_%d' % (name, size)] = \
+                size / _best(lambda: build(source), repeat)
+        del sources
+        result['fromkeys_per_second_at_%d' % size] = \
+            size / _best(lambda: fromkeys(keys), repeat)
+    return result
+
+
+@benchmark('snapshot', ['OrderedDict', 'CompactOrderedDict', 'dict'])
+def _snapshot(variant, scale):
+    # dict is the reference: what the same operations cost without order
+    import cPickle
+    cls = dict if variant == 'dict' else getattr(mycollections, variant)
+    result = {}
+    for size in (10 ** 4, 10 ** 6 * scale):
+        od = cls(('k%d' % i, i) for i in range(size))
+        same = cls(od)
+        shorter = cls(od)
+        shorter.popitem()
+        data = cPickle.dumps(od, 2)
+        repeat = 3 if size <= 10 ** 5 else 1
+        result['copy_per_second_at_%d' % size] = \
+            size / _best(od.copy, repeat)
+        result['dumps_per_second_at_%d' % size] = \
+            size / _best(lambda: cPickle.dumps(od, 2), repeat)
+        result['loads_per_second_at_%d' % size] = \
+            size / _best(lambda: cPickle.loads(data), repeat)
+        result['eq_per_second_at_%d' % size] = \
+            size / _best(lambda: od == same, repeat)
+        result['eq_different_length_seconds_at_%d' % size] = \
+            _best(lambda: od == shorter, repeat)
+    return result
+
+
+@benchmark('traverse', ['OrderedDict', 'CompactOrderedDict', 'dict'])
+def _traverse(variant, scale):
+    # reading a whole map back out: the list and iterator forms, json (whose
+    # encoder iterates over the keys and looks each one up), and draining it
+    # with popitem(last=False), as a FIFO queue does
+    cls = dict if variant == 'dict' else getattr(mycollections, variant)
+    size = 1000000 * scale
+    od = cls(('k%d' % i, i) for i in range(size))
+    result = {
+        'items_per_second': size / _best(od.items),
+        'values_per_second': size / _best(od.values),
+        'iteritems_per_second': size / _best(lambda: list(od.iteritems())),
+        'itervalues_per_second': size / _best(lambda: list(od.itervalues())),
+        'json_per_second': size / _best(lambda: json.dumps(od), 1),
+    }
+    if variant != 'dict':
+        def drain():
+            queue = od.copy()
+            start = time.time()
+            while queue:
+                queue.popitem(last=False)
+            return time.time() - start
+        result['popitem_per_second'] = size / min(drain() for _ in range(3))
+    return result
+
+
+# namedtuple
+# ==========
+
+@benchmark('namedtuple_factory', ['namedtuple', 'cached_namedtuple',
+                                  'cached_namedtuple-no-exec'])
+def _namedtuple_factory(variant, scale):
+    # a schema-driven workload: a handful of record types, requested again
+    # and again
+    schemas = [('Record%d' % i, ['field%d' % j for j in range(i % 7 + 2)])
+               for i in range(20)]
+    calls = 2000 * scale
+    if variant == 'namedtuple':
+        factory = mycollections.namedtuple
+    else:
+        use_exec = not variant.endswith('-no-exec')
+
+        def factory(typename, fields):
+            return mycollections.cached_namedtuple(typename, fields,
+                                                   use_exec=use_exec)
+
+    def create():
+        for i in range(calls):
+            factory(*schemas[i % len(schemas)])
+
+    def misses():
+        # every call a new type: what the first request for a schema costs
+        for i in range(calls // 10):
+            factory('Miss%d' % i, schemas[i % len(schemas)][1])
+
+    Point = factory('Point', ['x', 'y'])
+    points = 200000
+
+    def instantiate():
+        for i in range(points):
+            Point(i, y=i)
+
+    return {
+        'classes_per_second': calls / _best(create),
+        'new_classes_per_second': calls // 10 / _best(misses, 1),
+        'instances_per_second': points / _best(instantiate),
+    }
+
+
+@benchmark('records', ['namedtuple', 'recordtype'])
+def _records(variant, scale):
+    factory = getattr(mycollections, variant)
+    Row = factory('Row', ['id', 'name', 'score', 'visits', 'active'])
+    count = 100000 * scale
+    per_record = _memory(lambda: [Row(i, 'n', 0.5, 0, True)
+                                  for i in range(count)], count)
+    rows = [Row(i, 'n', 0.5, 0, True) for i in range(count)]
+
+    def read():
+        for row in rows:
+            row.score
+            row.visits
+
+    if variant == 'namedtuple':
+        def update():
+            # a tuple cannot change: build a new one
+            for i, row in enumerate(rows):
+                rows[i] = row._replace(visits=row.visits + 1)
+    else:
+        def update():
+            for row in rows:
+                row.visits += 1
+
+    values = [(i, 'n', 0.5, 0, True) for i in range(count)]
+
+    def make():
+        make = Row._make
+        for row in values:
+            make(row)
+
+    return {
+        'bytes_per_record': per_record,
+        'reads_per_second': 2 * count / _best(read),
+        'updates_per_second': count / _best(update),
+        'makes_per_second': count / _best(make),
+    }
+
+
+@benchmark('columns', ['namedtuple', 'namedtuple-per-row', 'recordtype',
+                       'recordtype-per-row'])
+def _columns(variant, scale):
+    # per-row is the loop the batch functions replace: a _make() call, or a
+    # getattr per field, for each record
+    factory = getattr(mycollections, variant.split('-')[0])
+    Row = factory('Row', ['id', 'name', 'score', 'visits', 'active'])
+    count = 1000000 * scale
+    rows = [(i, 'n', 0.5, 0, True) for i in range(count)]
+    columns = [list(column) for column in zip(*rows)]
+    records = mycollections.make_records(Row, rows)
+    if variant.endswith('-per-row'):
+        def from_rows():
+            make = Row._make
+            return [make(row) for row in rows]
+
+        def from_columns():
+            make = Row._make
+            return [make(row) for row in zip(*columns)]
+
+        def to_columns():
+            return dict((name, [getattr(record, name) for record in records])
+                        for name in Row._fields)
+    else:
+        def from_rows():
+            return mycollections.make_records(Row, rows)
+
+        def from_columns():
+            return mycollections.from_columns(Row, columns)
+
+        def to_columns():
+            return mycollections.to_columns(records)
+
+    return {
+        'from_rows_per_second': count / _best(from_rows),
+        'from_columns_per_second': count / _best(from_columns),
+        'to_columns_per_second': count / _best(to_columns),
+    }
+
+
+# Counter
+# =======
+
+@benchmark('top_k', ['Counter', 'Counter-iter', 'TopKCounter'])
+def _top_k(variant, scale):
+    # a dashboard: batches of new counts, each followed by a poll of the top
+    # 100.  Counter-iter polls with iter_most_common() instead of
+    # most_common().
+    cls = mycollections.TopKCounter if variant == 'TopKCounter' \
+        else mycollections.Counter
+    args = (100,) if variant == 'TopKCounter' else ()
+    size = 1000000 * scale
+    rng = random.Random(0)
+    # a long tail: a few keys get most of the counts
+    counts = dict(('k%d' % i, int(size / (i + 1))) for i in range(size))
+    batches = [['k%d' % int(size ** rng.random()) for _ in range(1000)]
+               for _ in range(50)]
+    counter = cls(*(args + (counts,)))
+    if variant == 'Counter-iter':
+        def poll():
+            return list(itertools.islice(counter.iter_most_common(), 100))
+    else:
+        def poll():
+            return counter.most_common(100)
+    poll()
+
+    def run():
+        for batch in batches:
+            counter.update(batch)
+            poll()
+
+    def polls():
+        for _ in range(10):
+            poll()
+
+    return {
+        'batches_and_polls_per_second': len(batches) / _best(run, 1),
+        'polls_per_second': 10 / _best(polls, 1),
+    }
+
+
+@benchmark('merge', ['+', 'update', 'merge_many'])
+def _merge(variant, scale):
+    # combining per-shard counts: 16 shards of 100k distinct tokens each,
+    # half of them shared by all shards.  + makes a new counter per step.
+    Counter = mycollections.Counter
+    size = 100000 * scale
+    shards = [Counter(dict(('t%d' % (i if i < size // 2 else i + n * size), 1)
+                           for i in range(size))) for n in range(16)]
+    if variant == '+':
+        def merge():
+            return sum(shards, Counter())
+    elif variant == 'update':
+        def merge():
+            result = Counter()
+            for shard in shards:
+                result.update(shard)
+            return result
+    else:
+        def merge():
+            return Counter.merge_many(shards)
+    return {'keys_merged_per_second': 16 * size / _best(merge)}
+
+
+@benchmark('count', ['Counter', 'count_parallel', 'count_parallel-iterator'])
+def _count(variant, scale):
+    # log tokens: a few million elements over a vocabulary of 100k.  A list
+    # is shared with the workers, an iterator has its elements pickled.
+    rng = random.Random(0)
+    vocabulary = ['token%d' % i for i in range(100000)]
+    tokens = [vocabulary[int(100000 ** rng.random()) - 1]
+              for _ in range(4000000 * scale)]
+    Counter = mycollections.Counter
+    if variant == 'Counter':
+        def count():
+            return Counter(tokens)
+    elif variant == 'count_parallel':
+        def count():
+            return Counter.count_parallel(tokens)
+    else:
+        def count():
+            return Counter.count_parallel(iter(tokens))
+    return {'elements_per_second': len(tokens) / _best(count, 1),
+            'cpus': multiprocessing.cpu_count()}
+
+
+@benchmark('multiset', ['copying', 'in-place'])
+def _multiset(variant, scale):
+    # running totals: a long-lived counter of 1M elements, and small
+    # counters added to it, subtracted from it, and so on.  copying is
+    # c = c + d, in-place is c += d.
+    Counter = mycollections.Counter
+    size = 1000000 * scale
+    rng = random.Random(0)
+    totals = Counter(dict(('k%d' % i, rng.randint(1, 100)) for i in range(size)))
+    deltas = [Counter(dict(('k%d' % rng.randrange(size * 2), rng.randint(1, 5))
+                           for _ in range(1000))) for _ in range(10)]
+    ops = {
+        'copying': [('add', operator.add), ('sub', operator.sub),
+                    ('or', operator.or_), ('and', operator.and_)],
+        'in-place': [('add', operator.iadd), ('sub', operator.isub),
+                     ('or', operator.ior), ('and', operator.iand)],
+    }
+    result = {}
+    for name, op in ops[variant]:
+        # an intersection leaves at most 1000 elements, so each one gets a
+        # fresh copy of the totals, made outside of the timing
+        counters = [totals.copy() for _ in range(3 if name == 'and' else 1)]
+        elapsed = []
+        for counter in counters:
+            start = time.time()
+            for delta in (deltas[:1] if name == 'and' else deltas):
+                counter = op(counter, delta)
+            elapsed.append(time.time() - start)
+        del counters, counter
+        count = 1 if name == 'and' else len(deltas)
+        result['%s_per_second' % name] = count / min(elapsed)
+    return result
+
+
+# LRUCache
+# ========
+
+@benchmark('lru', ['LRUCache', 'LRUCache-ttl'])
+def _lru(variant, scale):
+    ttl = 3600 if variant.endswith('-ttl') else None
+    size = 10000 * scale
+    cache = mycollections.LRUCache(maxsize=size, ttl=ttl)
+    # nine in ten lookups are for a hot set that fits in the cache
+    rng = random.Random(0)
+    keys = [rng.randrange(size) if rng.random() < 0.9 else
+            size + rng.randrange(size * 10) for _ in range(200000)]
+
+    def lookups():
+        get = cache.get
+        for key in keys:
+            if get(key) is None:
+                cache[key] = key
+
+    elapsed = _best(lookups)
+    info = cache.cache_info()
+    return {
+        'lookups_per_second': len(keys) / elapsed,
+        'hit_ratio': info.hits / (info.hits + info.misses),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--only', help='comma separated benchmarks to run')
+    parser.add_argument('--scale', type=int, default=1,
+                        help='multiply the size of every benchmark')
+    parser.add_argument('-o', '--output', help='write the json report here')
+    parser.add_argument('--child', nargs=2, metavar=('NAME', 'VARIANT'),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        func, _ = BENCHMARKS[args.child[0]]
+        json.dump(func(args.child[1], args.scale), sys.stdout)
+        return 0
+
+    names = args.only.split(',') if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error('unknown benchmarks: %s' % ', '.join(unknown))
+    results = []
+    for name in names:
+        for variant in BENCHMARKS[name][1]:
+            output = subprocess.check_output(
+                [sys.executable, os.path.abspath(__file__), '--child', name,
+                 variant, '--scale', str(args.scale)])
+            result = json.loads(output.decode('utf-8'))
+            for key in sorted(result):
+                print('%-12s %-26s %-28s %16.3f' % (name, variant, key,
+                                                     result[key]),
+                      file=sys.stderr)
+            result.update(benchmark=name, variant=variant, scale=args.scale)
+            results.append(result)
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+On-disk cache of checker diagnostics, keyed by content.
+
+A module's key is a hash of the checker's identity (name, version and
+arguments) together with the contents of the module and of every file it
+resolves through: its own ``.pyi`` stub and, transitively, the stubs or
+sibling modules it imports (see `modules.dependencies`).  As long as none of
+those change, the stored diagnostics are returned without running the
+checker again.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import modules
+
+DEFAULT_DIR = '.typecheck_cache'
+
+# bump this if the layout of the cache entries changes
+_VERSION = '1'
+
+_digests = {}  # type: Dict[Tuple[str, int, int], str]
+
+
+def file_digest(path):
+    # type: (str) -> str
+    """
+    Return the sha1 of the contents of `path`.  Digests are memoized on the
+    file's modification time and size, so shared dependencies are only read
+    once per process.
+    """
+    st = os.stat(path)
+    memo_key = (path, st.st_mtime_ns, st.st_size)
+    digest = _digests.get(memo_key)
+    if digest is None:
+        with open(path, 'rb') as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        _digests[memo_key] = digest
+    return digest
+
+
+class ResultCache(object):
+    """
+    Maps (checker identity, module contents, dependency contents) to the list
+    of (line, message) pairs that the checker reported for the module.
+    """
+
+    def __init__(self, directory=DEFAULT_DIR):
+        # type: (str) -> None
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, identity, path, dependencies=None):
+        # type: (str, str, Optional[Sequence[str]]) -> str
+        """
+        Return the cache key for checking `path` with the checker described by
+        `identity`.  `dependencies` defaults to `modules.dependencies(path)`.
+        """
+        path = os.path.abspath(path)
+        if dependencies is None:
+            dependencies = modules.dependencies(path)
+        h = hashlib.sha1()
+        h.update(_VERSION.encode())
+        h.update(identity.encode('utf-8'))
+        for filename in [path] + sorted(dependencies):
+            h.update(b'\0' + filename.encode('utf-8') + b'\0')
+            h.update(file_digest(filename).encode())
+        return h.hexdigest()
+
+    def _entry(self, key):
+        # type: (str) -> str
+        return os.path.join(self.directory, key[:2], key[2:] + '.json')
+
+    def get(self, key):
+        # type: (str) -> Optional[List[Tuple[int, str]]]
+        """Return the stored diagnostics for `key`, or None on a miss."""
+        try:
+            with open(self._entry(key)) as f:
+                result = [(line, message) for line, message in json.load(f)]
+        except (IOError, OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def set(self, key, diagnostics):
+        # type: (str, List[Tuple[int, str]]) -> None
+        """
+        Store the diagnostics for `key`.  The entry is written to a temporary
+        file and renamed into place, so concurrent writers and readers never
+        see a partial entry.
+        """
+        entry = self._entry(key)
+        dirname = os.path.dirname(entry)
+        os.makedirs(dirname, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump([list(d) for d in diagnostics], f)
+            os.replace(tmp, entry)
+        except BaseException:
+            os.unlink(tmp)
+            raise
@@ -0,0 +1,344 @@
+"""
+A long-running checker that keeps the corpus in memory and answers "check
+this file" requests over a local socket.
+
+docs/tools.rst contrasts PyCharm, which flags problems as you type, with
+mypy, which is run by hand and starts from scratch every time.  This daemon
+keeps, for every file it has seen, the parsed functions and the diagnostics
+of each one, so a request for a file that has not changed costs a ``stat`` of
+it and of its dependencies, and one for a file that has changed only
+re-checks the functions whose header, type comments or docstring changed.
+It reports:
+
+- type comments that do not parse, or that have the wrong number of types
+  for the function's parameters
+- multi-line ``(...)`` comments that leave parameters without a type
+- stub drift, for modules with a ``.pyi`` next to them (see `stubdrift`)
+- optionally, the diagnostics of an external checker (``-c mypy``), through
+  the content-keyed `cache.ResultCache`, so it only runs when the module or
+  one of its dependencies changed
+
+The protocol is one json object per line in each direction.
+
+Usage::
+
+    python tools/checkd.py serve [-c CHECKER] [--socket PATH] [ROOT ...]
+    python tools/checkd.py check [--socket PATH] PATH ...
+    python tools/checkd.py status|stop [--socket PATH]
+"""
+import argparse
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+import tokenize
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import cache
+import conformance
+import modules
+import stubdrift
+import typecomments
+
+DEFAULT_SOCKET = os.path.join(cache.DEFAULT_DIR, 'checkd.sock')
+
+# diagnostics of one function, with lines relative to the function, so they
+# stay valid when the function moves
+_FunctionResult = Tuple[Any, List[Tuple[int, str, str]]]
+
+
+def _function_key(func):
+    # type: (typecomments.FunctionDef) -> Any
+    """Return everything about `func` that its diagnostics depend on."""
+    return (func.qualname, func.in_class, func.decorators, func.comment,
+            func.docstring, func.returns,
+            tuple((p.name, p.kind, p.annotation, p.default, p.comment)
+                  for p in func.params))
+
+
+def check_function(func):
+    # type: (typecomments.FunctionDef) -> List[Tuple[int, str, str]]
+    """
+    Return the (line offset, source, message) diagnostics for the type
+    comments of `func`.
+    """
+    if not func.comment:
+        return []
+    parsed = typecomments.parse_signature_comment(func.comment)
+    offset = func.end[0] - func.lineno + 1
+    if parsed is None:
+        return [(offset, 'comment', 'malformed signature type comment: %s'
+                 % func.comment)]
+    types = parsed[0]
+    params = func.params
+    if types == ['...']:
+        return [(p.start[0] - func.lineno, 'comment',
+                 'argument "%s" has no type comment' % p.name)
+                for i, p in enumerate(params)
+                if not p.comment and not (i == 0 and func.in_class and
+                                          'staticmethod' not in func.decorators)]
+    expected = [len(params)]
+    if func.in_class and 'staticmethod' not in func.decorators:
+        expected.append(len(params) - 1)
+    if len(types) not in expected:
+        return [(offset, 'comment', 'type comment has %d argument types for '
+                 '%d parameters' % (len(types), len(params)))]
+    return []
+
+
+class _FileState(object):
+    """
+    What is known about one file: the stats it was checked against, its
+    functions and diagnostics, and the files its external diagnostics depend
+    on.  `lock` is held while the file is re-checked, so that concurrent
+    requests for it wait for that check instead of repeating it.
+    """
+
+    def __init__(self):
+        # type: () -> None
+        self.lock = threading.Lock()
+        self.stat = None  # type: Any
+        self.dependencies = []  # type: List[str]
+        self.functions = {}  # type: Dict[str, _FunctionResult]
+        self.diagnostics = []  # type: List[Dict[str, Any]]
+
+
+class Workspace(object):
+    """
+    The in-memory state of the daemon.  `check` is safe to call from several
+    threads: `lock` only guards the table of files and the counters, and
+    each file is checked under a lock of its own, so a slow external checker
+    run only holds up the requests for the same file.
+    """
+
+    def __init__(self, checker=None, extra_args=(), cache_dir=cache.DEFAULT_DIR):
+        # type: (Optional[conformance.Checker], Sequence[str], str) -> None
+        self.files = {}  # type: Dict[str, _FileState]
+        self.checker = checker
+        self.extra_args = list(extra_args)
+        self.identity = conformance.identity(checker, extra_args) if checker else None
+        self.result_cache = cache.ResultCache(cache_dir)
+        self.checks = 0
+        self.rechecked_functions = 0
+        self.lock = threading.Lock()
+
+    def _stat(self, path):
+        # type: (str) -> Optional[Tuple[int, int]]
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _external(self, path, dependencies):
+        # type: (str, List[str]) -> List[Dict[str, Any]]
+        if self.checker is None or not path.endswith('.py'):
+            return []
+        key = self.result_cache.key(self.identity, path, dependencies)
+        diags = self.result_cache.get(key)
+        if diags is None:
+            diags = [(d.line, d.message) for d in
+                     conformance.run_checker(self.checker, path, self.extra_args)]
+            self.result_cache.set(key, diags)
+        return [{'line': line, 'source': self.checker.name, 'message': message}
+                for line, message in diags]
+
+    def check(self, path):
+        # type: (str) -> Dict[str, Any]
+        """Return the diagnostics for `path`, re-checking what changed."""
+        start = time.perf_counter()
+        path = os.path.abspath(path)
+        stub = path + 'i' if path.endswith('.py') else None
+        with self.lock:
+            self.checks += 1
+            state = self.files.get(path)
+            if state is None:
+                state = self.files[path] = _FileState()
+        with state.lock:
+            stat = self._state_stat(path, stub, state)
+            rechecked = 0
+            if stat != state.stat:
+                rechecked = self._update(path, stub, state)
+                # the dependencies may be different now
+                state.stat = self._state_stat(path, stub, state)
+            diagnostics = state.diagnostics
+        return {'path': path, 'diagnostics': diagnostics,
+                'rechecked': rechecked,
+                'ms': round((time.perf_counter() - start) * 1000, 3)}
+
+    def _state_stat(self, path, stub, state):
+        # type: (str, Optional[str], _FileState) -> Any
+        """
+        Return the stats of `path`, its stub and the dependencies recorded in
+        `state`, which all have to be unchanged for its diagnostics to be.
+        """
+        return (self._stat(path), self._stat(stub) if stub else None,
+                tuple(self._stat(dep) for dep in state.dependencies))
+
+    def _update(self, path, stub, state):
+        # type: (str, Optional[str], _FileState) -> int
+        if self.checker is not None and path.endswith('.py'):
+            state.dependencies = modules.dependencies(path)
+        try:
+            with tokenize.open(path) as f:
+                funcs = list(typecomments.iter_functions(f.readline))
+        except (OSError, SyntaxError, UnicodeDecodeError) as e:
+            state.functions = {}
+            state.diagnostics = [{'line': 1, 'source': 'checkd',
+                                  'message': 'cannot read: %s' % e}]
+            return 0
+        functions = {}  # type: Dict[str, _FunctionResult]
+        diagnostics = []  # type: List[Dict[str, Any]]
+        rechecked = 0
+        for func in funcs:
+            key = _function_key(func)
+            previous = state.functions.get(func.qualname)
+            if previous is not None and previous[0] == key:
+                result = previous
+            else:
+                result = (key, check_function(func))
+                rechecked += 1
+            functions[func.qualname] = result
+            diagnostics.extend({'line': func.lineno + offset, 'source': source,
+                                'message': message}
+                               for offset, source, message in result[1])
+        if stub and os.path.isfile(stub):
+            diagnostics.extend({'line': f.line, 'source': 'drift',
+                                'message': '%s: %s' % (f.kind, f.detail)}
+                               for f in stubdrift.compare(path, stub)
+                               if f.path == path)
+        diagnostics.extend(self._external(path, state.dependencies))
+        diagnostics.sort(key=lambda d: d['line'])
+        state.functions = functions
+        state.diagnostics = diagnostics
+        with self.lock:
+            self.rechecked_functions += rechecked
+        return rechecked
+
+    def status(self):
+        # type: () -> Dict[str, Any]
+        with self.lock:
+            states = list(self.files.values())
+        return {'files': len(states),
+                'functions': sum(len(s.functions) for s in states),
+                'checks': self.checks,
+                'rechecked_functions': self.rechecked_functions,
+                'cache_hits': self.result_cache.hits,
+                'cache_misses': self.result_cache.misses,
+                'checker': self.checker.name if self.checker else None}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        # type: () -> None
+        workspace = self.server.workspace  # type: ignore
+        for line in self.rfile:
+            try:
+                request = json.loads(line.decode('utf-8'))
+                command = request.get('command')
+                if command == 'check':
+                    response = {'results': [workspace.check(p)
+                                            for p in request['paths']]}
+                elif command == 'status':
+                    response = workspace.status()
+                elif command == 'stop':
+                    response = {'stopped': True}
+                    threading.Thread(target=self.server.shutdown).start()
+                else:
+                    response = {'error': 'unknown command: %r' % command}
+            except (ValueError, KeyError, TypeError) as e:
+                response = {'error': 'bad request: %s' % e}
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(socket_path, workspace, roots=()):
+    # type: (str, Workspace, Sequence[str]) -> None
+    """Warm up on the sources in `roots`, then serve until told to stop."""
+    for path in typecomments.find_sources(roots):
+        if path.endswith('.py'):
+            workspace.check(path)
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    os.makedirs(os.path.dirname(os.path.abspath(socket_path)), exist_ok=True)
+    server = _Server(socket_path, _Handler)
+    server.workspace = workspace  # type: ignore
+    print('checkd: %d files warm, listening on %s' % (len(workspace.files),
+                                                     socket_path), file=sys.stderr)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.unlink(socket_path)
+
+
+def request(socket_path, message):
+    # type: (str, Dict[str, Any]) -> Dict[str, Any]
+    """Send `message` to the daemon listening on `socket_path`."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
+        with sock.makefile('rb') as f:
+            return json.loads(f.readline().decode('utf-8'))
+    finally:
+        sock.close()
+
+
+def main(argv=None):
+    # type: (Optional[Sequence[str]]) -> int
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('command', choices=['serve', 'check', 'status', 'stop'])
+    parser.add_argument('paths', nargs='*',
+                        help='files to check, or roots to warm up when serving')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET,
+                        help='socket to listen on (default: %(default)s)')
+    parser.add_argument('-c', '--checker', choices=list(conformance.CHECKERS),
+                        help='also report the diagnostics of this checker')
+    parser.add_argument('-X', dest='extra', action='append', default=[],
+                        metavar='ARG', help='extra argument for the checker')
+    parser.add_argument('--json', action='store_true', help='print raw responses')
+    args = parser.parse_intermixed_args(argv)
+
+    if args.command == 'serve':
+        checker = None
+        if args.checker:
+            checker = conformance.CHECKERS[args.checker]
+            if not conformance.available(checker):
+                parser.error('%s is not installed' % checker.name)
+        serve(args.socket, Workspace(checker, args.extra), args.paths)
+        return 0
+
+    try:
+        if args.command == 'check':
+            response = request(args.socket, {'command': 'check',
+                                             'paths': args.paths})
+        else:
+            response = request(args.socket, {'command': args.command})
+    except OSError as e:
+        print('cannot reach checkd at %s: %s' % (args.socket, e), file=sys.stderr)
+        return 2
+    if args.json or args.command != 'check':
+        print(json.dumps(response, indent=2, sort_keys=True))
+        return 1 if 'error' in response else 0
+    count = 0
+    for result in response['results']:
+        for diag in result['diagnostics']:
+            print('%s:%d: %s: %s' % (os.path.relpath(result['path']),
+                                     diag['line'], diag['source'],
+                                     diag['message']))
+            count += 1
+    return 1 if count else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,405 @@
+"""
+Run the type checkers over the annotation corpus and compare their output to
+the expectations recorded in the corpus itself.
+
+The modules in ``tests/`` document what each tool reports using trailing
+comments::
+
+    bytestring_test(u'x')                  # problem detected: mypy, pycharm
+    tuple_test(('foo', 2), (1, 2, 3))       # OK! problem incorrectly detected: pycharm
+    container_test(dict(foo=1))  # problem detected in mypy, but not pycharm
+
+Those markers are parsed into an expectation table, every available checker
+is run over every module in parallel (one job per checker x module), and
+each marked line is reported as ``pass``, ``missed`` or ``false-positive``.
+Diagnostics on lines that carry no marker are reported as ``unexpected``.
+
+Checker output is cached on disk (see `cache.ResultCache`), so a module is
+only checked again when it, a stub or module it resolves through, or the
+checker itself has changed.  With ``--changed-only``, modules that are not
+affected by any edit since the previous run (see `depgraph.DependencyGraph`)
+are skipped altogether.
+
+Usage::
+
+    python tools/conformance.py [-j JOBS] [--checker mypy] [MODULE ...]
+"""
+import argparse
+import collections
+import concurrent.futures
+import importlib.util
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+import tokenize
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import cache
+import depgraph
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CORPUS = os.path.join(os.path.dirname(HERE), 'tests')
+
+# checkers that every marker in the corpus speaks for.  when a marker names
+# some of these but not others, the ones left out are expected to stay quiet.
+TRACKED = ('mypy', 'pycharm')
+KNOWN = TRACKED + ('pytype',)
+
+PASS = 'pass'
+MISSED = 'missed'
+FALSE_POSITIVE = 'false-positive'
+UNEXPECTED = 'unexpected'
+
+# expected[checker] is True if the checker should report a problem on the
+# line, False if it should not
+Expectation = collections.namedtuple('Expectation', 'path line expected text')
+Diagnostic = collections.namedtuple('Diagnostic', 'path line checker message')
+Result = collections.namedtuple('Result', 'path line checker status message')
+
+
+# Expectations
+# ============
+
+_detected_re = re.compile(r'problem\s+(?:incorrectly\s+)?detected(?P<rest>.*)$')
+_names_re = re.compile(r'[a-z]+')
+
+
+def _checker_names(text):
+    # type: (str) -> List[str]
+    return [name for name in _names_re.findall(text) if name in KNOWN]
+
+
+def parse_marker(text):
+    # type: (str) -> Optional[Dict[str, bool]]
+    """
+    Parse the text of a trailing comment into a mapping of checker name to
+    whether a problem is expected.  Returns None if the comment is not an
+    expectation marker.
+    """
+    text = text.lstrip('#').strip().lower()
+    ok = text.startswith('ok!')
+    match = _detected_re.search(text)
+    if not ok and match is None:
+        return None
+
+    expected = dict((name, False) for name in TRACKED)
+    if match is None:
+        return expected
+
+    rest = match.group('rest').strip()
+    if not rest or rest.startswith('('):
+        # a bare "problem detected": every tool catches it
+        detected, clean = list(TRACKED), []  # type: List[str], List[str]
+    elif rest.startswith(':'):
+        detected, clean = _checker_names(rest[1:]), []
+    elif rest.startswith('in '):
+        detected_text, _, clean_text = rest[3:].partition('but not')
+        # "in pycharm but only because of the issue above"
+        detected_text = detected_text.split(' but ')[0]
+        detected = _checker_names(detected_text)
+        clean = _checker_names(clean_text)
+    else:
+        return None
+    for name in detected:
+        expected[name] = True
+    for name in clean:
+        expected[name] = False
+    return expected
+
+
+def _comments(path):
+    # type: (str) -> Iterable[Tuple[int, str]]
+    with open(path) as f:
+        try:
+            for tok in tokenize.generate_tokens(f.readline):
+                if tok[0] == tokenize.COMMENT:
+                    yield tok[2][0], tok[1]
+        except (tokenize.TokenError, IndentationError):
+            # the corpus is python 2 code: keep what we found so far
+            pass
+
+
+def parse_expectations(path):
+    # type: (str) -> List[Expectation]
+    """
+    Return the expectation markers found in the module at `path`, in line
+    order.
+    """
+    result = []
+    for line, text in _comments(path):
+        expected = parse_marker(text)
+        if expected is not None:
+            result.append(Expectation(path, line, expected, text))
+    return result
+
+
+# Checkers
+# ========
+
+# `command` is an argument list in which '{path}' is replaced by the module
+# path.  `pattern` must provide 'path', 'line' and 'message' groups and is
+# matched against each line of the checker's combined output.  `requires` is
+# the python module (for 'module:NAME') or executable (for 'exe:NAME') that
+# must be installed to run the checker.  `version` is the command that prints
+# the checker's version, which is part of its identity in the result cache.
+Checker = collections.namedtuple('Checker',
+                                 'name command pattern requires version')
+
+
+def available(checker):
+    # type: (Checker) -> bool
+    kind, _, name = checker.requires.partition(':')
+    if kind == 'exe':
+        return shutil.which(name) is not None
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+CHECKERS = collections.OrderedDict([
+    ('mypy', Checker(
+        'mypy',
+        [sys.executable, '-m', 'mypy', '--follow-imports=silent',
+         '--no-error-summary', '{path}'],
+        r'^(?P<path>[^:]+):(?P<line>\d+):(?:\d+:)? error: (?P<message>.*)$',
+        'module:mypy',
+        [sys.executable, '-m', 'mypy', '--version'])),
+    ('pytype', Checker(
+        'pytype',
+        ['pytype-single', '{path}'],
+        r'^File "(?P<path>[^"]+)", line (?P<line>\d+), in [^:]*: (?P<message>.*)$',
+        'exe:pytype-single',
+        ['pytype-single', '--version'])),
+])  # type: Dict[str, Checker]
+
+
+def identity(checker, extra_args=()):
+    # type: (Checker, Sequence[str]) -> str
+    """
+    Return a string that identifies the checker, its version and the
+    arguments it is run with.
+    """
+    proc = subprocess.run(checker.version, stdout=subprocess.PIPE,
+                          stderr=subprocess.STDOUT, universal_newlines=True)
+    return '\0'.join([checker.name, proc.stdout.strip()] +
+                      list(checker.command) + list(extra_args))
+
+
+def run_checker(checker, path, extra_args=()):
+    # type: (Checker, str, Sequence[str]) -> List[Diagnostic]
+    """
+    Run `checker` on the module at `path` and return the diagnostics it
+    reported for that module.
+
+    The checker runs from the module's directory, so that sibling modules and
+    stubs resolve the same way they do when you run it by hand.
+    """
+    path = os.path.abspath(path)
+    dirname, basename = os.path.split(path)
+    command = [arg.replace('{path}', basename) for arg in checker.command]
+    command[-1:-1] = list(extra_args)
+    proc = subprocess.run(command, cwd=dirname, stdout=subprocess.PIPE,
+                          stderr=subprocess.STDOUT, universal_newlines=True)
+    pattern = re.compile(checker.pattern)
+    result = []
+    for output_line in proc.stdout.splitlines():
+        match = pattern.match(output_line)
+        if match is None:
+            continue
+        reported = os.path.join(dirname, match.group('path'))
+        if os.path.abspath(reported) != path:
+            continue
+        result.append(Diagnostic(path, int(match.group('line')), checker.name,
+                                 match.group('message').strip()))
+    return result
+
+
+def compare(expectations, diagnostics, checker):
+    # type: (List[Expectation], List[Diagnostic], str) -> List[Result]
+    """
+    Compare the diagnostics that `checker` reported for a module against the
+    module's expectations.
+    """
+    by_line = collections.defaultdict(list)  # type: Dict[int, List[Diagnostic]]
+    for diag in diagnostics:
+        by_line[diag.line].append(diag)
+
+    results = []
+    seen = set()
+    for exp in expectations:
+        wanted = exp.expected.get(checker)
+        if wanted is None:
+            continue
+        seen.add(exp.line)
+        found = by_line.get(exp.line, [])
+        message = found[0].message if found else ''
+        if wanted and found or not wanted and not found:
+            status = PASS
+        elif wanted:
+            status = MISSED
+        else:
+            status = FALSE_POSITIVE
+        results.append(Result(exp.path, exp.line, checker, status, message))
+
+    for line in sorted(set(by_line) - seen):
+        for diag in by_line[line]:
+            results.append(Result(diag.path, line, checker, UNEXPECTED,
+                                  diag.message))
+    results.sort(key=lambda r: (r.path, r.line))
+    return results
+
+
+def _job(checker, path, extra_args):
+    # type: (Checker, str, Sequence[str]) -> Tuple[List[Diagnostic], float]
+    start = time.time()
+    diagnostics = run_checker(checker, path, extra_args)
+    return diagnostics, time.time() - start
+
+
+def default_modules():
+    # type: () -> List[str]
+    return sorted(os.path.join(CORPUS, name) for name in os.listdir(CORPUS)
+                  if name.startswith('test_') and name.endswith('.py'))
+
+
+def _count_lines(path):
+    # type: (str) -> int
+    with open(path, 'rb') as f:
+        return sum(1 for _ in f)
+
+
+def run(paths, checkers, jobs=None, extra_args=None, result_cache=None,
+        graph=None):
+    # type: (Sequence[str], Sequence[Checker], Optional[int], Optional[Dict[str, List[str]]], Optional[cache.ResultCache], Optional[depgraph.DependencyGraph]) -> Tuple[List[Result], Dict[str, float]]
+    """
+    Run each checker over each module, in parallel, and return the results
+    along with timing statistics.
+
+    If `result_cache` is given, modules whose contents, dependencies and
+    checker are unchanged since a previous run are answered from the cache
+    and never reach the process pool.  An up-to-date `graph` saves
+    rescanning imports to compute the cache keys.
+    """
+    extra_args = extra_args or {}
+    start = time.time()
+    expectations = dict((path, parse_expectations(path)) for path in paths)
+    results = []  # type: List[Result]
+    busy = 0.0
+    pending = {}  # type: Dict[concurrent.futures.Future, Tuple[Checker, str, Optional[str]]]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        for checker in checkers:
+            args = extra_args.get(checker.name, [])
+            checker_id = identity(checker, args) if result_cache else None
+            for path in paths:
+                key = None
+                if result_cache is not None:
+                    deps = graph.dependencies(path) if graph else None
+                    key = result_cache.key(checker_id, path, deps)
+                    cached = result_cache.get(key)
+                    if cached is not None:
+                        diagnostics = [Diagnostic(path, line, checker.name, message)
+                                       for line, message in cached]
+                        results.extend(compare(expectations[path], diagnostics,
+                                               checker.name))
+                        continue
+                future = pool.submit(_job, checker, path, args)
+                pending[future] = (checker, path, key)
+        for future in concurrent.futures.as_completed(pending):
+            checker, path, key = pending[future]
+            diagnostics, elapsed = future.result()
+            if key is not None:
+                result_cache.set(key, [(d.line, d.message) for d in diagnostics])
+            results.extend(compare(expectations[path], diagnostics, checker.name))
+            busy += elapsed
+    wall = time.time() - start
+    results.sort(key=lambda r: (r.path, r.line, r.checker))
+    lines = sum(_count_lines(path) for path in paths) * len(checkers)
+    stats = {
+        'jobs': len(paths) * len(checkers),
+        'cached': len(paths) * len(checkers) - len(pending),
+        'wall': wall,
+        'busy': busy,
+        'lines_per_second': lines / wall if wall else 0.0,
+    }
+    return results, stats
+
+
+def main(argv=None):
+    # type: (Optional[Sequence[str]]) -> int
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('modules', nargs='*',
+                        help='modules to check (default: tests/test_*.py)')
+    parser.add_argument('-c', '--checker', action='append', choices=list(CHECKERS),
+                        help='checker to run (default: all available)')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='number of parallel jobs (default: cpu count)')
+    parser.add_argument('-X', '--checker-arg', action='append', default=[],
+                        metavar='CHECKER:ARG',
+                        help='pass an extra argument to a checker, e.g. -X mypy:--py2')
+    parser.add_argument('--cache-dir', default=cache.DEFAULT_DIR,
+                        help='directory of the result cache (default: %(default)s)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='always run the checkers')
+    parser.add_argument('--changed-only', action='store_true',
+                        help='only check modules affected by files changed '
+                             'since the previous run')
+    parser.add_argument('--json', action='store_true',
+                        help='write results and statistics as json')
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help='only report lines that did not pass')
+    args = parser.parse_args(argv)
+
+    modules = args.modules or default_modules()
+    names = args.checker or list(CHECKERS)
+    checkers = [CHECKERS[name] for name in names if available(CHECKERS[name])]
+    for name in names:
+        if not available(CHECKERS[name]):
+            print('skipping %s: not installed' % name, file=sys.stderr)
+    extra_args = collections.defaultdict(list)  # type: Dict[str, List[str]]
+    for item in args.checker_arg:
+        name, _, arg = item.partition(':')
+        extra_args[name].append(arg)
+
+    result_cache = None if args.no_cache else cache.ResultCache(args.cache_dir)
+    graph_path = os.path.join(args.cache_dir, 'depgraph.json')
+    graph = depgraph.DependencyGraph.load(graph_path)
+    roots = set(os.path.dirname(os.path.abspath(path)) for path in modules)
+    changed = graph.update(depgraph.source_files(roots))
+    if args.changed_only:
+        affected = set(graph.affected(changed))
+        modules = [path for path in modules if os.path.abspath(path) in affected]
+
+    results, stats = run(modules, checkers, args.jobs, extra_args, result_cache,
+                         graph)
+    # only now, so that the changes of a crashed or interrupted run are seen
+    # again by the next one
+    graph.save(graph_path)
+    counts = collections.Counter(r.status for r in results)
+
+    if args.json:
+        json.dump({'results': [r._asdict() for r in results],
+                   'counts': counts, 'stats': stats}, sys.stdout, indent=2)
+        print()
+    else:
+        for r in results:
+            if args.quiet and r.status == PASS:
+                continue
+            print('%s:%d: %s: %s %s' % (os.path.relpath(r.path), r.line,
+                                        r.checker, r.status, r.message))
+        print('%d passed, %d missed, %d false-positive, %d unexpected' %
+              (counts[PASS], counts[MISSED], counts[FALSE_POSITIVE],
+               counts[UNEXPECTED]))
+        print('%d jobs (%d cached) in %.2fs (%.2fs of checker time, '
+              '%.0f lines/s)' % (stats['jobs'], stats['cached'], stats['wall'],
+                                 stats['busy'], stats['lines_per_second']))
+    return 1 if counts[MISSED] or counts[FALSE_POSITIVE] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,287 @@
+"""
+Rewrite the docstring types of a tree as ``# type:`` comments, which mypy
+understands.
+
+A function with types in its docstring, like those in
+``tests/test_docstring_annotations.py``, gets a signature comment as the
+first line of its body::
+
+    def container_test(arg):
+        # type: (Container[int]) -> int
+        '''
+        :type arg: Container[int]
+        :rtype: int
+        '''
+
+If that line would be longer than ``--width``, the multi-line form is used
+instead, with one comment per argument.  Arguments without a documented type
+become ``Any``, as does a missing return type, and the names used from
+``typing`` are imported.  Docstrings are left as they are, so PyCharm keeps
+showing the types next to their descriptions.
+
+Files are converted in parallel and each is written atomically, so an
+interrupted run never leaves a file half written.  Functions that already
+have type comments or annotations are left alone, so the conversion can be
+run repeatedly.
+
+Usage::
+
+    python tools/convert_docstrings.py [-j JOBS] [--diff] [--width N] PATH ...
+"""
+import argparse
+import concurrent.futures
+import difflib
+import io
+import os
+import re
+import shutil
+import sys
+import tempfile
+import tokenize
+import typing
+
+from typing import List, Optional, Sequence, Set, Tuple
+
+import docstrings
+import typecomments
+
+_typing_names = frozenset(name for name in getattr(typing, '__all__', dir(typing))
+                          if name[:1].isupper())
+_identifier_re = re.compile(r'[A-Za-z_][A-Za-z0-9_.]*')
+_typing_import_re = re.compile(
+    r'^from[ \t]+typing[ \t]+import[ \t]+(?P<names>\([^)]*\)|[^\n#]*)', re.M)
+_import_re = re.compile(r'^(?:import|from)[ \t](?!__future__)', re.M)
+_bound_re = re.compile(
+    r'^(?:(?:from[ \t]+\S+[ \t]+)?import[ \t]+(?P<names>\([^)]*\)|[^\n#]*)|'
+    r'(?:class|def)[ \t]+(?P<defined>\w+)|(?P<assigned>\w+)[ \t]*=)', re.M)
+
+
+def _indent_of(line):
+    # type: (str) -> str
+    return line[:len(line) - len(line.lstrip())]
+
+
+def _body_indent(lines, func):
+    # type: (List[str], typecomments.FunctionDef) -> str
+    """Return the indentation of the first line of `func`'s body."""
+    for line in lines[func.end[0]:]:
+        if line.strip():
+            return _indent_of(line)
+    return _indent_of(lines[func.start[0] - 1]) + '    '
+
+
+def _arg_types(func, sig):
+    # type: (typecomments.FunctionDef, typecomments.Signature) -> List[Tuple[typecomments.Param, Optional[str]]]
+    """
+    Pair each parameter of `func` with the type to write for it, or None for
+    the self or cls argument of a method.
+    """
+    result = []
+    for i, (param, arg) in enumerate(zip(func.params, sig.args)):
+        if i == 0 and func.in_class and arg.type is None and \
+                'staticmethod' not in func.decorators:
+            result.append((param, None))
+        else:
+            result.append((param, arg.type or 'Any'))
+    return result
+
+
+def _single_line(pairs, returns):
+    # type: (List[Tuple[typecomments.Param, Optional[str]]], str) -> str
+    types = [param.kind + type_text for param, type_text in pairs
+             if type_text is not None]
+    return '# type: (%s) -> %s' % (', '.join(types), returns)
+
+
+def _text(lines, start, end):
+    # type: (List[str], Tuple[int, int], Tuple[int, int]) -> str
+    """Return the source between two (row, col) token positions."""
+    if start[0] == end[0]:
+        return lines[start[0] - 1][start[1]:end[1]]
+    parts = [lines[start[0] - 1][start[1]:]]
+    parts.extend(lines[start[0]:end[0] - 1])
+    parts.append(lines[end[0] - 1][:end[1]])
+    return ''.join(parts)
+
+
+def _multi_line_header(lines, func, pairs):
+    # type: (List[str], typecomments.FunctionDef, List[Tuple[typecomments.Param, Optional[str]]]) -> List[str]
+    """
+    Return the lines of `func`'s header rewritten with one argument per line,
+    each followed by its type comment.
+    """
+    first = func.params[0].start
+    prefix = _text(lines, func.start, first)
+    column = ' ' * (len(_indent_of(lines[func.start[0] - 1])) + len(prefix))
+    texts = []
+    for i, (param, _) in enumerate(pairs):
+        text = _text(lines, param.start, param.end)
+        texts.append(text + (',' if i < len(pairs) - 1 else ''))
+    width = max(len(text) for text in texts) + 2
+    result = []
+    for i, (text, (_, type_text)) in enumerate(zip(texts, pairs)):
+        lead = _indent_of(lines[func.start[0] - 1]) + prefix if i == 0 else column
+        if type_text is None:
+            result.append(lead + text + '\n')
+        else:
+            result.append('%s%s# type: %s\n' % (lead, text.ljust(width), type_text))
+    result.append(column + '):\n')
+    return result
+
+
+def _bound_names(text):
+    # type: (str) -> Set[str]
+    """Return the names imported, defined or assigned at the top of `text`."""
+    result = set()  # type: Set[str]
+    for match in _bound_re.finditer(text):
+        if match.group('names'):
+            for name in match.group('names').strip('()').split(','):
+                # "import a.b" binds a, "import a as b" binds b
+                words = name.split()
+                if words:
+                    result.add(words[-1].split('.')[0])
+        else:
+            result.add(match.group('defined') or match.group('assigned'))
+    return result
+
+
+def _add_typing_imports(text, names):
+    # type: (str, Set[str]) -> str
+    """
+    Make sure that `names` are available in the module `text`, importing the
+    ones that are not bound yet from typing.
+    """
+    missing = sorted(names - _bound_names(text))
+    if not missing:
+        return text
+    for match in _typing_import_re.finditer(text):
+        if not match.group('names').startswith('('):
+            current = match.group('names').rstrip()
+            start = match.start('names')
+            return text[:start] + current + ', ' + ', '.join(missing) + \
+                text[start + len(current):]
+    statement = 'from typing import %s\n' % ', '.join(missing)
+    match = _import_re.search(text)
+    if match is not None:
+        return text[:match.start()] + statement + text[match.start():]
+    # after the leading comments and module docstring
+    lines = text.splitlines(True)
+    first = 0
+    tokens = tokenize.generate_tokens(io.StringIO(text).readline)
+    for tok in tokens:
+        if tok.type in (tokenize.COMMENT, tokenize.NL):
+            continue
+        first = tok.start[0] - 1
+        if tok.type == tokenize.STRING:
+            first = next(tokens).end[0]
+        break
+    return ''.join(lines[:first]) + statement + '\n' + ''.join(lines[first:])
+
+
+def convert_source(text, width=79):
+    # type: (str, int) -> Tuple[str, int]
+    """
+    Return `text` with docstring types rewritten as type comments, and the
+    number of functions that were converted.
+    """
+    lines = text.splitlines(True)
+    funcs = list(typecomments.iter_functions(io.StringIO(text).readline))
+    used = set()  # type: Set[str]
+    converted = 0
+    # edit from the bottom up, so the positions of earlier functions stay valid
+    for func in reversed(funcs):
+        if typecomments.signature(func) is not None:
+            continue
+        sig = docstrings.signature(func)
+        if sig is None:
+            continue
+        pairs = _arg_types(func, sig)
+        returns = sig.returns or 'Any'
+        indent = _body_indent(lines, func)
+        comment = _single_line(pairs, returns)
+        typed = [p for p, t in pairs if t is not None]
+        multi_line = len(indent) + len(comment) > width and len(typed) > 1 and \
+            func.end[0] == func.start[0]
+        if multi_line:
+            header = _multi_line_header(lines, func, pairs)
+            comment = '# type: (...) -> %s' % returns
+            tail = lines[func.end[0] - 1][func.end[1]:]
+            header[-1] = header[-1].rstrip('\n') + tail
+            lines[func.start[0] - 1:func.end[0]] = header + [indent + comment + '\n']
+        else:
+            lines.insert(func.end[0], indent + comment + '\n')
+        for _, type_text in pairs:
+            used.update(_identifier_re.findall(type_text or ''))
+        used.update(_identifier_re.findall(returns))
+        converted += 1
+    result = ''.join(lines)
+    if converted:
+        result = _add_typing_imports(result, used & _typing_names)
+    return result, converted
+
+
+def _write_atomic(path, text):
+    # type: (str, str) -> None
+    dirname = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=dirname, prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', newline='') as f:
+            f.write(text)
+        shutil.copymode(path, tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def convert_file(path, width=79, write=True):
+    # type: (str, int, bool) -> Tuple[str, int, str]
+    """
+    Convert the module at `path`, writing it back if `write` is true.
+    Returns the path, the number of converted functions and a unified diff.
+    """
+    with open(path, newline='') as f:
+        text = f.read()
+    result, converted = convert_source(text, width)
+    diff = ''
+    if converted:
+        diff = ''.join(difflib.unified_diff(
+            text.splitlines(True), result.splitlines(True), path, path))
+        if write:
+            _write_atomic(path, result)
+    return path, converted, diff
+
+
+def main(argv=None):
+    # type: (Optional[Sequence[str]]) -> int
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('paths', nargs='+', help='files or directories to convert')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='number of processes (default: cpu count)')
+    parser.add_argument('--diff', action='store_true',
+                        help='print the changes instead of writing them')
+    parser.add_argument('--width', type=int, default=79,
+                        help='longest single-line comment before switching to '
+                             'the multi-line form (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    paths = [p for p in typecomments.find_sources(args.paths) if p.endswith('.py')]
+    total = files = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = [pool.submit(convert_file, path, args.width, not args.diff)
+                   for path in paths]
+        for future in concurrent.futures.as_completed(futures):
+            path, converted, diff = future.result()
+            if converted:
+                files += 1
+                total += converted
+                if args.diff:
+                    sys.stdout.write(diff)
+    print('%s %d functions in %d of %d files' % (
+        'would convert' if args.diff else 'converted', total, files, len(paths)),
+        file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""
+A persisted import/stub dependency graph of a source tree.
+
+Each module points at the files it resolves through (its own ``.pyi`` stub
+and the stubs or modules of its imports, see `modules.direct_dependencies`).
+The graph is saved along with a digest of every file, so that on the next run
+the files that changed can be found, and only the modules that depend on
+them, directly or transitively, need to be checked again.  For the corpus in
+``tests/``, editing ``othermodule2.py`` affects ``test_comment_annotations.py``
+but not ``test_stub_annotations.py``, which only sees
+``test_comment_annotations.pyi``.
+
+Usage::
+
+    python tools/depgraph.py [--graph FILE] [--changed FILE ...] DIR ...
+"""
+import argparse
+import collections
+import json
+import os
+import sys
+import tempfile
+
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+import cache
+import modules
+
+DEFAULT_GRAPH = os.path.join(cache.DEFAULT_DIR, 'depgraph.json')
+
+_VERSION = 1
+
+
+def source_files(roots):
+    # type: (Iterable[str]) -> List[str]
+    """
+    Return the .py and .pyi files in `roots`, which may be files or
+    directories.
+    """
+    result = set()  # type: Set[str]
+    for root in roots:
+        if os.path.isfile(root):
+            result.add(os.path.abspath(root))
+            continue
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames
+                           if not d.startswith('.') and d != '__pycache__']
+            for name in filenames:
+                if name.endswith(modules.EXTENSIONS):
+                    result.add(os.path.abspath(os.path.join(dirpath, name)))
+    return sorted(result)
+
+
+class DependencyGraph(object):
+    """
+    Maps each file to the files it depends on, and to their digests at the
+    time the graph was last updated.
+    """
+
+    def __init__(self):
+        # type: () -> None
+        self.digests = {}  # type: Dict[str, str]
+        self.edges = {}  # type: Dict[str, List[str]]
+        self._dependents = None  # type: Optional[Dict[str, Set[str]]]
+
+    @classmethod
+    def load(cls, path):
+        # type: (str) -> DependencyGraph
+        """Load a saved graph, or return an empty one if there is none."""
+        graph = cls()
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return graph
+        if data.get('version') != _VERSION:
+            return graph
+        for filename, entry in data['files'].items():
+            graph.digests[filename] = entry['digest']
+            graph.edges[filename] = entry['deps']
+        return graph
+
+    def save(self, path):
+        # type: (str) -> None
+        dirname = os.path.dirname(os.path.abspath(path))
+        os.makedirs(dirname, exist_ok=True)
+        data = {
+            'version': _VERSION,
+            'files': dict((filename, {'digest': self.digests[filename],
+                                      'deps': self.edges[filename]})
+                          for filename in self.edges),
+        }
+        fd, tmp = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(tmp, path)
+
+    def update(self, files):
+        # type: (Iterable[str]) -> List[str]
+        """
+        Bring the graph up to date with `files`, rescanning only those whose
+        contents changed, and return the files that were added, changed or
+        removed since the last update.
+        """
+        files = [os.path.abspath(f) for f in files]
+        removed = sorted(set(self.edges) - set(files))
+        added = set(files) - set(self.edges)
+        changed = list(removed)
+        for filename in removed:
+            del self.edges[filename]
+            del self.digests[filename]
+        for filename in files:
+            digest = cache.file_digest(filename)
+            if self.digests.get(filename) == digest:
+                continue
+            self.digests[filename] = digest
+            self.edges[filename] = modules.direct_dependencies(filename)
+            changed.append(filename)
+        if removed or added:
+            # a new or deleted stub changes what unchanged modules resolve to
+            for filename in files:
+                deps = modules.direct_dependencies(filename)
+                if deps != self.edges[filename]:
+                    self.edges[filename] = deps
+                    changed.append(filename)
+        self._dependents = None
+        return changed
+
+    def dependencies(self, filename):
+        # type: (str) -> List[str]
+        """Return every file that `filename` depends on, transitively."""
+        filename = os.path.abspath(filename)
+        seen = set()  # type: Set[str]
+        todo = [filename]
+        while todo:
+            for dep in self.edges.get(todo.pop(), []):
+                if dep not in seen and dep != filename:
+                    seen.add(dep)
+                    todo.append(dep)
+        return sorted(seen)
+
+    def dependents(self, filename):
+        # type: (str) -> Set[str]
+        """Return the files that depend on `filename` directly."""
+        if self._dependents is None:
+            self._dependents = collections.defaultdict(set)
+            for source, deps in self.edges.items():
+                for dep in deps:
+                    self._dependents[dep].add(source)
+        return self._dependents.get(os.path.abspath(filename), set())
+
+    def affected(self, changed):
+        # type: (Iterable[str]) -> List[str]
+        """
+        Return the modules (.py files) whose check results may differ after
+        `changed` were edited: the changed modules themselves, plus every
+        module that resolves through one of them, transitively.
+        """
+        seen = set()  # type: Set[str]
+        todo = [os.path.abspath(f) for f in changed]
+        while todo:
+            current = todo.pop()
+            if current in seen:
+                continue
+            seen.add(current)
+            todo.extend(self.dependents(current))
+        return sorted(f for f in seen if f.endswith('.py') and f in self.edges)
+
+
+def main(argv=None):
+    # type: (Optional[Sequence[str]]) -> int
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('roots', nargs='+', help='files or directories to scan')
+    parser.add_argument('--graph', default=DEFAULT_GRAPH,
+                        help='where the graph is stored (default: %(default)s)')
+    parser.add_argument('--changed', nargs='*', metavar='FILE',
+                        help='report the modules affected by these files '
+                             'instead of those changed since the last run')
+    args = parser.parse_args(argv)
+
+    graph = DependencyGraph.load(args.graph)
+    changed = graph.update(source_files(args.roots))
+    graph.save(args.graph)
+    if args.changed is not None:
+        changed = args.changed
+    for filename in graph.affected(changed):
+        print(os.path.relpath(filename))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
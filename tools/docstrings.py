@@ -0,0 +1,353 @@
+"""
+Extract function signatures from the types given in docstrings.
+
+PyCharm reads types from four styles of docstrings (see ``docs/tools.rst``),
+and so does this module.  The style is detected per function, in the same
+single pass over the docstring that collects the types::
+
+    :type arg: Container[int]             reStructuredText
+    :rtype: int
+
+    @type arg: Container[int]             Epytext
+    @rtype: int
+
+    Args:                                 Google
+        arg (Container[int]): ...
+    Returns:
+        int: ...
+
+    Parameters                            NumPy
+    ----------
+    arg : Container[int]
+
+The result is the same `typecomments.Signature` records that the comment
+parser produces, with a source of 'docstring'.  Functions that have a type
+comment keep it: that is what mypy would use.
+
+Usage::
+
+    python tools/docstrings.py [-j JOBS] [--index FILE] PATH ...
+    python tools/docstrings.py --benchmark [--lines N] [PATH ...]
+"""
+import argparse
+import ast
+import collections
+import inspect
+import io
+import os
+import re
+import sys
+import time
+import tokenize
+
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import typecomments
+
+RST = 'rest'
+EPYTEXT = 'epytext'
+GOOGLE = 'google'
+NUMPY = 'numpy'
+
+# `params` maps argument names (without stars) to types
+DocstringTypes = collections.namedtuple('DocstringTypes', 'style params returns')
+
+_field_re = re.compile(
+    r'^(?P<marker>[:@])(?P<field>type|rtype|param|arg|argument|parameter)'
+    r'(?:\s+(?P<arg>[^:]*?))?\s*:\s*(?P<value>.*)$')
+_google_section_re = re.compile(
+    r'^(?P<section>Args|Arguments|Parameters|Params|Keyword Args|'
+    r'Keyword Arguments|Other Parameters|Returns|Return|Yields):\s*$')
+_google_arg_re = re.compile(r'^\**(?P<name>\w+)\s*\((?P<type>.*)\)\s*:')
+_numpy_underline_re = re.compile(r'^-{3,}\s*$')
+_numpy_arg_re = re.compile(r'^(?P<names>\**\w+(?:\s*,\s*\**\w+)*)\s*:\s*(?P<type>.*)$')
+_optional_re = re.compile(r',\s*(?:optional|default\b.*)$')
+
+_PARAM_SECTIONS = frozenset(['Args', 'Arguments', 'Parameters', 'Params',
+                             'Keyword Args', 'Keyword Arguments',
+                             'Other Parameters'])
+_RETURN_SECTIONS = frozenset(['Returns', 'Return', 'Yields'])
+
+
+def _indent(line):
+    # type: (str) -> int
+    return len(line) - len(line.lstrip())
+
+
+def _clean_type(text):
+    # type: (str) -> Optional[str]
+    text = _optional_re.sub('', text.strip())
+    return text or None
+
+
+def parse_docstring(text):
+    # type: (str) -> Optional[DocstringTypes]
+    """
+    Return the argument and return types documented in the docstring `text`,
+    or None if it documents no types.
+    """
+    lines = inspect.cleandoc(text).splitlines()
+    style = None  # type: Optional[str]
+    params = {}  # type: Dict[str, str]
+    returns = None  # type: Optional[str]
+    # the google or numpy section we are in, and the indentation of its
+    # entries
+    section = None  # type: Optional[str]
+    entry_indent = None  # type: Optional[int]
+
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if not stripped:
+            continue
+        indent = _indent(line)
+
+        # reST and epytext fields can appear anywhere
+        match = _field_re.match(stripped)
+        if match is not None:
+            section = None
+            style = style or (RST if match.group('marker') == ':' else EPYTEXT)
+            field, arg = match.group('field'), match.group('arg')
+            value = match.group('value').strip()
+            if field == 'type' and arg:
+                params[arg.lstrip('*')] = value
+            elif field == 'rtype':
+                returns = value
+            elif arg and ' ' in arg.strip():
+                # :param Dict[str, bool] enabled: ...
+                type_text, _, name = arg.strip().rpartition(' ')
+                params.setdefault(name.lstrip('*'), type_text)
+            continue
+
+        # numpy section headers are underlined
+        if i + 1 < len(lines) and _numpy_underline_re.match(lines[i + 1].strip()):
+            section = stripped
+            entry_indent = None
+            style = style or (NUMPY if section in _PARAM_SECTIONS or
+                              section in _RETURN_SECTIONS else None)
+            continue
+        if _numpy_underline_re.match(stripped):
+            continue
+
+        match = _google_section_re.match(stripped)
+        if match is not None:
+            section = match.group('section')
+            entry_indent = None
+            style = style or GOOGLE
+            continue
+
+        if section is None:
+            continue
+        if entry_indent is None:
+            entry_indent = indent
+        elif indent > entry_indent:
+            # description of the previous entry
+            continue
+        elif indent < entry_indent:
+            section = None
+            continue
+
+        if style == NUMPY:
+            if section in _PARAM_SECTIONS:
+                match = _numpy_arg_re.match(stripped)
+                if match is not None:
+                    type_text = _clean_type(match.group('type'))
+                    for name in match.group('names').split(','):
+                        if type_text:
+                            params[name.strip().lstrip('*')] = type_text
+            elif section in _RETURN_SECTIONS and returns is None:
+                # either "Type" or "name : Type"
+                match = _numpy_arg_re.match(stripped)
+                returns = match.group('type').strip() if match else stripped
+        elif style == GOOGLE:
+            if section in _PARAM_SECTIONS:
+                match = _google_arg_re.match(stripped)
+                if match is not None:
+                    type_text = _clean_type(match.group('type'))
+                    if type_text:
+                        params[match.group('name')] = type_text
+            elif section in _RETURN_SECTIONS and returns is None:
+                type_text, sep, _ = stripped.partition(': ')
+                returns = type_text.rstrip(':') if sep or \
+                    stripped.endswith(':') else stripped
+
+    if style is None or not params and returns is None:
+        return None
+    return DocstringTypes(style, params, returns)
+
+
+def _literal(token):
+    # type: (str) -> str
+    """Return the value of a string literal token."""
+    try:
+        return ast.literal_eval(token)
+    except (ValueError, SyntaxError):
+        # python 2 only prefixes, like ur''
+        body = token.lstrip('uUbBrR')
+        quote = body[:3] if body[:3] in ('"""', "'''") else body[:1]
+        return body[len(quote):-len(quote)]
+
+
+def signature(func):
+    # type: (typecomments.FunctionDef) -> Optional[typecomments.Signature]
+    """
+    Return the signature of `func` given by its docstring, or None if the
+    docstring documents no types.
+    """
+    if func.docstring is None:
+        return None
+    parsed = parse_docstring(_literal(func.docstring))
+    if parsed is None:
+        return None
+    args = tuple(
+        typecomments.Arg(p.name, p.kind,
+                         typecomments.normalize(parsed.params[p.name])
+                         if p.name in parsed.params else None,
+                         p.default is not None)
+        for p in func.params)
+    returns = typecomments.normalize(parsed.returns) if parsed.returns else None
+    return typecomments.Signature(func.qualname, func.lineno, args, returns,
+                                  'docstring')
+
+
+def extract_source(readline):
+    # type: (Callable[[], str]) -> List[typecomments.Signature]
+    """
+    Return the signatures of the functions in the source read through
+    `readline`, from their type comments or, failing that, their
+    docstrings.
+    """
+    result = []
+    for func in typecomments.iter_functions(readline):
+        sig = typecomments.signature(func) or signature(func)
+        if sig is not None:
+            result.append(sig)
+    return result
+
+
+def extract(path):
+    # type: (str) -> List[typecomments.Signature]
+    """
+    Return the signatures of the functions in the module at `path`, from
+    their type comments or, failing that, their docstrings.
+    """
+    try:
+        with tokenize.open(path) as f:
+            return extract_source(f.readline)
+    except (SyntaxError, UnicodeDecodeError):
+        return []
+
+
+# Benchmark
+# =========
+
+# the examples from docs/tools.rst, one per style
+_STYLE_EXAMPLES = '''
+def doit_rest(inputs, enabled):
+    """Do something with those inputs
+
+    :param inputs: input names
+    :type inputs:  Union[str, List[str]]
+    :param enabled: mapping of input names to enabled status
+    :type enabled: Dict[str, bool]
+    :rtype: Iterable[str]
+    """
+
+
+def doit_epytext(inputs, enabled):
+    """Do something with those inputs
+
+    @param inputs: input names
+    @type inputs:  Union[str, List[str]]
+    @param enabled: mapping of input names to enabled status
+    @type enabled: Dict[str, bool]
+    @rtype: Iterable[str]
+    """
+
+
+def doit_google(inputs, enabled):
+    """Do something with those inputs
+
+    Args:
+        inputs (Union[str, List[str]]):  input names
+        enabled (Dict[str, bool]):  mapping of input names to
+            enabled status
+
+    Returns:
+        Iterable[str]: enabled inputs
+    """
+
+
+def doit_numpy(inputs, enabled):
+    """Do something with those inputs
+
+    Parameters
+    ----------
+    inputs : Union[str, List[str]]
+        input names
+    enabled: Dict[str, bool]
+        mapping of input names to enabled status
+
+    Returns
+    -------
+    Iterable[str]
+        enabled inputs
+    """
+'''
+
+
+def benchmark(paths, lines=100000):
+    # type: (Sequence[str], int) -> Dict[str, float]
+    """
+    Measure how fast the docstrings of `paths` (plus one example of each
+    style) are extracted, repeating them in memory to at least `lines` lines.
+    Everything runs in this process, so the result is the rate of one core.
+    """
+    sources = [_STYLE_EXAMPLES]
+    for path in paths:
+        with tokenize.open(path) as f:
+            sources.append(f.read())
+    unit = '\n'.join(sources)
+    unit_lines = unit.count('\n') + 1
+    copies = max(1, -(-lines // unit_lines))
+    styles = collections.Counter()  # type: collections.Counter
+    signatures = 0
+    start = time.perf_counter()
+    for _ in range(copies):
+        for func in typecomments.iter_functions(io.StringIO(unit).readline):
+            if typecomments.signature(func) is not None:
+                signatures += 1
+            elif func.docstring is not None:
+                parsed = parse_docstring(_literal(func.docstring))
+                if parsed is not None:
+                    styles[parsed.style] += 1
+                    signatures += 1
+    elapsed = time.perf_counter() - start
+    result = {
+        'lines': copies * unit_lines,
+        'seconds': elapsed,
+        'lines_per_second': copies * unit_lines / elapsed,
+        'signatures': signatures,
+    }
+    result.update(('style_' + name, count) for name, count in styles.items())
+    return result
+
+
+def main(argv=None):
+    # type: (Optional[Sequence[str]]) -> int
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--benchmark', action='store_true')
+    parser.add_argument('--lines', type=int, default=100000)
+    args, rest = parser.parse_known_args(argv)
+    if not args.benchmark:
+        return typecomments.main(rest, extract, __doc__)
+
+    paths = rest or [os.path.join(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))), 'tests', 'test_docstring_annotations.py')]
+    stats = benchmark(paths, args.lines)
+    for key in sorted(stats):
+        print('%s: %s' % (key, round(stats[key], 3)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
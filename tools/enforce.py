@@ -0,0 +1,964 @@
+"""
+Check calls against the ``# type:`` comments or docstring types of functions
+at runtime.
+
+Static checkers only see the calls they can follow: ``dict_test(arg)`` in
+``tests/test_comment_annotations.py`` is caught, but a ``dict`` that arrives
+over the wire at a service boundary is not.  This checks such calls as they
+happen, with the same signatures the other tools read::
+
+    import enforce
+
+    @enforce.enforce(every=100)
+    def dict_test(arg):
+        # type: (Dict[str, int]) -> None
+        ...
+
+or, for every function of the modules imported from then on::
+
+    enforce.install(modules=['myservice'])
+
+The signature of a function is read from its source, and compiled on its
+first checked call into a checker with the same parameters as the function,
+so that python itself binds the arguments, and with one test per typed
+parameter: a bare ``isinstance`` for plain classes, and a specialized
+predicate for ``Dict[str, int]``, ``Tuple[int, ...]`` and the like.  Types
+given for ``*args`` or ``**kwargs`` apply to each of their values, as in
+``(*Tuple[str, int, float]) -> None``.
+
+Only the first call and then one call in `every` is checked; the others
+cost a counter decrement on top of the call.  A failed check raises
+`TypeCheckError`, or with ``action='warn'`` issues a `TypeCheckWarning`.
+Names that cannot be resolved from the function's module (like
+``othermodule.ExternalType`` when ``othermodule`` is not imported) are not
+checked.  The import hook wraps module and class level functions after their
+module has run, so calls made while the module is being imported, and nested
+functions, are not checked.  Given an `annindex.AnnotationIndex`, it loads
+the signatures of each module from the index instead of tokenizing its
+source.
+
+By default every element of a ``List[int]`` or ``Dict[str, int]`` is
+checked, which makes a checked call O(n).  With a `budget`, at most that many
+elements of each container are looked at, spread over lists and tuples from
+a random offset, and `budgets` sets the budget of particular annotations.
+With `lazy`, arguments typed as read-only interfaces (``Sequence[int]``,
+``Mapping[str, int]``, or an iterator for ``Iterable[int]``) are handed to
+the function wrapped, and their elements are checked as they are read.
+Without it the elements of iterators are not checked, since that would
+consume them.
+
+Usage::
+
+    python tools/enforce.py [-e EVERY] [--warn] [-b BUDGET] [--budget-for TYPE=BUDGET]
+                            [--lazy] [--index DIR | --no-index] [-m MODULE ...]
+                            SCRIPT [ARG ...]
+"""
+import argparse
+import builtins
+import collections
+import collections.abc
+import functools
+import importlib.abc
+import importlib.machinery
+import inspect
+import itertools
+import os
+import random
+import runpy
+import sys
+import threading
+import typing
+import warnings
+
+from typing import (
+    Any, Callable, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple, Union,
+)
+
+import annindex
+import typecomments
+import typeexpr
+
+RAISE = 'raise'
+WARN = 'warn'
+
+
+class TypeCheckError(TypeError):
+    """A call or return value that does not match the function's types."""
+
+
+class TypeCheckWarning(RuntimeWarning):
+    """Issued instead of raising `TypeCheckError` with ``action='warn'``."""
+
+
+# A compiled check is None (anything goes), a class or tuple of classes that
+# is tested with isinstance, or a predicate.
+_Check = Union[None, type, Tuple[type, ...], Callable[[Any], bool]]
+
+# python 2 names, for comments written against python 2
+_PY2_NAMES = {'unicode': str, 'long': int, 'basestring': str}
+# the implicit promotions of PEP 484
+_NUMERIC = {float: (float, int), complex: (complex, float, int)}
+# containers whose elements can be checked without consuming anything
+_CONCRETE = (list, tuple, set, frozenset, collections.deque)
+
+_NoneType = type(None)
+_UNRESOLVED = object()
+
+# How deeply containers are checked.  `budget` is the most elements looked at
+# in one container, or None for all of them, and `budgets` overrides it for
+# particular annotations, keyed by their canonical spelling (like
+# ``'List[int]'``, see `typeexpr`).  With `lazy`, arguments annotated with a
+# read-only interface (``Sequence``, ``Mapping``, ``Iterable`` or
+# ``Iterator``) are wrapped instead, so that their elements are checked as the
+# function reads them, within the same budget.  Sampled offsets are drawn
+# from `rng`, a `random.Random` of the policy's own, so that checking leaves
+# the seeded stream of the `random` module to the program being checked.
+Policy = collections.namedtuple('Policy', 'budget budgets lazy rng')
+FULL = Policy(None, {}, False, None)
+
+
+def _resolve(name, namespace):
+    # type: (str, Dict[str, Any]) -> Any
+    """
+    Return the object named `name` in `namespace`, falling back to builtins,
+    `typing`, python 2 names and imported modules.
+    """
+    parts = name.split('.')
+    head = parts[0]
+    for scope in (namespace, builtins.__dict__, typing.__dict__, _PY2_NAMES):
+        if head in scope:
+            obj = scope[head]
+            break
+    else:
+        # othermodule.ExternalType, with othermodule imported elsewhere
+        for i in range(len(parts) - 1, 0, -1):
+            obj = sys.modules.get('.'.join(parts[:i]))
+            if obj is not None:
+                parts = parts[i - 1:]
+                break
+        else:
+            return _UNRESOLVED
+    for part in parts[1:]:
+        obj = getattr(obj, part, _UNRESOLVED)
+        if obj is _UNRESOLVED:
+            break
+    return obj
+
+
+# Checks
+# ======
+
+def _predicate(check):
+    # type: (_Check) -> Callable[[Any], bool]
+    if isinstance(check, (type, tuple)):
+        return lambda value: isinstance(value, check)
+    return check
+
+
+def _all(check, budget=None, rng=None):
+    # type: (_Check, Optional[int], Optional[random.Random]) -> Callable[[Any], bool]
+    """
+    Return a predicate for whether the values of a container pass `check`.
+    With a `budget`, at most that many values are looked at: every n-th item
+    from an offset drawn from `rng` for lists and tuples, and the first ones
+    in iteration order for other containers.
+    """
+    if isinstance(check, (type, tuple)):
+        def full(values):
+            # type: (Any) -> bool
+            return all(map(isinstance, values, itertools.repeat(check)))
+    else:
+        def full(values):
+            # type: (Any) -> bool
+            return all(map(check, values))
+    if budget is None:
+        return full
+    randrange = (rng or random.Random()).randrange
+
+    def sampled(values):
+        # type: (Any) -> bool
+        size = len(values)
+        if size <= budget:
+            return full(values)
+        if not budget:
+            return True
+        if isinstance(values, (list, tuple)):
+            step = size // budget
+            # any item can be picked, including the ones past step * budget
+            offset = randrange(size - step * (budget - 1))
+            return full(values[offset:offset + step * budget:step])
+        return full(itertools.islice(values, budget))
+    return sampled
+
+
+def _union(checks):
+    # type: (List[_Check]) -> _Check
+    if any(check is None for check in checks):
+        return None
+    classes = []  # type: List[type]
+    predicates = []  # type: List[Callable[[Any], bool]]
+    for check in checks:
+        if isinstance(check, tuple):
+            classes.extend(check)
+        elif isinstance(check, type):
+            classes.append(check)
+        else:
+            predicates.append(check)
+    types = tuple(classes)
+    if not predicates:
+        return types[0] if len(types) == 1 else types
+    return lambda value: isinstance(value, types) or \
+        any(predicate(value) for predicate in predicates)
+
+
+class _Compiler(object):
+    """Compiles the type expressions of one function into checks."""
+
+    def __init__(self, namespace, policy=FULL):
+        # type: (Dict[str, Any], Policy) -> None
+        self.namespace = namespace
+        self.policy = policy
+        self.unresolved = []  # type: List[str]
+
+    def compile(self, text):
+        # type: (Optional[str]) -> _Check
+        node = self._parse(text)
+        return self._arg(node) if node is not None else None
+
+    def _parse(self, text):
+        # type: (Optional[str]) -> Optional[typeexpr.Type]
+        if not text:
+            return None
+        try:
+            return typeexpr.parse(text)
+        except ValueError:
+            self.unresolved.append(text)
+            return None
+
+    def _budget(self, node):
+        # type: (Any) -> Optional[int]
+        if isinstance(node, typeexpr.Type) and self.policy.budgets:
+            return self.policy.budgets.get(node.text, self.policy.budget)
+        return self.policy.budget
+
+    def _arg(self, arg):
+        # type: (Any) -> _Check
+        """Compile a parsed node, or a member of the __args__ of a typing object."""
+        if isinstance(arg, typeexpr.Type):
+            if arg.name == 'None':
+                return _NoneType
+            obj = _resolve(arg.name, self.namespace)
+            if obj is _UNRESOLVED:
+                self.unresolved.append(arg.name)
+                return None
+            return self._object(obj, arg.args, self._budget(arg))
+        if isinstance(arg, typing.ForwardRef):
+            return self.compile(arg.__forward_arg__)
+        return self._object(arg, None, self.policy.budget)
+
+    def _object(self, obj, args, budget):
+        # type: (Any, Optional[List[Any]], Optional[int]) -> _Check
+        origin = getattr(obj, '__origin__', None)
+        if origin is not None:
+            # typing.Dict, or an alias such as Number = Union[int, float]
+            if args is None:
+                args = list(getattr(obj, '__args__', None) or ()) or None
+            obj = origin
+        if obj is typing.Any or obj is object:
+            return None
+        if obj is None or obj is _NoneType:
+            return _NoneType
+        if obj is typing.Union:
+            return _union([self._arg(arg) for arg in args or ()])
+        if obj is typing.Optional:
+            return _union([self._arg(args[0]), _NoneType]) if args else None
+        if isinstance(obj, typing.TypeVar):
+            if obj.__constraints__:
+                return _union([self._arg(c) for c in obj.__constraints__])
+            return self._arg(obj.__bound__) if obj.__bound__ is not None else None
+        if not isinstance(obj, type):
+            # NewType, Literal and the like
+            return None
+        if obj is tuple:
+            return self._tuple(args, budget)
+        if obj is type:
+            return self._type(args)
+        if obj is collections.abc.Callable:
+            return callable
+        if obj in _NUMERIC:
+            return _NUMERIC[obj]
+        if not args or issubclass(obj, (str, bytes)):
+            return obj
+        if issubclass(obj, collections.abc.Mapping):
+            return self._mapping(obj, args, budget)
+        if issubclass(obj, collections.abc.Iterable):
+            return self._container(obj, args, budget)
+        # a user defined generic, like Stack[int]
+        return obj
+
+    def _tuple(self, args, budget):
+        # type: (Optional[List[Any]], Optional[int]) -> _Check
+        if args is None:
+            return tuple
+        if not args or [getattr(a, 'name', None) for a in args] == ['()']:
+            return lambda value: isinstance(value, tuple) and not value
+        if len(args) == 2 and (args[1] is Ellipsis or
+                               getattr(args[1], 'name', None) == '...'):
+            check = self._arg(args[0])
+            if check is None:
+                return tuple
+            elements = _all(check, budget, self.policy.rng)
+            return lambda value: isinstance(value, tuple) and elements(value)
+        checks = [self._arg(a) for a in args]
+        size = len(checks)
+        if all(check is None or isinstance(check, (type, tuple)) for check in checks):
+            classes = [object if check is None else check for check in checks]
+            return lambda value: isinstance(value, tuple) and len(value) == size and \
+                all(map(isinstance, value, classes))
+        items = [(i, _predicate(check)) for i, check in enumerate(checks)
+                 if check is not None]
+        return lambda value: isinstance(value, tuple) and len(value) == size and \
+            all(check(value[i]) for i, check in items)
+
+    def _type(self, args):
+        # type: (Optional[List[Any]]) -> _Check
+        cls = self._arg(args[0]) if args else None
+        if not isinstance(cls, (type, tuple)):
+            return type
+        return lambda value: isinstance(value, type) and issubclass(value, cls)
+
+    def _mapping(self, cls, args, budget):
+        # type: (type, List[Any], Optional[int]) -> _Check
+        keys = self._arg(args[0])
+        values = self._arg(args[1]) if len(args) > 1 else None
+        if keys is None and values is None:
+            return cls
+        rng = self.policy.rng
+        keys_ok = _all(keys, budget, rng) if keys is not None else None
+        values_ok = _all(values, budget, rng) if values is not None else None
+        return lambda value: isinstance(value, cls) and \
+            (keys_ok is None or keys_ok(value.keys())) and \
+            (values_ok is None or values_ok(value.values()))
+
+    def _container(self, cls, args, budget):
+        # type: (type, List[Any], Optional[int]) -> _Check
+        check = self._arg(args[0])
+        if check is None:
+            return cls
+        elements = _all(check, budget, self.policy.rng)
+        if issubclass(cls, _CONCRETE):
+            return lambda value: isinstance(value, cls) and elements(value)
+        # Iterable[int] and friends: only look inside what can be re-read
+        return lambda value: isinstance(value, cls) and \
+            (not isinstance(value, _CONCRETE) or elements(value))
+
+    def lazy(self, text, fail):
+        # type: (Optional[str], Callable[[str, Any, str], None]) -> Optional[Callable[[Any], Any]]
+        """
+        Return a function that wraps the values of type `text` so that their
+        elements are checked as they are read, and that returns None for the
+        values it cannot wrap.  `fail` is called with a description, the
+        element and its expected type.  Returns None when `text` is not a
+        read-only interface.
+        """
+        node = self._parse(text)
+        if node is None or not node.args:
+            return None
+        obj = _resolve(node.name, self.namespace)
+        cls = getattr(obj, '__origin__', obj)
+        if cls not in _LAZY:
+            return None
+        checks = [self._arg(arg) for arg in node.args]
+        if all(check is None for check in checks):
+            return None
+        checks = [_predicate(check) if check is not None else None for check in checks]
+        expected = [arg.text for arg in node.args]
+        budget = self._budget(node)
+        if cls is collections.abc.Mapping:
+            return lambda value: _LazyMapping(
+                value, checks[0], checks[1] if len(checks) > 1 else None,
+                expected, fail, budget) \
+                if isinstance(value, collections.abc.Mapping) else None
+        if cls is collections.abc.Sequence:
+            return lambda value: _LazySequence(value, checks[0], expected[0],
+                                               fail, budget) \
+                if isinstance(value, collections.abc.Sequence) and \
+                not isinstance(value, (str, bytes)) else None
+        # an iterator is read only once, so wrapping it costs nothing
+        return lambda value: _checked_iter(value, checks[0], expected[0], fail,
+                                           budget) \
+            if isinstance(value, collections.abc.Iterator) else None
+
+
+# Lazy checks
+# ===========
+
+def _checked_iter(iterator, check, expected, fail, budget):
+    # type: (Iterator, Callable[[Any], bool], str, Callable[[str, Any, str], None], Optional[int]) -> Iterator
+    for item in itertools.islice(iterator, budget):
+        if not check(item):
+            fail('element', item, expected)
+        yield item
+    yield from iterator
+
+
+class _LazySequence(collections.abc.Sequence):
+    """A read-only view of a sequence that checks the items that are read."""
+
+    __slots__ = ('_data', '_check', '_expected', '_fail', '_left')
+
+    def __init__(self, data, check, expected, fail, budget):
+        # type: (Sequence, Callable[[Any], bool], str, Callable[[str, Any, str], None], Optional[int]) -> None
+        self._data = data
+        self._check = check
+        self._expected = expected
+        self._fail = fail
+        # how many more items are checked, or None for all of them
+        self._left = budget
+
+    def _checked(self, item):
+        # type: (Any) -> Any
+        if self._left is None or self._left > 0:
+            if self._left is not None:
+                self._left -= 1
+            if not self._check(item):
+                self._fail('element', item, self._expected)
+        return item
+
+    def __getitem__(self, index):
+        # type: (Any) -> Any
+        if isinstance(index, slice):
+            return _LazySequence(self._data[index], self._check, self._expected,
+                                 self._fail, self._left)
+        return self._checked(self._data[index])
+
+    def __len__(self):
+        # type: () -> int
+        return len(self._data)
+
+    def __iter__(self):
+        # type: () -> Iterator
+        return _checked_iter(iter(self._data), self._check, self._expected,
+                             self._fail, self._left)
+
+    def __getattr__(self, name):
+        # type: (str) -> Any
+        return getattr(self._data, name)
+
+    def __repr__(self):
+        # type: () -> str
+        return repr(self._data)
+
+
+class _LazyMapping(collections.abc.Mapping):
+    """A read-only view of a mapping that checks the keys and values that are read."""
+
+    __slots__ = ('_data', '_keys', '_values', '_expected', '_fail', '_left')
+
+    def __init__(self, data, keys, values, expected, fail, budget):
+        # type: (Mapping, Optional[Callable[[Any], bool]], Optional[Callable[[Any], bool]], List[str], Callable[[str, Any, str], None], Optional[int]) -> None
+        self._data = data
+        self._keys = keys
+        self._values = values
+        self._expected = expected
+        self._fail = fail
+        self._left = budget
+
+    def _spend(self):
+        # type: () -> bool
+        if self._left is None:
+            return True
+        if self._left > 0:
+            self._left -= 1
+            return True
+        return False
+
+    def __getitem__(self, key):
+        # type: (Any) -> Any
+        value = self._data[key]
+        if self._values is not None and self._spend() and not self._values(value):
+            self._fail('value', value, self._expected[1])
+        return value
+
+    def __iter__(self):
+        # type: () -> Iterator
+        for key in self._data:
+            if self._keys is not None and self._spend() and not self._keys(key):
+                self._fail('key', key, self._expected[0])
+            yield key
+
+    def __len__(self):
+        # type: () -> int
+        return len(self._data)
+
+    def __contains__(self, key):
+        # type: (Any) -> bool
+        return key in self._data
+
+    def __getattr__(self, name):
+        # type: (str) -> Any
+        return getattr(self._data, name)
+
+    def __repr__(self):
+        # type: () -> str
+        return repr(self._data)
+
+
+_LAZY = frozenset([collections.abc.Mapping, collections.abc.Sequence,
+                   collections.abc.Iterable, collections.abc.Iterator])
+
+
+# Signatures
+# ==========
+
+# qualified name -> the definitions with that name
+_Table = Dict[str, List[annindex.Definition]]
+
+# path -> (mtime, table)
+_definitions = {}  # type: Dict[str, Tuple[float, _Table]]
+
+
+def _make_table(defs):
+    # type: (List[annindex.Definition]) -> _Table
+    table = {}  # type: _Table
+    for d in defs:
+        table.setdefault(d.qualname, []).append(d)
+    return table
+
+
+def _read_definitions(path):
+    # type: (str) -> _Table
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return {}
+    cached = _definitions.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    table = _make_table(annindex.definitions(path))
+    _definitions[path] = (mtime, table)
+    return table
+
+
+def _find_signature(table, func):
+    # type: (_Table, Callable) -> Optional[typecomments.Signature]
+    """Return the signature of the definition in `table` that created `func`."""
+    code = getattr(func, '__code__', None)
+    if code is None:
+        return None
+    qualname = func.__qualname__.replace('.<locals>', '')
+    # the first line of the code is the one of its first decorator
+    candidates = [d for d in table.get(qualname, ())
+                  if d.name == code.co_name and d.lineno >= code.co_firstlineno]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda d: d.lineno).signature
+
+
+def signature_of(func):
+    # type: (Callable) -> Optional[typecomments.Signature]
+    """Return the signature of `func` from its type comments or docstring."""
+    code = getattr(func, '__code__', None)
+    if code is None:
+        return None
+    return _find_signature(_read_definitions(code.co_filename), func)
+
+
+def _reporter(qualname, action):
+    # type: (str, str) -> Callable[[str, Any, str], None]
+    def report(name, value, expected):
+        # type: (str, Any, str) -> None
+        message = '%s() %s: expected %s, got %s' % (
+            qualname, name, expected, type(value).__name__)
+        if action == WARN:
+            warnings.warn(message, TypeCheckWarning, stacklevel=4)
+        else:
+            raise TypeCheckError(message)
+    return report
+
+
+def compile_signature(func, sig, action=RAISE, policy=FULL):
+    # type: (Callable, typecomments.Signature, str, Policy) -> Tuple[Optional[Callable[..., Any]], Optional[Callable[[Any], None]]]
+    """
+    Return a checker for the arguments of calls to `func`, which takes the
+    same arguments as `func`, and one for its return values.  Either is None
+    when there is nothing to check.  When some arguments are wrapped for lazy
+    checking, the argument checker returns the (args, kwargs) to call `func`
+    with, and None otherwise.
+    """
+    compiler = _Compiler(getattr(func, '__globals__', {}), policy)
+    report = _reporter(func.__qualname__, action)
+    types = dict((arg.name, arg.type) for arg in sig.args)
+    namespace = {'_enforce_report': report}  # type: Dict[str, Any]
+    params = []  # type: List[str]
+    body = []  # type: List[str]
+    # how the wrapped arguments are passed on
+    positional = []  # type: List[str]
+    keywords = []  # type: List[str]
+    star_seen = wrapped = False
+    parameters = list(inspect.signature(func).parameters.values())
+    for i, param in enumerate(parameters):
+        name, kind = param.name, param.kind
+        check = compiler.compile(types.get(name))
+        if check is not None and param.default is None:
+            # PEP 484: a default of None makes the type optional
+            check = _union([check, _NoneType])
+        var = '_enforce_%d' % i
+        namespace[var] = check
+        if check is None:
+            test = None
+        elif isinstance(check, (type, tuple)):
+            test = 'isinstance(%%s, %s)' % var
+        else:
+            test = '%s(%%s)' % var
+        expected = repr(types.get(name))
+
+        if kind == param.VAR_POSITIONAL:
+            params.append('*' + name)
+            positional.append('*' + name)
+            star_seen = True
+            if test:
+                body.append('    for _enforce_value in %s:' % name)
+                body.append('        if not %s: _enforce_report(%r, _enforce_value, %s)'
+                            % (test % '_enforce_value', 'argument *' + name,
+                               expected))
+            continue
+        if kind == param.VAR_KEYWORD:
+            params.append('**' + name)
+            keywords.append('**' + name)
+            if test:
+                body.append('    for _enforce_value in %s.values():' % name)
+                body.append('        if not %s: _enforce_report(%r, _enforce_value, %s)'
+                            % (test % '_enforce_value', 'argument **' + name,
+                               expected))
+            continue
+        if kind == param.KEYWORD_ONLY:
+            keywords.append('%r: %s' % (name, name))
+            if not star_seen:
+                params.append('*')
+                star_seen = True
+        else:
+            positional.append(name)
+        if param.default is param.empty:
+            params.append(name)
+            guard = ''
+        else:
+            # defaults are passed on as they are, and not checked
+            namespace['_enforce_default_%d' % i] = param.default
+            params.append('%s=_enforce_default_%d' % (name, i))
+            guard = '%s is not _enforce_default_%d and ' % (name, i)
+        if kind == param.POSITIONAL_ONLY and (
+                i + 1 == len(parameters) or
+                parameters[i + 1].kind != param.POSITIONAL_ONLY):
+            params.append('/')
+        if not test:
+            continue
+        lazy = compiler.lazy(types.get(name), _failer(report, name)) \
+            if policy.lazy else None
+        if lazy is not None:
+            namespace['_enforce_lazy_%d' % i] = lazy
+            body.append('    if %sTrue:' % guard)
+            body.append('        _enforce_value = _enforce_lazy_%d(%s)' % (i, name))
+            body.append('        if _enforce_value is not None: %s = _enforce_value' % name)
+            body.append('        elif not %s: _enforce_report(%r, %s, %s)'
+                        % (test % name, 'argument ' + name, name, expected))
+            wrapped = True
+        else:
+            body.append('    if %snot %s: _enforce_report(%r, %s, %s)'
+                        % (guard, test % name, 'argument ' + name, name, expected))
+    if wrapped:
+        body.append('    return (%s), {%s}' % (
+            ''.join(p + ', ' for p in positional), ', '.join(keywords)))
+
+    check_args = None
+    if body:
+        source = 'def check_args(%s):\n%s\n' % (', '.join(params), '\n'.join(body))
+        exec(source, namespace)
+        check_args = namespace['check_args']
+
+    check_returns = None
+    returns = compiler.compile(sig.returns)
+    if returns is not None:
+        passes = _predicate(returns)
+
+        def check_returns(value):
+            # type: (Any) -> None
+            if not passes(value):
+                report('returned value', value, sig.returns)
+    return check_args, check_returns
+
+
+def _failer(report, name):
+    # type: (Callable[[str, Any, str], None], str) -> Callable[[str, Any, str], None]
+    """Return the `fail` callback of the lazy wrappers of argument `name`."""
+    def fail(what, value, expected):
+        # type: (str, Any, str) -> None
+        report('%s of argument %s' % (what, name), value, expected)
+    return fail
+
+
+def _wrap(func, sig, every=1, action=RAISE, policy=FULL):
+    # type: (Callable, typecomments.Signature, int, str, Policy) -> Callable
+    # the first call is always checked
+    countdown = 1
+    compiled = None  # type: Optional[Tuple[Any, Any]]
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        nonlocal countdown, compiled
+        countdown -= 1
+        if countdown:
+            return func(*args, **kwargs)
+        countdown = every
+        if compiled is None:
+            # compiled on first use, so that the names in the signature can
+            # refer to things defined after the function
+            compiled = compile_signature(func, sig, action, policy)
+        check_args, check_returns = compiled
+        if check_args is not None:
+            try:
+                bound = check_args(*args, **kwargs)
+            except TypeCheckError:
+                raise
+            except TypeError:
+                try:
+                    signature.bind(*args, **kwargs)
+                except TypeError:
+                    # the call itself is wrong: let the function say so
+                    bound = None
+                else:
+                    raise
+            if bound is not None:
+                args, kwargs = bound
+        result = func(*args, **kwargs)
+        if check_returns is not None:
+            check_returns(result)
+        return result
+    wrapper.__signature__ = signature  # type: ignore
+    wrapper.__enforced__ = sig  # type: ignore
+    return wrapper
+
+
+def _policy(budget, budgets, lazy):
+    # type: (Optional[int], Optional[Dict[str, int]], bool) -> Policy
+    if budget is not None and budget < 0:
+        raise ValueError('budget must not be negative')
+    keys = {}  # type: Dict[str, int]
+    for text, n in (budgets or {}).items():
+        node = typeexpr.try_parse(text)
+        keys[node.text if node is not None else typecomments.normalize(text)] = n
+    return Policy(budget, keys, lazy, random.Random())
+
+
+def enforce(func=None, every=1, action=RAISE, budget=None, budgets=None,
+            lazy=False):
+    # type: (Optional[Callable], int, str, Optional[int], Optional[Dict[str, int]], bool) -> Any
+    """
+    Check one call in `every` to `func` against its type comments or
+    docstring types.  Can be used as ``@enforce`` or ``@enforce(every=100)``.
+    Functions without types are returned as they are.
+
+    At most `budget` elements of each container are checked, or as many as
+    `budgets` gives for its annotation, and with `lazy`, the arguments typed
+    with a read-only interface are checked as they are read (see `Policy`).
+    """
+    if every < 1:
+        raise ValueError('every must be at least 1')
+    policy = _policy(budget, budgets, lazy)
+    if func is None:
+        return lambda f: _enforce(f, every, action, policy)
+    return _enforce(func, every, action, policy)
+
+
+def _enforce(func, every, action, policy):
+    # type: (Callable, int, str, Policy) -> Any
+    target = getattr(func, '__func__', func)
+    sig = signature_of(target)
+    if sig is None:
+        return func
+    wrapped = _wrap(target, sig, every, action, policy)
+    if isinstance(func, (staticmethod, classmethod)):
+        return type(func)(wrapped)
+    return wrapped
+
+
+# Import hook
+# ===========
+
+def enforce_module(module, every=1, action=RAISE, policy=FULL, index=None):
+    # type: (Any, int, str, Policy, Optional[annindex.AnnotationIndex]) -> int
+    """
+    Wrap the typed functions and methods defined at the top level of
+    `module` and of its classes, and return how many were wrapped.  With an
+    `index`, the signatures are read from it rather than from the source.
+    """
+    path = getattr(module, '__file__', None)
+    if not path or not path.endswith('.py'):
+        return 0
+    if index is not None:
+        table = _make_table(index.get(path))
+    else:
+        table = _read_definitions(path)
+    count = 0
+    for qualname in table:
+        owner = module
+        parts = qualname.split('.')
+        for part in parts[:-1]:
+            owner = owner.__dict__.get(part) if hasattr(owner, '__dict__') else None
+            if not isinstance(owner, type):
+                break
+        else:
+            value = owner.__dict__.get(parts[-1])
+            func = getattr(value, '__func__', value)
+            if not inspect.isfunction(func) or hasattr(func, '__enforced__') or \
+                    func.__module__ != module.__name__:
+                continue
+            sig = _find_signature(table, func)
+            if sig is None:
+                continue
+            wrapped = _wrap(func, sig, every, action, policy)
+            if isinstance(value, (staticmethod, classmethod)):
+                wrapped = type(value)(wrapped)
+            setattr(owner, parts[-1], wrapped)
+            count += 1
+    return count
+
+
+class _Loader(importlib.machinery.SourceFileLoader):
+
+    every = 1
+    action = RAISE
+    policy = FULL
+    index = None  # type: Optional[annindex.AnnotationIndex]
+
+    def exec_module(self, module):
+        # type: (Any) -> None
+        super().exec_module(module)
+        enforce_module(module, self.every, self.action, self.policy, self.index)
+
+
+class _Finder(importlib.abc.MetaPathFinder):
+    """Hands the matching source modules to `_Loader`."""
+
+    def __init__(self, modules, paths, every, action, policy, index):
+        # type: (Sequence[str], Sequence[str], int, str, Policy, Optional[annindex.AnnotationIndex]) -> None
+        self.modules = tuple(modules)
+        self.paths = tuple(os.path.join(os.path.abspath(p), '') for p in paths)
+        self.every = every
+        self.action = action
+        self.policy = policy
+        self.index = index
+        # set while this finder asks the others, which may include another
+        # _Finder that asks this one in turn
+        self._searching = threading.local()
+
+    def _matches(self, fullname, origin):
+        # type: (str, str) -> bool
+        if any(fullname == m or fullname.startswith(m + '.') for m in self.modules):
+            return True
+        return origin.startswith(self.paths) if self.paths else False
+
+    def find_spec(self, fullname, path, target=None):
+        # type: (str, Optional[Sequence[str]], Any) -> Any
+        if getattr(self._searching, 'active', False):
+            return None
+        self._searching.active = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, 'find_spec'):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._searching.active = False
+        if type(spec.loader) is not importlib.machinery.SourceFileLoader or \
+                not self._matches(fullname, os.path.abspath(spec.origin)):
+            return spec
+        loader = _Loader(spec.loader.name, spec.loader.path)
+        loader.every = self.every
+        loader.action = self.action
+        loader.policy = self.policy
+        loader.index = self.index
+        spec.loader = loader
+        return spec
+
+
+def install(modules=(), paths=(), every=1, action=RAISE, budget=None,
+            budgets=None, lazy=False, index=None):
+    # type: (Sequence[str], Sequence[str], int, str, Optional[int], Optional[Dict[str, int]], bool, Optional[annindex.AnnotationIndex]) -> importlib.abc.MetaPathFinder
+    """
+    Enforce the types of the modules imported from now on that are named in
+    `modules` (or are submodules of them) or whose source is under one of
+    `paths`, as `enforce` does.  With an `index`, the signatures of each
+    module are loaded from it, and only modules without a current entry are
+    tokenized (see `annindex`).  Returns the hook, for `uninstall`.
+    """
+    if every < 1:
+        raise ValueError('every must be at least 1')
+    finder = _Finder(modules, paths, every, action, _policy(budget, budgets, lazy),
+                     index)
+    sys.meta_path.insert(0, finder)
+    return finder
+
+
+def uninstall(finder):
+    # type: (importlib.abc.MetaPathFinder) -> None
+    """Stop enforcing types in the modules imported from now on."""
+    if finder in sys.meta_path:
+        sys.meta_path.remove(finder)
+
+
+def main(argv=None):
+    # type: (Optional[Sequence[str]]) -> int
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-e', '--every', type=int, default=1,
+                        help='check one call in EVERY (default: %(default)s)')
+    parser.add_argument('--warn', action='store_true',
+                        help='warn instead of raising TypeCheckError')
+    parser.add_argument('-b', '--budget', type=int,
+                        help='check at most BUDGET elements of each container')
+    parser.add_argument('--budget-for', action='append', default=[],
+                        metavar='TYPE=BUDGET',
+                        help='the budget of one annotation, like "List[int]=100"')
+    parser.add_argument('--lazy', action='store_true',
+                        help='check Sequence, Mapping, Iterable and Iterator '
+                             'arguments as they are read')
+    parser.add_argument('--index', default=annindex.DEFAULT_DIR,
+                        help='where the annotation index is kept '
+                             '(default: %(default)s)')
+    parser.add_argument('--no-index', action='store_true',
+                        help='read the signatures from the sources')
+    parser.add_argument('-m', '--module', dest='modules', action='append',
+                        default=[], metavar='MODULE',
+                        help='enforce this module and its submodules (default: '
+                             'the modules next to the script)')
+    parser.add_argument('script')
+    parser.add_argument('args', nargs=argparse.REMAINDER)
+    args = parser.parse_args(argv)
+    if args.every < 1:
+        parser.error('--every must be at least 1')
+    if args.budget is not None and args.budget < 0:
+        parser.error('--budget must not be negative')
+    budgets = {}  # type: Dict[str, int]
+    for item in args.budget_for:
+        text, _, number = item.rpartition('=')
+        if not text or not number.isdigit():
+            parser.error('expected TYPE=BUDGET: %s' % item)
+        budgets[text] = int(number)
+
+    script_dir = os.path.dirname(os.path.abspath(args.script))
+    install(args.modules, [] if args.modules else [script_dir], args.every,
+            WARN if args.warn else RAISE, args.budget, budgets, args.lazy,
+            None if args.no_index else annindex.AnnotationIndex(args.index))
+    sys.argv = [args.script] + args.args
+    sys.path[0] = script_dir
+    runpy.run_path(args.script, run_name='__main__')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
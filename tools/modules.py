@@ -0,0 +1,278 @@
+"""
+Find the imports of a module and resolve them to files the way a checker
+would: a ``.pyi`` stub next to a module shadows the ``.py`` file.
+
+Sources are scanned with ``tokenize`` rather than ``ast`` so that python 2
+modules (``print x``, ``exec code in ns``) can be read from python 3.
+"""
+import keyword
+import os
+import tokenize
+
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+
+EXTENSIONS = ('.pyi', '.py')
+
+_SKIP = frozenset([tokenize.COMMENT, tokenize.NL, tokenize.INDENT,
+                   tokenize.DEDENT, tokenize.ENCODING])
+# the statements that end their header with a colon, other than def and class
+_COMPOUND = frozenset(['if', 'elif', 'else', 'try', 'except', 'finally',
+                       'while', 'for', 'with'])
+
+
+def _statements(path):
+    # type: (str) -> Iterable[List[str]]
+    """
+    Yield the token strings of each import statement in the module at `path`.
+    """
+    with open(path, 'rb') as f:
+        tokens = tokenize.tokenize(f.readline)
+        statement = []  # type: List[str]
+        is_import = None  # type: Optional[bool]
+        try:
+            for tok in tokens:
+                if tok.type in _SKIP:
+                    continue
+                if tok.type in (tokenize.NEWLINE, tokenize.ENDMARKER) or \
+                        tok.string == ';':
+                    if is_import:
+                        yield statement
+                    statement, is_import = [], None
+                    continue
+                if is_import is None:
+                    is_import = tok.string in ('import', 'from')
+                if is_import:
+                    statement.append(tok.string)
+        except (tokenize.TokenError, IndentationError, SyntaxError):
+            pass
+
+
+def _dotted(tokens, pos):
+    # type: (List[str], int) -> Tuple[str, int]
+    """Read a dotted name starting at `pos`, return it and the next position."""
+    name = []
+    while pos < len(tokens) and (tokens[pos] == '.' or tokens[pos].isidentifier()):
+        if tokens[pos] in ('import', 'as'):
+            break
+        name.append(tokens[pos])
+        pos += 1
+    return ''.join(name), pos
+
+
+def imports(path):
+    # type: (str) -> List[Tuple[str, int]]
+    """
+    Return the modules imported by the module at `path` as (name, level)
+    pairs, where level is the number of leading dots of a relative import.
+
+    For ``from pkg import name`` both ``pkg`` and ``pkg.name`` are listed,
+    since `name` may be a submodule.
+    """
+    result = []  # type: List[Tuple[str, int]]
+    for tokens in _statements(path):
+        if tokens[0] == 'import':
+            pos = 1
+            while pos < len(tokens):
+                name, pos = _dotted(tokens, pos)
+                if name:
+                    result.append((name, 0))
+                while pos < len(tokens) and tokens[pos] != ',':
+                    pos += 1
+                pos += 1
+        else:
+            base, pos = _dotted(tokens, 1)
+            level = len(base) - len(base.lstrip('.'))
+            base = base.lstrip('.')
+            if base:
+                result.append((base, level))
+            for tok in tokens[pos + 1:]:
+                if tok.isidentifier() and tok != 'as':
+                    result.append((base + '.' + tok if base else tok, level))
+    return result
+
+
+def bound_names(path):
+    # type: (str) -> Set[str]
+    """
+    Return the names that the module at `path` binds at module level by
+    import or assignment, including inside ``if`` and ``try`` blocks, but not
+    those of ``def`` and ``class`` statements.
+    """
+    result = set()  # type: Set[str]
+    # one entry per open block: whether it is the body of a def or class
+    blocks = []  # type: List[bool]
+    scope = False
+    statement = []  # type: List[str]
+    with open(path, 'rb') as f:
+        try:
+            for tok in tokenize.tokenize(f.readline):
+                if tok.type == tokenize.INDENT:
+                    blocks.append(scope)
+                elif tok.type == tokenize.DEDENT:
+                    blocks.pop()
+                elif tok.type in _SKIP:
+                    continue
+                elif tok.type in (tokenize.NEWLINE, tokenize.ENDMARKER) or \
+                        tok.string == ';':
+                    if statement and not any(blocks):
+                        result.update(_statement_names(statement))
+                    if statement and tok.string != ';':
+                        scope = statement[0] in ('def', 'class', 'async') or \
+                            statement[0] == '@' and scope
+                    statement = []
+                else:
+                    if not statement and tok.string == '@':
+                        scope = True
+                    statement.append(tok.string)
+        except (tokenize.TokenError, IndentationError, SyntaxError):
+            pass
+    return result
+
+
+def _statement_names(tokens):
+    # type: (List[str]) -> List[str]
+    """Return the names bound by an import or an assignment statement."""
+    if tokens[0] == 'import':
+        # import a.b binds a, import a.b as c binds c
+        result = []
+        for part in ' '.join(tokens[1:]).split(','):
+            words = part.split()
+            if words:
+                result.append(words[-1] if 'as' in words else words[0])
+        return result
+    if tokens[0] == 'from':
+        if 'import' not in tokens:
+            return []
+        names = tokens[tokens.index('import') + 1:]
+        result = []
+        for i, tok in enumerate(names):
+            if tok.isidentifier() and tok != 'as' and \
+                    (i + 1 == len(names) or names[i + 1] != 'as'):
+                result.append(tok)
+        return result
+    if tokens[0] in _COMPOUND:
+        # if x: y = 1 binds y; the header binds nothing that matters here
+        depth = 0
+        for i, tok in enumerate(tokens):
+            if tok in ('(', '[', '{'):
+                depth += 1
+            elif tok in (')', ']', '}'):
+                depth -= 1
+            elif tok == ':' and depth == 0:
+                return _statement_names(tokens[i + 1:]) if tokens[i + 1:] else []
+        return []
+    # the targets of an assignment: every name before an = at depth 0, unless
+    # it is subscripted or an attribute (x[0] = ..., x.y = ...)
+    result = []
+    depth = 0
+    target = []  # type: List[str]
+    for tok in tokens:
+        if tok in ('(', '[', '{'):
+            depth += 1
+        elif tok in (')', ']', '}'):
+            depth -= 1
+        if depth == 0 and tok == '=' or depth == 0 and tok == ':' and \
+                len(target) == 1:
+            result.extend(_target_names(target))
+            target = []
+            if tok == ':':
+                break
+        else:
+            target.append(tok)
+    return result
+
+
+def _target_names(target):
+    # type: (List[str]) -> List[str]
+    """Return the plain names of an assignment target, like ``a, (b, c)``."""
+    result = []
+    # one entry per open bracket: whether it is a subscript or a call
+    brackets = []  # type: List[bool]
+    for i, tok in enumerate(target):
+        previous = target[i - 1] if i else ''
+        if tok in ('(', '['):
+            brackets.append(previous.isidentifier() and
+                            not keyword.iskeyword(previous) or
+                            previous in (')', ']'))
+        elif tok in (')', ']'):
+            if brackets:
+                brackets.pop()
+        elif tok.isidentifier() and not keyword.iskeyword(tok) and \
+                not any(brackets) and previous != '.' and \
+                target[i + 1:i + 2] not in (['.'], ['['], ['(']):
+            result.append(tok)
+    return result
+
+
+def resolve(name, search_path, level=0, importer=None):
+    # type: (str, Sequence[str], int, Optional[str]) -> Optional[str]
+    """
+    Return the file that the module `name` resolves to, preferring stubs, or
+    None if it is not found on `search_path` (stdlib and installed packages
+    are not tracked).
+    """
+    if level and importer:
+        base = os.path.dirname(importer)
+        for _ in range(level - 1):
+            base = os.path.dirname(base)
+        search_path = [base]
+    parts = name.split('.')
+    for directory in search_path:
+        base = os.path.join(directory, *parts)
+        for candidate in [base + ext for ext in EXTENSIONS] + \
+                [os.path.join(base, '__init__' + ext) for ext in EXTENSIONS]:
+            if os.path.isfile(candidate):
+                return os.path.abspath(candidate)
+    return None
+
+
+def stub_for(path):
+    # type: (str) -> Optional[str]
+    """Return the stub that shadows the module at `path`, if there is one."""
+    root, ext = os.path.splitext(path)
+    if ext == '.py' and os.path.isfile(root + '.pyi'):
+        return os.path.abspath(root + '.pyi')
+    return None
+
+
+def direct_dependencies(path, search_path=None):
+    # type: (str, Optional[Sequence[str]]) -> List[str]
+    """
+    Return the files that the module at `path` resolves through directly: its
+    own stub and the resolved files of its imports.
+
+    `search_path` defaults to the module's directory, which is what a checker
+    run from that directory sees.
+    """
+    path = os.path.abspath(path)
+    if search_path is None:
+        search_path = [os.path.dirname(path)]
+    result = set()  # type: Set[str]
+    stub = stub_for(path)
+    if stub:
+        result.add(stub)
+    for name, level in imports(path):
+        found = resolve(name, search_path, level, path)
+        if found and found != path:
+            result.add(found)
+    return sorted(result)
+
+
+def dependencies(path, search_path=None):
+    # type: (str, Optional[Sequence[str]]) -> List[str]
+    """
+    Return every file that the result of checking `path` depends on, found by
+    following `direct_dependencies` transitively.
+    """
+    path = os.path.abspath(path)
+    if search_path is None:
+        search_path = [os.path.dirname(path)]
+    seen = set()  # type: Set[str]
+    todo = [path]
+    while todo:
+        current = todo.pop()
+        for dep in direct_dependencies(current, search_path):
+            if dep not in seen and dep != path:
+                seen.add(dep)
+                todo.append(dep)
+    return sorted(seen)
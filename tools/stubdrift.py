@@ -0,0 +1,275 @@
+"""
+Report where ``.pyi`` stubs have drifted from the modules they shadow.
+
+Because a stub completely replaces its module, a function that exists only
+in the ``.py`` (like ``tuple_test`` in ``tests/test_comment_annotations.py``)
+silently disappears for the checker, and a stub can promise parameters the
+implementation no longer has.  For every ``name.py`` with a ``name.pyi`` next
+to it, this reports:
+
+missing
+    a public function or class of the module that the stub does not define
+extra
+    a definition in the stub that the module does not have, neither by a
+    ``def`` or ``class`` nor by importing or assigning the name (like
+    ``deque`` in ``tests/mycollections.py``)
+params
+    the parameter names, kinds or defaults differ
+types
+    both sides are typed, but with different types
+untyped
+    the stub is typed but the module has no type comments or docstring
+    types, so nothing checks the implementation against the stub (only
+    reported with ``--strict``)
+
+Each side is reduced to a table of qualified name -> signature hash, so the
+comparison is a pair of dict lookups per definition, and the findings for a
+pair of files are cached by content, so unchanged pairs cost two digests.
+
+Usage::
+
+    python tools/stubdrift.py [--strict] [--no-cache] PATH ...
+"""
+import argparse
+import collections
+import json
+import os
+import sys
+import tempfile
+import tokenize
+
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import cache
+import docstrings
+import modules
+import typecomments
+import typeexpr
+
+MISSING = 'missing'
+EXTRA = 'extra'
+PARAMS = 'params'
+TYPES = 'types'
+UNTYPED = 'untyped'
+
+DEFAULT_CACHE = os.path.join(cache.DEFAULT_DIR, 'stubdrift.json')
+# bump this if the findings for the same pair of files change, such as when
+# the comparison of types does
+_VERSION = 3
+
+Finding = collections.namedtuple('Finding', 'path line kind qualname detail')
+
+# One definition of a table.  `params` holds (name, kind, has_default) per
+# parameter and `types` the argument types followed by the return type; both
+# are None for classes.  `typed` is false when no types were found at all.
+Entry = collections.namedtuple('Entry', 'lineno params types typed')
+
+
+def _is_public(name):
+    # type: (str) -> bool
+    return not name.startswith('_') or (name.startswith('__') and
+                                       name.endswith('__'))
+
+
+def signature_table(path):
+    # type: (str) -> Dict[str, List[Entry]]
+    """
+    Return the public classes and functions of the module or stub at `path`,
+    keyed by qualified name.  Overloaded functions have several entries.
+    """
+    table = collections.OrderedDict()  # type: Dict[str, List[Entry]]
+    # definitions whose contents are not part of the interface: private or
+    # conditional ones, and the bodies of functions
+    hidden = set()  # type: Set[str]
+    with tokenize.open(path) as f:
+        for item in typecomments.iter_definitions(f.readline, statements=False):
+            parent = item.qualname.rpartition('.')[0]
+            if item.conditional or parent in hidden or \
+                    not _is_public(item.name):
+                hidden.add(item.qualname)
+                continue
+            if type(item) is typecomments.ClassDef:
+                table.setdefault(item.qualname, []).append(
+                    Entry(item.lineno, None, None, True))
+                continue
+            hidden.add(item.qualname)
+            sig = typecomments.signature(item) or docstrings.signature(item)
+            params = tuple((p.name, p.kind, p.default is not None)
+                           for p in item.params)
+            if sig is None:
+                types = None
+            else:
+                types = tuple(a.type for a in sig.args) + (sig.returns,)
+            entries = table.setdefault(item.qualname, [])
+            overload = 'overload' in item.decorators or \
+                'typing.overload' in item.decorators
+            if entries and not overload and entries[-1].params is not None:
+                # a redefinition replaces the previous one
+                del entries[:]
+            entries.append(Entry(item.lineno, params, types, sig is not None))
+    return table
+
+
+def _hash_table(table):
+    # type: (Dict[str, List[Entry]]) -> Dict[str, int]
+    return dict((name, hash(tuple((e.params, e.types) for e in entries)))
+                for name, entries in table.items())
+
+
+def _types_differ(impl, stub):
+    # type: (Entry, Entry) -> bool
+    """
+    Whether two typed entries disagree, ignoring the arguments that one side
+    leaves untyped (like self).  Types are compared in their canonical form,
+    so ``Union[int, None]`` and ``Optional[int]`` agree.
+    """
+    for a, b in zip(impl.types, stub.types):
+        if a is not None and b is not None and not typeexpr.same(a, b):
+            return True
+    return False
+
+
+def compare(impl_path, stub_path, strict=False):
+    # type: (str, str, bool) -> List[Finding]
+    """Compare a module to its stub and return the findings."""
+    impl = signature_table(impl_path)
+    stub = signature_table(stub_path)
+    impl_hashes = _hash_table(impl)
+    stub_hashes = _hash_table(stub)
+    stub_name = os.path.basename(stub_path)
+    findings = []
+
+    for name, entries in impl.items():
+        line = entries[0].lineno
+        if name not in stub:
+            findings.append(Finding(impl_path, line, MISSING, name,
+                                    '%s is not in %s' % (name, stub_name)))
+            continue
+        if impl_hashes[name] == stub_hashes[name]:
+            continue
+        impl_entry, stub_entries = entries[-1], stub[name]
+        if impl_entry.params is None or stub_entries[0].params is None:
+            if (impl_entry.params is None) != (stub_entries[0].params is None):
+                findings.append(Finding(
+                    impl_path, line, PARAMS, name,
+                    '%s is a class on one side and a function on the other' % name))
+            continue
+        if len(stub_entries) > 1:
+            # overloads describe the accepted calls in their own terms
+            continue
+        stub_entry = stub_entries[0]
+        if impl_entry.params != stub_entry.params:
+            findings.append(Finding(
+                impl_path, line, PARAMS, name,
+                '(%s) in the module, (%s) in %s' % (
+                    _format_params(impl_entry.params),
+                    _format_params(stub_entry.params), stub_name)))
+        elif not impl_entry.typed:
+            if strict and stub_entry.typed:
+                findings.append(Finding(
+                    impl_path, line, UNTYPED, name,
+                    'only %s has types for %s' % (stub_name, name)))
+        elif stub_entry.typed and _types_differ(impl_entry, stub_entry):
+            findings.append(Finding(
+                impl_path, line, TYPES, name,
+                '%s in the module, %s in %s' % (
+                    _format_types(impl_entry), _format_types(stub_entry),
+                    stub_name)))
+
+    # names the module has without defining them, such as re-exports
+    bound = modules.bound_names(impl_path)
+    for name, entries in stub.items():
+        if name not in impl and name.split('.')[0] not in bound:
+            findings.append(Finding(stub_path, entries[0].lineno, EXTRA, name,
+                                    '%s is not in %s' % (
+                                        name, os.path.basename(impl_path))))
+    findings.sort(key=lambda f: (f.path, f.line))
+    return findings
+
+
+def _format_params(params):
+    # type: (Tuple[Tuple[str, str, bool], ...]) -> str
+    return ', '.join('%s%s%s' % (kind, name, '=...' if default else '')
+                     for name, kind, default in params)
+
+
+def _format_types(entry):
+    # type: (Entry) -> str
+    return '(%s) -> %s' % (', '.join(t or '?' for t in entry.types[:-1]),
+                           entry.types[-1] or '?')
+
+
+def find_pairs(roots):
+    # type: (Sequence[str]) -> List[Tuple[str, str]]
+    """Return the (module, stub) pairs in `roots`."""
+    result = []
+    for path in typecomments.find_sources(roots):
+        if path.endswith('.py') and os.path.isfile(path + 'i'):
+            result.append((path, path + 'i'))
+    return result
+
+
+class _FindingsCache(object):
+    """The findings of each pair, keyed by the digests of both files."""
+
+    def __init__(self, path):
+        # type: (Optional[str]) -> None
+        self.path = path
+        self.data = {}  # type: Dict[str, List]
+        if path:
+            try:
+                with open(path) as f:
+                    self.data = json.load(f)
+            except (IOError, OSError, ValueError):
+                pass
+
+    def findings(self, impl_path, stub_path, strict):
+        # type: (str, str, bool) -> List[Finding]
+        key = '%d\0%s\0%s\0%d' % (_VERSION, cache.file_digest(impl_path),
+                                  cache.file_digest(stub_path), strict)
+        entry = self.data.get(impl_path)
+        if entry and entry[0] == key:
+            return [Finding(*f) for f in entry[1]]
+        result = compare(impl_path, stub_path, strict)
+        self.data[impl_path] = [key, [list(f) for f in result]]
+        return result
+
+    def save(self):
+        # type: () -> None
+        if not self.path:
+            return
+        dirname = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(dirname, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.data, f)
+        os.replace(tmp, self.path)
+
+
+def main(argv=None):
+    # type: (Optional[Sequence[str]]) -> int
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('paths', nargs='+', help='files or directories to check')
+    parser.add_argument('--strict', action='store_true',
+                        help='also report untyped implementations')
+    parser.add_argument('--cache', default=DEFAULT_CACHE,
+                        help='where findings are cached (default: %(default)s)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='compare every pair again')
+    args = parser.parse_args(argv)
+
+    findings_cache = _FindingsCache(None if args.no_cache else args.cache)
+    count = 0
+    for impl_path, stub_path in find_pairs(args.paths):
+        for finding in findings_cache.findings(os.path.abspath(impl_path),
+                                               os.path.abspath(stub_path),
+                                               args.strict):
+            print('%s:%d: %s: %s' % (os.path.relpath(finding.path), finding.line,
+                                     finding.kind, finding.detail))
+            count += 1
+    findings_cache.save()
+    return 1 if count else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,299 @@
+"""
+Generate ``.pyi`` stubs from the type comments and docstrings of modules.
+
+A stub *completely* replaces its module for mypy and PyCharm (see
+``tests/test_stub_annotations.py``), so anything left out of a hand-written
+stub silently disappears.  This generates the whole public surface of a
+module instead:
+
+- imports, ``TypeVar`` declarations and type aliases such as
+  ``Number = Union[int, float]``
+- classes with their bases, including generics like ``Stack(Generic[T])``
+- functions and methods, typed from their comments (including the multi-line
+  and ``*args`` forms) or docstrings, and left unannotated otherwise
+- module and class attributes, with the type of their ``# type:`` comment,
+  including those assigned to ``self`` in methods
+
+Usage::
+
+    python tools/stubgen.py MODULE                 # print the stub
+    python tools/stubgen.py -o OUTDIR PATH ...     # write OUTDIR/.../name.pyi
+    python tools/stubgen.py --inplace PATH ...     # write name.pyi next to name.py
+"""
+import argparse
+import os
+import sys
+import tokenize
+
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+import docstrings
+import typecomments
+
+# decorators that change the meaning of a signature, and so are kept
+_KEPT_DECORATORS = frozenset([
+    'staticmethod', 'classmethod', 'property', 'abstractmethod',
+    'abc.abstractmethod', 'abstractproperty', 'abc.abstractproperty',
+    'overload', 'typing.overload',
+])
+# calls that declare types, and are copied as they are
+_DECLARATIONS = frozenset(['TypeVar', 'NewType', 'namedtuple', 'NamedTuple',
+                           'typing.TypeVar', 'typing.NewType',
+                           'collections.namedtuple', 'typing.NamedTuple'])
+_KEYWORDS = frozenset(['if', 'for', 'while', 'with', 'try', 'return', 'del',
+                       'print', 'exec', 'raise', 'assert', 'global', 'pass',
+                       'yield', 'not', 'lambda', 'await'])
+
+
+def _is_public(name):
+    # type: (str) -> bool
+    return not name.startswith('_') or (name.startswith('__') and
+                                       name.endswith('__'))
+
+
+def _literal_type(tokens):
+    # type: (List[str]) -> str
+    """Return the type of a simple literal expression, or 'Any'."""
+    if len(tokens) == 1:
+        value = tokens[0]
+        if value in ('True', 'False'):
+            return 'bool'
+        if value[:1].isdigit() or value[:1] == '.':
+            if value[-1] in 'jJ':
+                return 'complex'
+            if any(c in value for c in '.eE') and not value.startswith('0x'):
+                return 'float'
+            return 'int'
+        prefix = value[:len(value) - len(value.lstrip('uUbBrR'))].lower()
+        if value[len(prefix):][:1] in ('"', "'"):
+            return 'unicode' if 'u' in prefix else 'str'
+    elif len(tokens) == 2 and tokens[0] == '-' and tokens[1][:1].isdigit():
+        return _literal_type(tokens[1:])
+    return 'Any'
+
+
+def _is_type_expression(tokens):
+    # type: (List[str]) -> bool
+    """Whether the tokens look like a type alias rather than a value."""
+    if not tokens or not (tokens[0][:1].isupper() or '[' in tokens):
+        return False
+    for tok in tokens:
+        if tok in ('[', ']', ',', '.', '...') or tok.isidentifier():
+            continue
+        if tok[:1] in ('"', "'"):
+            continue
+        return False
+    return tokens[0].isidentifier()
+
+
+class _Scope(object):
+    """The entries of the module or of a class, in source order."""
+
+    def __init__(self, header=None):
+        # type: (Optional[str]) -> None
+        self.header = header
+        self.entries = []  # type: List[object]
+        self.names = set()  # type: Set[str]
+
+    def add(self, name, entry):
+        # type: (Optional[str], object) -> None
+        if name is not None:
+            if name in self.names:
+                return
+            self.names.add(name)
+        self.entries.append(entry)
+
+
+def _format_function(func, sig, indent):
+    # type: (typecomments.FunctionDef, Optional[typecomments.Signature], str) -> List[str]
+    lines = []
+    for decorator in func.decorators:
+        if decorator in _KEPT_DECORATORS or decorator.endswith(('.setter', '.deleter')):
+            lines.append('%s@%s' % (indent, decorator))
+    args = sig.args if sig else [typecomments.Arg(p.name, p.kind, None,
+                                                   p.default is not None)
+                                 for p in func.params]
+    params = []
+    for i, arg in enumerate(args):
+        name = arg.name if arg.name.isidentifier() else '_%d' % i
+        if not arg.name and arg.kind == '*':
+            params.append('*')
+            continue
+        text = arg.kind + name
+        if arg.type:
+            text += ': ' + arg.type
+        if arg.has_default:
+            text += ' = ...' if arg.type else '=...'
+        params.append(text)
+    returns = ' -> %s' % sig.returns if sig and sig.returns else ''
+    lines.append('%sdef %s(%s)%s: ...' % (indent, func.name, ', '.join(params),
+                                          returns))
+    return lines
+
+
+def _assignment(stmt):
+    # type: (typecomments.Statement) -> Optional[Tuple[str, str]]
+    """
+    Return the target and stub line for a simple assignment statement, or
+    None if `stmt` is something else.
+    """
+    tokens = stmt.tokens
+    if stmt.kind == 'def':
+        # self.name = value
+        if tokens[:2] != ['self', '.'] or len(tokens) < 4 or tokens[3] != '=':
+            return None
+        name, value = tokens[2], tokens[4:]
+    else:
+        if len(tokens) < 3 or not tokens[0].isidentifier() or \
+                tokens[0] in _KEYWORDS:
+            return None
+        name = tokens[0]
+        if tokens[1] == ':':
+            # python 3 variable annotation
+            end = tokens.index('=') if '=' in tokens else len(tokens)
+            return name, '%s: %s' % (name, typecomments.join(tokens[2:end]))
+        if tokens[1] != '=' or '=' in tokens[2:]:
+            return None
+        value = tokens[2:]
+
+    if stmt.comment:
+        return name, '%s = ...  # type: %s' % (name, stmt.comment)
+    if stmt.kind != 'def':
+        call = typecomments.join(value[:value.index('(')]) if '(' in value else None
+        if call in _DECLARATIONS or name == '__all__' and value[:1] in (['['], ['(']):
+            return name, stmt.text.strip()
+        if stmt.kind == 'module' and _is_type_expression(value):
+            return name, '%s = %s' % (name, typecomments.join(value))
+    return name, '%s = ...  # type: %s' % (name, _literal_type(value))
+
+
+def generate_source(readline):
+    # type: (Callable[[], str]) -> str
+    """Return the stub for the module read through `readline`."""
+    module = _Scope()
+    scopes = {'': module}  # type: Dict[str, _Scope]
+    classes = {}  # type: Dict[str, _Scope]
+    imports = []  # type: List[str]
+
+    for item in typecomments.iter_definitions(readline):
+        if type(item) is typecomments.Statement:
+            if item.kind == 'module' and item.tokens[0] in ('import', 'from'):
+                if item.tokens[:2] != ['from', '__future__']:
+                    imports.append(item.text.strip())
+                continue
+            if item.kind == 'def':
+                # attributes assigned to self in a method of a stubbed class
+                owner = item.scope.rpartition('.')[0]
+                scope = classes.get(owner)
+            else:
+                scope = scopes.get(item.scope)
+            if scope is None:
+                continue
+            found = _assignment(item)
+            if found is not None and _is_public(found[0]):
+                scope.add(found[0], found[1])
+            continue
+
+        parent = item.qualname.rpartition('.')[0]
+        scope = scopes.get(parent)
+        if scope is None or item.conditional or not _is_public(item.name):
+            continue
+        if type(item) is typecomments.ClassDef:
+            bases = '(%s)' % ', '.join(item.bases) if item.bases else ''
+            class_scope = _Scope('class %s%s:' % (item.name, bases))
+            scopes[item.qualname] = classes[item.qualname] = class_scope
+            scope.add(item.name, class_scope)
+        else:
+            sig = typecomments.signature(item) or docstrings.signature(item)
+            overload = 'overload' in item.decorators or \
+                'typing.overload' in item.decorators
+            if item.name in scope.names and not overload:
+                continue
+            scope.add(None if overload else item.name, (item, sig))
+
+    body = []  # type: List[str]
+    _format_scope(module, '', body)
+    text = '\n'.join(body).strip('\n') + '\n'
+    if 'Any' in text and not any('Any' in typecomments.split_tokens(line)
+                                 for line in imports):
+        for i, line in enumerate(imports):
+            if line.startswith('from typing import ') and '(' not in line and \
+                    '\n' not in line:
+                imports[i] = line + ', Any'
+                break
+        else:
+            imports.insert(0, 'from typing import Any')
+    if imports:
+        text = '\n'.join(imports) + '\n\n' + text
+    return text
+
+
+def _format_scope(scope, indent, out):
+    # type: (_Scope, str, List[str]) -> None
+    for entry in scope.entries:
+        if isinstance(entry, _Scope):
+            # classes are separated from their neighbours by a blank line
+            if out and out[-1]:
+                out.append('')
+            out.append(indent + entry.header)
+            if entry.entries:
+                _format_scope(entry, indent + '    ', out)
+            else:
+                out.append(indent + '    ...')
+            out.append('')
+            continue
+        if isinstance(entry, tuple):
+            func, sig = entry
+            out.extend(_format_function(func, sig, indent))
+        else:
+            out.append(indent + entry)
+
+
+def generate(path):
+    # type: (str) -> str
+    """Return the stub for the module at `path`."""
+    with tokenize.open(path) as f:
+        return generate_source(f.readline)
+
+
+def main(argv=None):
+    # type: (Optional[Sequence[str]]) -> int
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('paths', nargs='+', help='modules or directories')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('-o', '--output', help='directory to write stubs to')
+    group.add_argument('--inplace', action='store_true',
+                       help='write each stub next to its module')
+    parser.add_argument('--force', action='store_true',
+                        help='overwrite existing stubs when using --inplace')
+    args = parser.parse_args(argv)
+
+    written = skipped = 0
+    for root in args.paths:
+        base = root if os.path.isdir(root) else os.path.dirname(root)
+        for path in typecomments.find_sources([root]):
+            if not path.endswith('.py'):
+                continue
+            if not args.output and not args.inplace:
+                sys.stdout.write(generate(path))
+                continue
+            if args.inplace:
+                target = path + 'i'
+                if os.path.exists(target) and not args.force:
+                    print('skipping %s: stub exists' % target, file=sys.stderr)
+                    skipped += 1
+                    continue
+            else:
+                target = os.path.join(args.output,
+                                      os.path.relpath(path, base or '.') + 'i')
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'w') as f:
+                f.write(generate(path))
+            written += 1
+    if args.output or args.inplace:
+        print('wrote %d stubs, skipped %d' % (written, skipped), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
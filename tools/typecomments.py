@@ -0,0 +1,680 @@
+"""
+Extract function signatures from ``# type:`` comments without importing
+anything.
+
+Both of the forms supported by mypy for python 2.7 are understood::
+
+    def tuple_test(arg1, arg2):
+        # type: (Tuple[str, int], Tuple[int, ...]) -> None
+
+    def multiline_test(arg1,  # type: str
+                       arg2,  # type: List[int]
+                       *args  # type: Iterable[int]
+                       ):
+        # type: (...) -> str
+
+as are python 3 annotations, so the same records can be produced for stubs.
+
+Each file is read once through ``tokenize`` and every function becomes a
+compact `Signature` record.  `build_index` does this for a whole tree, in
+parallel, and the result can be saved to and loaded from a json index.
+
+Usage::
+
+    python tools/typecomments.py [-j JOBS] [--index FILE] PATH ...
+"""
+import argparse
+import collections
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+import tokenize
+
+from typing import (
+    Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union,
+)
+
+# Raw function header, as found in the source.  `params` are `Param` records,
+# `comment` is the text of the signature type comment (without the leading
+# "# type:"), `docstring` the literal of the docstring token, and `start` and
+# `end` the (row, col) positions of the 'def' keyword and of the header's
+# closing colon.  `conditional` is true for definitions inside an if, try or
+# loop block rather than directly in the body of a module, class or function.
+FunctionDef = collections.namedtuple(
+    'FunctionDef',
+    'name qualname lineno params returns comment docstring decorators '
+    'in_class start end conditional')
+
+# `kind` is '', '*' or '**'.  `annotation` is a python 3 annotation and
+# `comment` a per-argument type comment.  `start` and `end` are the (row, col)
+# positions of the parameter's first token and the end of its last one.
+Param = collections.namedtuple(
+    'Param', 'name kind annotation default comment start end')
+
+# A class header.  `bases` holds the source of each base class expression.
+ClassDef = collections.namedtuple(
+    'ClassDef', 'name qualname lineno bases decorators conditional')
+
+# A simple statement directly in the body of the module, a class or a function
+# (statements inside if, try or loop blocks are not reported).  `scope` is the
+# qualified name of the enclosing class or function, or '' for the module, and
+# `kind` is 'module', 'class' or 'def' accordingly.  `tokens` are the token
+# strings, `comment` the type in a trailing type comment and `text` the source
+# lines of the statement.
+Statement = collections.namedtuple('Statement', 'scope kind lineno tokens comment text')
+
+# The compact records that make up an index.  `source` tells where the types
+# came from: 'comment', 'annotation' or 'docstring'.
+Signature = collections.namedtuple('Signature', 'qualname lineno args returns source')
+Arg = collections.namedtuple('Arg', 'name kind type has_default')
+
+_SKIP = frozenset([tokenize.NL, tokenize.COMMENT, tokenize.ENCODING])
+_type_comment_re = re.compile(r'^#\s*type:\s*(?P<type>.*?)\s*$')
+_ignore_re = re.compile(r'\s*#.*$')
+
+
+class _Tokens(object):
+    """A token stream with one token of lookahead and pushback."""
+
+    def __init__(self, tokens):
+        # type: (Iterator[tokenize.TokenInfo]) -> None
+        self._tokens = tokens
+        self._pushed = []  # type: List[tokenize.TokenInfo]
+
+    def next(self):
+        # type: () -> tokenize.TokenInfo
+        if self._pushed:
+            return self._pushed.pop()
+        return next(self._tokens)
+
+    def push(self, tok):
+        # type: (tokenize.TokenInfo) -> None
+        self._pushed.append(tok)
+
+    def significant(self, comments=None):
+        # type: (Optional[List[str]]) -> tokenize.TokenInfo
+        """
+        Return the next token that is not a comment or blank line, collecting
+        the skipped comments in `comments`.
+        """
+        while True:
+            tok = self.next()
+            if tok.type not in _SKIP:
+                return tok
+            if tok.type == tokenize.COMMENT and comments is not None:
+                comments.append(tok.string)
+
+    def skip_statement(self):
+        # type: () -> None
+        """Skip to the end of the current logical line."""
+        while self.next().type not in (tokenize.NEWLINE, tokenize.ENDMARKER):
+            pass
+
+
+def type_comment(text):
+    # type: (str) -> Optional[str]
+    """
+    Return the type in a ``# type:`` comment, or None if `text` is some other
+    comment.
+    """
+    match = _type_comment_re.match(text)
+    if match is None:
+        return None
+    result = match.group('type')
+    # "# type: int  # some explanation"
+    return _ignore_re.sub('', result)
+
+
+def join(strings):
+    # type: (Iterable[str]) -> str
+    """
+    Join the token strings of a type expression into its canonical spelling,
+    e.g. ``Tuple[int, ...]``.
+    """
+    result = []  # type: List[str]
+    for s in strings:
+        if s in (',', '->', '|') and result:
+            result.append(s + ' ' if s == ',' else ' %s ' % s)
+        else:
+            result.append(s)
+    return ''.join(result).strip()
+
+
+# type string -> its normalized spelling; the same few types are written over
+# and over, and tokenizing them is the bulk of the work of `signature`
+_normalized = {}  # type: Dict[str, str]
+
+
+def normalize(type_string):
+    # type: (str) -> str
+    """Return `type_string` with canonical spacing."""
+    result = _normalized.get(type_string)
+    if result is None:
+        result = _normalized[type_string] = join(split_tokens(type_string))
+    return result
+
+
+def split_tokens(text):
+    # type: (str) -> List[str]
+    """Return the token strings of the expression `text`."""
+    result = []
+    readline = iter([text]).__next__
+    try:
+        for tok in tokenize.generate_tokens(readline):
+            if tok.type in (tokenize.NEWLINE, tokenize.NL, tokenize.ENDMARKER,
+                            tokenize.INDENT, tokenize.DEDENT, tokenize.COMMENT):
+                continue
+            result.append(tok.string)
+    except (tokenize.TokenError, IndentationError):
+        pass
+    return result
+
+
+def split_args(text):
+    # type: (str) -> List[str]
+    """Split the comma separated types in `text` at the outermost level."""
+    result = []
+    current = []  # type: List[str]
+    depth = 0
+    for s in split_tokens(text):
+        if s in ('(', '[', '{'):
+            depth += 1
+        elif s in (')', ']', '}'):
+            depth -= 1
+        if s == ',' and depth == 0:
+            result.append(join(current))
+            current = []
+        else:
+            current.append(s)
+    if current:
+        result.append(join(current))
+    return result
+
+
+def parse_signature_comment(text):
+    # type: (str) -> Optional[Tuple[List[str], Optional[str]]]
+    """
+    Parse a function type comment like ``(str, *int) -> None`` into its
+    argument types and return type.  Returns None if `text` is not a
+    function signature.
+    """
+    tokens = split_tokens(text)
+    if not tokens or tokens[0] != '(':
+        return None
+    depth = 0
+    for i, s in enumerate(tokens):
+        if s in ('(', '[', '{'):
+            depth += 1
+        elif s in (')', ']', '}'):
+            depth -= 1
+            if depth == 0:
+                break
+    else:
+        return None
+    args = split_args(join(tokens[1:i]))
+    rest = tokens[i + 1:]
+    returns = join(rest[1:]) if rest[:1] == ['->'] else None
+    return args, returns
+
+
+def _parse_params(tokens, comments):
+    # type: (List[tokenize.TokenInfo], List[Tuple[Tuple[int, int], str]]) -> List[Param]
+    """
+    Build the parameters from the tokens between a def's parentheses.
+    `comments` are the (position, text) of type comments found in between.
+    """
+    groups = []  # type: List[List[tokenize.TokenInfo]]
+    current = []  # type: List[tokenize.TokenInfo]
+    depth = 0
+    for tok in tokens:
+        if tok.string in ('(', '[', '{'):
+            depth += 1
+        elif tok.string in (')', ']', '}'):
+            depth -= 1
+        if tok.string == ',' and depth == 0:
+            groups.append(current)
+            current = []
+        else:
+            current.append(tok)
+    if current:
+        groups.append(current)
+
+    params = []
+    for group in groups:
+        strings = [tok.string for tok in group]
+        kind = ''
+        if strings[0] in ('*', '**'):
+            kind = strings.pop(0)
+        if not strings:
+            # a bare "*" separating keyword-only arguments
+            name, rest = '', []  # type: str, List[str]
+        elif strings[0] == '(':
+            # python 2 tuple parameter: def f((a, b)):
+            depth = 0
+            for i, s in enumerate(strings):
+                depth += s == '('
+                depth -= s == ')'
+                if depth == 0:
+                    break
+            name, rest = join(strings[:i + 1]), strings[i + 1:]
+        else:
+            name, rest = strings[0], strings[1:]
+        annotation = default = None
+        if rest[:1] == [':']:
+            end = rest.index('=') if '=' in rest else len(rest)
+            annotation, rest = join(rest[1:end]), rest[end:]
+        if rest[:1] == ['=']:
+            default = join(rest[1:])
+        params.append(Param(name, kind, annotation, default, None,
+                            group[0].start, group[-1].end))
+
+    # a type comment belongs to the last parameter that starts before it
+    for pos, text in comments:
+        for i in reversed(range(len(params))):
+            if params[i].start < pos:
+                params[i] = params[i]._replace(comment=text)
+                break
+    return [p for p in params if p.name or p.kind]
+
+
+def _parse_def(stream, name_tok, start, qualname, decorators, in_class,
+               conditional):
+    # type: (_Tokens, tokenize.TokenInfo, Tuple[int, int], str, List[str], bool, bool) -> Tuple[FunctionDef, bool]
+    """
+    Parse a function header, after the 'def' keyword, through to the start of
+    its body.  Returns the definition and whether it has an indented body.
+    """
+    tok = stream.significant()
+    assert tok.string == '('
+    depth = 1
+    param_tokens = []
+    comments = []  # type: List[Tuple[Tuple[int, int], str]]
+    while True:
+        tok = stream.next()
+        if tok.type == tokenize.COMMENT:
+            text = type_comment(tok.string)
+            if text is not None:
+                comments.append((tok.start, text))
+            continue
+        if tok.type in (tokenize.NL, tokenize.NEWLINE):
+            continue
+        if tok.string in ('(', '[', '{'):
+            depth += 1
+        elif tok.string in (')', ']', '}'):
+            depth -= 1
+            if depth == 0:
+                break
+        param_tokens.append(tok)
+    params = _parse_params(param_tokens, comments)
+
+    # return annotation, then the colon
+    returns_tokens = []
+    tok = stream.significant()
+    if tok.string == '->':
+        tok = stream.significant()
+        while not (tok.string == ':' and tok.type == tokenize.OP):
+            returns_tokens.append(tok.string)
+            tok = stream.significant()
+    end = tok.end
+    returns = join(returns_tokens) if returns_tokens else None
+
+    # the signature comment may be on the def line or on the lines after it
+    comment = None
+    docstring = None
+    block = False
+    pending = []  # type: List[str]
+    tok = stream.next()
+    while tok.type == tokenize.COMMENT:
+        pending.append(tok.string)
+        tok = stream.next()
+    if tok.type == tokenize.NEWLINE:
+        block = True
+        tok = stream.significant(pending)
+        for text in pending:
+            comment = type_comment(text)
+            if comment is not None:
+                break
+        if tok.type == tokenize.INDENT:
+            first = stream.significant()
+            if first.type == tokenize.STRING:
+                after = stream.next()
+                if after.type in (tokenize.NEWLINE, tokenize.COMMENT):
+                    docstring = first.string
+                stream.push(after)
+            stream.push(first)
+        stream.push(tok)
+    else:
+        # one-liner: def f(x): return x
+        for text in pending:
+            comment = type_comment(text)
+            if comment is not None:
+                break
+        stream.push(tok)
+        stream.skip_statement()
+    func = FunctionDef(name_tok.string, qualname, name_tok.start[0], params,
+                       returns, comment, docstring, decorators, in_class,
+                       start, end, conditional)
+    return func, block
+
+
+def _read_bases(stream):
+    # type: (_Tokens) -> Tuple[List[List[str]], tokenize.TokenInfo]
+    """
+    Read the base classes of a class header, after the opening parenthesis.
+    Returns the token strings of each base and the token after the closing
+    parenthesis.
+    """
+    bases = [[]]  # type: List[List[str]]
+    depth = 1
+    while True:
+        tok = stream.significant()
+        if tok.string in ('(', '[', '{'):
+            depth += 1
+        elif tok.string in (')', ']', '}'):
+            depth -= 1
+            if depth == 0:
+                return bases, stream.significant()
+        if tok.string == ',' and depth == 1:
+            bases.append([])
+        elif tok.type != tokenize.NEWLINE:
+            bases[-1].append(tok.string)
+
+
+def _read_statement(stream, first):
+    # type: (_Tokens, tokenize.TokenInfo) -> Tuple[List[str], Optional[str], str]
+    """
+    Read the rest of the logical line that starts with `first` and return its
+    token strings, the type in its trailing type comment and its source.
+    """
+    strings = [first.string]
+    lines = {first.start[0]: first.line}
+    comment = None
+    tok = stream.next()
+    while tok.type not in (tokenize.NEWLINE, tokenize.ENDMARKER):
+        if tok.type == tokenize.COMMENT:
+            comment = type_comment(tok.string)
+        elif tok.type != tokenize.NL:
+            strings.append(tok.string)
+        lines.setdefault(tok.start[0], tok.line)
+        tok = stream.next()
+    text = ''.join(lines[row] for row in sorted(lines)
+                   if lines[row] not in ('', lines.get(row - 1)))
+    return strings, comment, text
+
+
+def iter_functions(readline):
+    # type: (Callable[[], str]) -> Iterator[FunctionDef]
+    """
+    Yield a `FunctionDef` for every function in the source read through
+    `readline`, in order, including methods and nested functions.
+
+    Sources that fail to tokenize (python 2 code using constructs that
+    python 3 refuses) yield the functions found up to the error.
+    """
+    for item in iter_definitions(readline, statements=False):
+        if type(item) is FunctionDef:
+            yield item
+
+
+def iter_definitions(readline, statements=True):
+    # type: (Callable[[], str], bool) -> Iterator[Union[FunctionDef, ClassDef, Statement]]
+    """
+    Yield a `FunctionDef`, `ClassDef` or (if `statements` is true)
+    `Statement` record for everything defined in the source read through
+    `readline`, in order.
+    """
+    stream = _Tokens(tokenize.generate_tokens(readline))
+    # (name, kind, depth of the header) of the enclosing classes and functions
+    scopes = []  # type: List[Tuple[str, str, int]]
+    depth = 0
+    decorators = []  # type: List[str]
+    try:
+        while True:
+            tok = stream.significant()
+            if tok.type == tokenize.ENDMARKER:
+                break
+            if tok.type == tokenize.INDENT:
+                depth += 1
+                continue
+            if tok.type == tokenize.DEDENT:
+                depth -= 1
+                while scopes and scopes[-1][2] >= depth:
+                    scopes.pop()
+                continue
+            if tok.type == tokenize.NEWLINE:
+                continue
+            if tok.string == '@':
+                name = []
+                tok = stream.significant()
+                while tok.type == tokenize.NAME or tok.string == '.':
+                    name.append(tok.string)
+                    tok = stream.next()
+                decorators.append(''.join(name))
+                stream.push(tok)
+                stream.skip_statement()
+                continue
+            start = tok.start
+            if tok.string == 'async':
+                tok = stream.significant()
+            body_depth = scopes[-1][2] + 1 if scopes else 0
+            if tok.string not in ('def', 'class'):
+                decorators = []
+                if statements and depth == body_depth:
+                    strings, comment, text = _read_statement(stream, tok)
+                    if strings[-1] != ':':
+                        scope = '.'.join(s[0] for s in scopes)
+                        kind = scopes[-1][1] if scopes else 'module'
+                        yield Statement(scope, kind, tok.start[0], strings,
+                                        comment, text)
+                else:
+                    stream.push(tok)
+                    stream.skip_statement()
+                continue
+            keyword = tok.string
+            name_tok = stream.significant()
+            qualname = '.'.join([s[0] for s in scopes] + [name_tok.string])
+            if keyword == 'def':
+                in_class = bool(scopes) and scopes[-1][1] == 'class'
+                func, block = _parse_def(stream, name_tok, start, qualname,
+                                         decorators, in_class,
+                                         depth != body_depth)
+                yield func
+            else:
+                bases = []  # type: List[List[str]]
+                tok = stream.significant()
+                if tok.string == '(':
+                    bases, tok = _read_bases(stream)
+                while not (tok.string == ':' and tok.type == tokenize.OP):
+                    tok = stream.significant()
+                yield ClassDef(name_tok.string, qualname, name_tok.start[0],
+                               [join(b) for b in bases if b], decorators,
+                               depth != body_depth)
+                tok = stream.next()
+                while tok.type == tokenize.COMMENT:
+                    tok = stream.next()
+                block = tok.type == tokenize.NEWLINE
+                if not block:
+                    stream.push(tok)
+                    stream.skip_statement()
+            decorators = []
+            if block:
+                scopes.append((name_tok.string, keyword, depth))
+    except (tokenize.TokenError, IndentationError, SyntaxError, StopIteration,
+            AssertionError):
+        return
+
+
+def _has_default(param):
+    # type: (Param) -> bool
+    return param.default is not None
+
+
+def signature(func):
+    # type: (FunctionDef) -> Optional[Signature]
+    """
+    Return the signature given by the type comments (or, failing that, the
+    python 3 annotations) of `func`, or None if it has neither.
+    """
+    params = func.params
+    parsed = parse_signature_comment(func.comment) if func.comment else None
+    if parsed is not None:
+        types, returns = parsed
+        if types == ['...']:
+            types = [p.comment for p in params]
+        else:
+            skip = len(params) - len(types)
+            if skip == 1 and func.in_class and 'staticmethod' not in func.decorators:
+                # self and cls are not annotated
+                types = [None] + types
+            types = [t.lstrip('*') if t else t for t in types]
+            types = types + [None] * (len(params) - len(types))
+        source = 'comment'
+    elif any(p.comment for p in params):
+        types, returns = [p.comment for p in params], None
+        source = 'comment'
+    elif func.returns or any(p.annotation for p in params):
+        types, returns = [p.annotation for p in params], func.returns
+        source = 'annotation'
+    else:
+        return None
+    args = tuple(Arg(p.name, p.kind, normalize(t) if t else None, _has_default(p))
+                 for p, t in zip(params, types))
+    return Signature(func.qualname, func.lineno, args,
+                     normalize(returns) if returns else None, source)
+
+
+def read_functions(path):
+    # type: (str) -> List[FunctionDef]
+    """Return the `FunctionDef` records of the module at `path`."""
+    try:
+        with tokenize.open(path) as f:
+            return list(iter_functions(f.readline))
+    except (SyntaxError, UnicodeDecodeError):
+        # unknown encoding cookie or undecodable bytes
+        return []
+
+
+def extract(path):
+    # type: (str) -> List[Signature]
+    """Return the signatures of the functions in the module at `path`."""
+    result = []
+    for func in read_functions(path):
+        sig = signature(func)
+        if sig is not None:
+            result.append(sig)
+    return result
+
+
+# Index
+# =====
+
+def _extract_file(job):
+    # type: (Tuple[Callable[[str], List[Signature]], str]) -> Tuple[str, List[Signature], int]
+    extractor, path = job
+    sigs = extractor(path)
+    with open(path, 'rb') as f:
+        lines = sum(1 for _ in f)
+    return path, sigs, lines
+
+
+def find_sources(roots):
+    # type: (Iterable[str]) -> List[str]
+    """Return the .py and .pyi files in `roots` (files or directories)."""
+    result = []
+    for root in roots:
+        if os.path.isfile(root):
+            result.append(root)
+            continue
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = sorted(d for d in dirnames
+                                 if not d.startswith('.') and d != '__pycache__')
+            for name in sorted(filenames):
+                if name.endswith(('.py', '.pyi')):
+                    result.append(os.path.join(dirpath, name))
+    return result
+
+
+def build_index(paths, jobs=None, extractor=extract):
+    # type: (Sequence[str], Optional[int], Callable[[str], List[Signature]]) -> Tuple[Dict[str, List[Signature]], int]
+    """
+    Extract the signatures of every module in `paths`, using a pool of `jobs`
+    processes for large trees.  Returns the index, which maps each path to
+    its signatures, and the number of lines read.
+
+    `extractor` is called with each path and must be a module level function
+    so that it can be sent to the pool.
+    """
+    index = {}  # type: Dict[str, List[Signature]]
+    total = 0
+    work = [(extractor, path) for path in paths]
+    if jobs == 1 or len(paths) < 8:
+        results = map(_extract_file, work)  # type: Iterable[Tuple[str, List[Signature], int]]
+        for path, sigs, lines in results:
+            index[path] = sigs
+            total += lines
+        return index, total
+    with multiprocessing.Pool(jobs) as pool:
+        chunksize = max(1, len(paths) // ((jobs or os.cpu_count() or 1) * 8))
+        for path, sigs, lines in pool.imap_unordered(_extract_file, work,
+                                                    chunksize):
+            index[path] = sigs
+            total += lines
+    return index, total
+
+
+def save_index(index, path):
+    # type: (Dict[str, List[Signature]], str) -> None
+    data = dict((module, [[s.qualname, s.lineno, [list(a) for a in s.args],
+                           s.returns, s.source] for s in sigs])
+                for module, sigs in index.items())
+    with open(path, 'w') as f:
+        json.dump(data, f, separators=(',', ':'), sort_keys=True)
+
+
+def load_index(path):
+    # type: (str) -> Dict[str, List[Signature]]
+    with open(path) as f:
+        data = json.load(f)
+    return dict((module, [Signature(q, l, tuple(Arg(*a) for a in args), r, s)
+                          for q, l, args, r, s in sigs])
+                for module, sigs in data.items())
+
+
+def format_signature(sig):
+    # type: (Signature) -> str
+    args = ', '.join('%s%s: %s' % (a.kind, a.name, a.type or '?') if a.name
+                     else a.kind for a in sig.args)
+    return '%s(%s) -> %s' % (sig.qualname, args, sig.returns or '?')
+
+
+def main(argv=None, extractor=extract, description=__doc__):
+    # type: (Optional[Sequence[str]], Callable[[str], List[Signature]], str) -> int
+    parser = argparse.ArgumentParser(description=description.split('\n\n')[0])
+    parser.add_argument('paths', nargs='+', help='files or directories to scan')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='number of processes (default: cpu count)')
+    parser.add_argument('--index', help='write the index to this json file '
+                                        'instead of printing the signatures')
+    args = parser.parse_args(argv)
+
+    start = time.time()
+    index, lines = build_index(find_sources(args.paths), args.jobs, extractor)
+    elapsed = time.time() - start
+    if args.index:
+        save_index(index, args.index)
+    else:
+        for module in sorted(index):
+            for sig in index[module]:
+                print('%s:%d: %s [%s]' % (module, sig.lineno,
+                                          format_signature(sig), sig.source))
+    print('%d files, %d signatures, %d lines in %.2fs (%.0f lines/s)' % (
+        len(index), sum(len(s) for s in index.values()), lines, elapsed,
+        lines / elapsed if elapsed else 0.0), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,325 @@
+"""
+Parse PEP 484 type expressions into interned, immutable trees.
+
+The same few annotations, ``Union[str, List[str]]``, ``Dict[str, bool]``,
+``OrderedDict[str, int]``, appear over and over in a code base, and every
+tool that looks inside them would otherwise tokenize each occurrence again.
+`parse` turns a type string into a `Type` node, remembering the result for
+every spelling it has seen, and builds each distinct type exactly once, so
+that two types are equal if and only if they are the same object::
+
+    >>> parse('Dict[str,  int]') is parse('typing.Dict[str, int]')
+    True
+
+Everything the corpus uses is understood: python 2 names such as
+``unicode``, ``Tuple[int, ...]`` and ``Tuple[()]``, dotted names such as
+``othermodule2.ExternalType2``, the argument list of ``Callable[[int], str]``,
+forward references in quotes, ``Literal[...]`` values and ``X | Y``.
+
+Types are put in a canonical form: ``typing.`` prefixes are dropped, nested
+unions are flattened, their repeated members dropped and the others sorted,
+since the order of a union does not matter, and a union of one type and None
+is spelled ``Optional[X]``, whichever way it was written::
+
+    >>> parse('Union[str, int, None]')
+    Type('Union[int, str, None]')
+
+Usage::
+
+    python tools/typeexpr.py [--stats] PATH ...    # the types in the signatures
+"""
+import argparse
+import collections
+import re
+import sys
+import time
+
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import typecomments
+
+_token_re = re.compile(r'''
+    \s*(?:
+        (?P<string>[rRuUbB]*(?:'[^'\\]*(?:\\.[^'\\]*)*'|"[^"\\]*(?:\\.[^"\\]*)*"))
+      | (?P<number>-?\d[\w.]*)
+      | (?P<name>\.\.\.|[^\W\d]\w*)
+      | (?P<op>->|[][(),.|])
+    )''', re.VERBOSE | re.UNICODE)
+
+_LITERALS = frozenset(['Literal', 'typing.Literal', 'typing_extensions.Literal'])
+
+
+class Type(collections.namedtuple('Type', 'name args text')):
+    """
+    An interned type expression.  `name` is the (possibly dotted) name of the
+    type, or '...' for an ellipsis, '()' for the empty tuple of ``Tuple[()]``
+    and '[]' for the argument list of a ``Callable``; `args` is the tuple of
+    its parameters, or None when it is not subscripted; and `text` is its
+    canonical spelling.
+
+    Types are only created by `parse` and `make`, and compare and hash by
+    identity.
+    """
+    __slots__ = ()
+
+    def __eq__(self, other):
+        # type: (object) -> bool
+        return self is other
+
+    def __ne__(self, other):
+        # type: (object) -> bool
+        return self is not other
+
+    def __hash__(self):
+        # type: () -> int
+        return hash(self.text)
+
+    def __str__(self):
+        # type: () -> str
+        return self.text
+
+    def __repr__(self):
+        # type: () -> str
+        return 'Type(%r)' % self.text
+
+    def __reduce__(self):
+        # re-interned on the other side
+        return parse, (self.text,)
+
+
+# canonical spelling -> Type
+_types = {}  # type: Dict[str, Type]
+# every spelling parsed so far -> its Type
+_parsed = {}  # type: Dict[str, Type]
+
+NONE = None  # type: Type
+
+
+def make(name, args=None):
+    # type: (str, Optional[Sequence[Type]]) -> Type
+    """Return the interned type `name`, with the parameters `args`."""
+    if name.startswith('typing.'):
+        name = name[7:]
+    if args is not None:
+        args = tuple(args)
+        if name == 'Union' or name == 'Optional':
+            return _union(args, name == 'Optional')
+    return _intern(name, args)
+
+
+def _intern(name, args):
+    # type: (str, Optional[Tuple[Type, ...]]) -> Type
+    if args is None:
+        text = name
+    elif name == '[]':
+        text = '[%s]' % ', '.join(arg.text for arg in args)
+    else:
+        text = '%s[%s]' % (name, ', '.join(arg.text for arg in args) or '()')
+    node = _types.get(text)
+    if node is None:
+        node = _types.setdefault(text, Type(name, args, text))
+    return node
+
+
+def _union(args, optional=False):
+    # type: (Tuple[Type, ...], bool) -> Type
+    members = []  # type: List[Type]
+    for arg in args + ((NONE,) if optional else ()):
+        if arg.name in ('Union', 'Optional'):
+            inner = arg.args + ((NONE,) if arg.name == 'Optional' else ())
+        else:
+            inner = (arg,)
+        for member in inner:
+            if member not in members:
+                members.append(member)
+    if len(members) == 1:
+        return members[0]
+    if len(members) == 2 and NONE in members:
+        members.remove(NONE)
+        return _intern('Optional', (members[0],))
+    members.sort(key=lambda member: (member is NONE, member.text))
+    return _intern('Union', tuple(members))
+
+
+NONE = _intern('None', None)
+
+
+def tokenize(text):
+    # type: (str) -> List[str]
+    """Return the tokens of the type expression `text`."""
+    tokens = []
+    pos = 0
+    end = len(text.rstrip())
+    while pos < end:
+        match = _token_re.match(text, pos)
+        if match is None:
+            raise ValueError('unexpected %r in type: %s' % (text[pos:].strip()[:1], text))
+        tokens.append(match.group(match.lastindex))
+        pos = match.end()
+    return tokens
+
+
+def parse(text):
+    # type: (str) -> Type
+    """
+    Return the interned type for the type expression `text`.  Raises
+    ValueError if `text` is not a type expression.
+    """
+    node = _parsed.get(text)
+    if node is not None:
+        return node
+    tokens = tokenize(text)
+    try:
+        node, i = _parse(tokens, 0, False)
+    except IndexError:
+        raise ValueError('incomplete type: %s' % text)
+    if i != len(tokens):
+        raise ValueError('unexpected %r in type: %s' % (tokens[i], text))
+    return _parsed.setdefault(text, node)
+
+
+def _parse(tokens, i, literal):
+    # type: (List[str], int, bool) -> Tuple[Type, int]
+    left, i = _parse_atom(tokens, i, literal)
+    if i < len(tokens) and tokens[i] == '|':
+        members = [left]
+        while i < len(tokens) and tokens[i] == '|':
+            right, i = _parse_atom(tokens, i + 1, literal)
+            members.append(right)
+        return make('Union', members), i
+    return left, i
+
+
+def _parse_atom(tokens, i, literal):
+    # type: (List[str], int, bool) -> Tuple[Type, int]
+    tok = tokens[i]
+    if tok == '[':
+        args, i = _parse_list(tokens, i + 1, False)
+        return make('[]', args), i
+    if tok == '(':
+        if tokens[i + 1] != ')':
+            raise ValueError('unexpected %r in type' % tokens[i + 1])
+        return make('()'), i + 2
+    if literal and (tok[:1] in '\'"' or tok[-1:] in '\'"' or
+                    tok[:1] == '-' or tok[:1].isdigit()):
+        return make(tok), i + 1
+    if tok[-1:] in '\'"':
+        # a forward reference
+        inner = tok.lstrip('rRuUbB')[1:-1]
+        return parse(inner), i + 1
+    if tok in ('->', ',', ']', ')', '|', '.') or tok[:1].isdigit() or tok[:1] == '-':
+        raise ValueError('unexpected %r in type' % tok)
+    name = tok
+    i += 1
+    while i < len(tokens) and tokens[i] == '.':
+        name += '.' + tokens[i + 1]
+        i += 2
+    if i < len(tokens) and tokens[i] == '[':
+        args, i = _parse_list(tokens, i + 1, name in _LITERALS)
+        if not args:
+            raise ValueError('empty parameters for %s' % name)
+        return make(name, args), i
+    return make(name), i
+
+
+def _parse_list(tokens, i, literal):
+    # type: (List[str], int, bool) -> Tuple[List[Type], int]
+    args = []  # type: List[Type]
+    while tokens[i] != ']':
+        node, i = _parse(tokens, i, literal)
+        args.append(node)
+        if tokens[i] == ',':
+            i += 1
+        elif tokens[i] != ']':
+            raise ValueError('unexpected %r in type' % tokens[i])
+    return args, i + 1
+
+
+def try_parse(text):
+    # type: (Optional[str]) -> Optional[Type]
+    """Return the type for `text`, or None if it is missing or malformed."""
+    if not text:
+        return None
+    try:
+        return parse(text)
+    except ValueError:
+        return None
+
+
+def same(a, b):
+    # type: (str, str) -> bool
+    """
+    Whether the type expressions `a` and `b` denote the same type, comparing
+    their spellings when either does not parse.
+    """
+    if a == b:
+        return True
+    ta, tb = try_parse(a), try_parse(b)
+    if ta is None or tb is None:
+        return typecomments.normalize(a) == typecomments.normalize(b)
+    return ta is tb
+
+
+def walk(node):
+    # type: (Type) -> Iterator[Type]
+    """Yield `node` and all the types nested in it, depth first."""
+    yield node
+    for arg in node.args or ():
+        for inner in walk(arg):
+            yield inner
+
+
+def _signature_types(paths):
+    # type: (Sequence[str]) -> List[str]
+    result = []
+    index, _ = typecomments.build_index(paths, jobs=1)
+    for sigs in index.values():
+        for sig in sigs:
+            result.extend(a.type for a in sig.args if a.type)
+            if sig.returns:
+                result.append(sig.returns)
+    return result
+
+
+def main(argv=None):
+    # type: (Optional[Sequence[str]]) -> int
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('paths', nargs='+', help='files or directories')
+    parser.add_argument('--stats', action='store_true',
+                        help='print how many distinct types there are and '
+                             'how long parsing takes instead')
+    args = parser.parse_args(argv)
+
+    strings = _signature_types(typecomments.find_sources(args.paths))
+    if not args.stats:
+        status = 0
+        for text in sorted(set(strings)):
+            try:
+                print('%s -> %s' % (text, parse(text)))
+            except ValueError as e:
+                print('%s: %s' % (text, e), file=sys.stderr)
+                status = 1
+        return status
+
+    start = time.perf_counter()
+    for text in strings:
+        typecomments.normalize(text)
+    tokenized = time.perf_counter() - start
+    start = time.perf_counter()
+    types = [try_parse(text) for text in strings]
+    parsed = time.perf_counter() - start
+    start = time.perf_counter()
+    for text in strings:
+        try_parse(text)
+    memoized = time.perf_counter() - start
+    print('%d type strings, %d spellings, %d distinct types, %d nodes' % (
+        len(strings), len(set(strings)), len(set(t for t in types if t)),
+        len(_types)))
+    print('normalize: %8.3f ms' % (tokenized * 1000))
+    print('parse:     %8.3f ms cold, %8.3f ms memoized' % (parsed * 1000,
+                                                          memoized * 1000))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())